@@ -2,18 +2,24 @@ from flask_cli import FlaskGroup
 from flask_restful import Api
 from app_init import app, socketio
 from flask_jwt_extended import JWTManager
-from middlewares import check_blacklisted_tokens
+from middlewares import check_blacklisted_tokens, add_query_count_header
+from commands import COMMANDS
+from benchmarks import BENCHMARKS
 from views import (
     UserRegisterView, UserDetailedViewSet, UserListViewSet, RoleDetailedViewSet, RoleListViewSet,
     UniversityDetailedView, UniversityListView, FacultyListView, FacultyDetailedView, PostDetailedView, PostListView,
     CommentDetailedView, CommentListView, UserLoginView, RefreshJWTView, UserChangePassword, PostRateView, UserMeView,
     UserFollowView, PostAddFile, PostDeleteFile, PostBulkEditFiles, NotificationListView, NotificationDetailedView,
-    UserLogOutView, MessageListView, MessageDetailedView, ChatView
+    UserLogOutView, MessageListView, MessageDetailedView, ChatView, UserFollowersView, UserFollowingView,
+    UserLikedPostsView, PostCommentsView, UserLogOutAllView, FeedView, PostCommentTreeView, NotificationUnreadCountView,
+    NotificationSeenView
 )
 
 JWTManager(app)
 api = Api(app)
 cli = FlaskGroup(app)
+for command in COMMANDS + BENCHMARKS:
+    app.cli.add_command(command)
 
 from models import User, Role, University, Faculty, Post, Comment, File, Notification, Message, ChatRoom
 
@@ -26,9 +32,13 @@ api.add_resource(UserDetailedViewSet, "/user/<int:user_id>")
 api.add_resource(UserRegisterView, "/user/register")
 api.add_resource(UserLoginView, "/user/login")
 api.add_resource(UserLogOutView, "/user/logout")
+api.add_resource(UserLogOutAllView, "/user/logout_all")
 api.add_resource(UserChangePassword, "/user/change_password")
 api.add_resource(UserMeView, "/user/me")
 api.add_resource(UserFollowView, "/user/<int:user_id>/follow")
+api.add_resource(UserFollowersView, "/user/<int:user_id>/followers")
+api.add_resource(UserFollowingView, "/user/<int:user_id>/following")
+api.add_resource(UserLikedPostsView, "/user/<int:user_id>/liked_posts")
 # University urls
 api.add_resource(UniversityListView, "/universities")
 api.add_resource(UniversityDetailedView, "/university/<int:university_id>")
@@ -42,16 +52,22 @@ api.add_resource(PostRateView, "/post/<int:post_id>/rate")
 api.add_resource(PostAddFile, "/post/<int:post_id>/file")
 api.add_resource(PostDeleteFile, "/post/<int:post_id>/file/<int:file_id>")
 api.add_resource(PostBulkEditFiles, "/post/<int:post_id>/files")
+api.add_resource(PostCommentsView, "/post/<int:post_id>/comments")
+api.add_resource(PostCommentTreeView, "/post/<int:post_id>/comments/tree")
 # Comment urls
 api.add_resource(CommentListView, "/comments")
 api.add_resource(CommentDetailedView, "/comment/<int:comment_id>")
 # Notification urls
 api.add_resource(NotificationListView, "/notifications")
 api.add_resource(NotificationDetailedView, "/notification/<int:notification_id>")
+api.add_resource(NotificationUnreadCountView, "/notifications/unread_count")
+api.add_resource(NotificationSeenView, "/notifications/seen")
 # Chat urls
 api.add_resource(ChatView, "/chat/<int:receiver_id>")
 api.add_resource(MessageListView, "/chat/<int:receiver_id>/messages")
 api.add_resource(MessageDetailedView, "/chat/<int:receiver_id>/message/<int:message_id>")
+# Feed urls
+api.add_resource(FeedView, "/feed")
 # Technical urls
 api.add_resource(RefreshJWTView, "/token/refresh")
 
@@ -62,5 +78,10 @@ def check_blacklisted_tokens_middleware():
     check_blacklisted_tokens()
 
 
+@app.after_request
+def add_query_count_header_middleware(response):
+    return add_query_count_header(response)
+
+
 if __name__ == '__main__':
     socketio.run(app)
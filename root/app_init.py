@@ -10,6 +10,6 @@ app.config.from_object("config.DevelopmentConfig")
 
 ma = Marshmallow(app)
 mail = Mail(app)
-socketio = SocketIO(app, cors_allowed_origins="*")
+socketio = SocketIO(app, cors_allowed_origins="*", message_queue=app.config["SOCKETIO_MESSAGE_QUEUE"])
 celery = Celery(app.name, broker=app.config["CELERY_BROKER_URL"])
 celery.conf.update(app.config)
@@ -0,0 +1,258 @@
+import time
+import uuid
+import socket
+import timeit
+import statistics
+import click
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from flask.cli import with_appcontext
+from flask_jwt_extended import create_access_token
+from flask_mail import Message
+from werkzeug.security import generate_password_hash, check_password_hash
+from schemas import PostGetSchema, CommentGetSchema, MessageGetSchema, UserGetSchema
+from schemas.compiled import get_compiled_dump
+from models import Post
+from db_init import redis_store
+from revoked_tokens import revoked_token_filter
+from passwords import password_hasher
+from mail_delivery import send_batch, MAIL_SENDER
+from app_init import mail
+from views.mixins import PaginationMixin
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    Controller = None
+
+BENCHMARK_SCHEMAS = (PostGetSchema, CommentGetSchema, MessageGetSchema, UserGetSchema)
+FILTER_READY_TIMEOUT = 5
+MEMORY_BENCHMARK_KEY = "benchmark_revocations:{}"
+
+
+def dump_rows(schema, objects, compiled):
+    # Switching the setting covers the nested schemas too, so marshmallow is timed without any compiled dump
+    current_app.config["COMPILED_SERIALIZERS_ENABLED"] = compiled
+    return schema.dump(objects, many=True)
+
+
+@click.command("benchmark_serializers")
+@click.option("--rows", default=100, help="Number of rows dumped by every schema.")
+@click.option("--repeat", default=20, help="Number of timed dumps of the rows.")
+@with_appcontext
+def benchmark_serializers(rows, repeat):
+    compiled_enabled = current_app.config["COMPILED_SERIALIZERS_ENABLED"]
+
+    try:
+        for schema_class in BENCHMARK_SCHEMAS:
+            schema = schema_class()
+            objects = schema.opts.model.query.limit(rows).all()
+            if not objects or get_compiled_dump(schema) is None:
+                click.echo(f"{schema_class.__name__}: skipped ({'no rows' if not objects else 'not compilable'})")
+                continue
+
+            # First dump loads the lazy relationships, so only the serialization itself is timed
+            if dump_rows(schema, objects, compiled=True) != dump_rows(schema, objects, compiled=False):
+                raise click.ClickException(f"{schema_class.__name__}: compiled dump differs from marshmallow")
+
+            marshmallow_time = timeit.timeit(lambda: dump_rows(schema, objects, compiled=False), number=repeat)
+            compiled_time = timeit.timeit(lambda: dump_rows(schema, objects, compiled=True), number=repeat)
+            click.echo(
+                f"{schema_class.__name__}: {len(objects)} rows, "
+                f"marshmallow {marshmallow_time / repeat * 1000:.2f} ms, "
+                f"compiled {compiled_time / repeat * 1000:.2f} ms, {marshmallow_time / compiled_time:.1f}x"
+            )
+    finally:
+        current_app.config["COMPILED_SERIALIZERS_ENABLED"] = compiled_enabled
+
+
+@click.command("benchmark_pagination")
+@click.option("--page", default=1000, type=click.IntRange(min=2), help="Number of the deep page.")
+@click.option("--page-size", default=10, type=click.IntRange(min=1), help="Number of posts on a page.")
+@click.option("--repeat", default=20, help="Number of timed reads of the page.")
+@with_appcontext
+def benchmark_pagination(page, page_size, repeat):
+    # The same page of the newest posts is read by OFFSET and by the keyset of the item before it
+    query = Post.query.order_by(Post.post_created_at.desc())
+    sort_keys = PaginationMixin.get_sort_keys(query)
+    query = query.order_by(None).order_by(
+        *[column.desc() if is_descending else column for column, is_descending in sort_keys]
+    )
+    offset = (page - 1) * page_size
+    last_row = query.with_entities(*[column for column, _ in sort_keys]).offset(offset - 1).limit(1).first()
+    if last_row is None:
+        raise click.ClickException(f"Page {page} needs more than {offset} posts.")
+
+    keyset_query = query.filter(PaginationMixin.get_keyset_condition(sort_keys, list(last_row)))
+    modes = (
+        ("offset", lambda: query.offset(offset).limit(page_size).all()),
+        ("cursor", lambda: keyset_query.limit(page_size).all()),
+    )
+    if len({tuple(post.post_id for post in read_page()) for _, read_page in modes}) != 1:
+        raise click.ClickException("Offset and cursor pages differ")
+
+    for mode, read_page in modes:
+        times = timeit.repeat(read_page, number=1, repeat=repeat)
+        click.echo(f"{mode}: page {page} of {page_size} posts, median {statistics.median(times) * 1000:.2f} ms")
+
+
+def get_latencies(client, url, headers, count):
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        client.get(url, headers=headers)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return latencies
+
+
+@click.command("benchmark_token_check")
+@click.option("--url", default="/roles", help="Authenticated endpoint which is requested.")
+@click.option("--requests", "count", default=1000, help="Number of timed requests of every mode.")
+@with_appcontext
+def benchmark_token_check(url, count):
+    filter_enabled = current_app.config["REVOKED_TOKENS_FILTER_ENABLED"]
+    headers = {"Authorization": f"Bearer {create_access_token(identity=1)}"}
+    client = current_app.test_client()
+
+    revoked_token_filter.ensure_listening(current_app._get_current_object())
+    deadline = time.monotonic() + FILTER_READY_TIMEOUT
+    while not revoked_token_filter.is_ready and time.monotonic() < deadline:
+        time.sleep(0.05)
+    if not revoked_token_filter.is_ready:
+        raise click.ClickException("Revoked token filter was not built, is Redis reachable?")
+
+    try:
+        for mode, enabled in (("redis only", False), ("local filter", True)):
+            current_app.config["REVOKED_TOKENS_FILTER_ENABLED"] = enabled
+            get_latencies(client, url, headers, min(count, 50))
+            latencies = get_latencies(client, url, headers, count)
+            percentiles = statistics.quantiles(latencies, n=100)
+            click.echo(f"{mode}: p50 {percentiles[49]:.2f} ms, p99 {percentiles[98]:.2f} ms")
+    finally:
+        current_app.config["REVOKED_TOKENS_FILTER_ENABLED"] = filter_enabled
+
+
+@click.command("benchmark_revocation_memory")
+@click.option("--tokens", default=10000, help="Number of revoked tokens.")
+@click.option("--tokens-per-user", default=5, help="Number of revoked tokens of every user.")
+@with_appcontext
+def benchmark_revocation_memory(tokens, tokens_per_user):
+    score = time.time()
+    jtis = [str(uuid.uuid4()) for _ in range(tokens)]
+    users = range(max(1, tokens // tokens_per_user))
+    token_keys = [MEMORY_BENCHMARK_KEY.format(jti) for jti in jtis]
+    jtis_key, epochs_key = MEMORY_BENCHMARK_KEY.format("jtis"), MEMORY_BENCHMARK_KEY.format("epochs")
+
+    try:
+        pipeline = redis_store.pipeline(transaction=False)
+        for token_key in token_keys:
+            pipeline.set(token_key, "true")
+        pipeline.zadd(jtis_key, {jti: score for jti in jtis})
+        pipeline.zadd(epochs_key, {str(user_id): score for user_id in users})
+        pipeline.execute()
+
+        for token_key in token_keys:
+            pipeline.memory_usage(token_key, samples=0)
+        keys_memory = sum(pipeline.execute())
+
+        for title, memory, count in (
+            ("key per token, no expiry", keys_memory, tokens),
+            ("sorted set of jtis by expiry", redis_store.memory_usage(jtis_key, samples=0), tokens),
+            ("revocation epoch per user", redis_store.memory_usage(epochs_key, samples=0), len(users)),
+        ):
+            click.echo(f"{title}: {count} entries, {memory} bytes, {memory / tokens:.1f} bytes per revoked token")
+    finally:
+        redis_store.delete(jtis_key, epochs_key, *token_keys)
+
+
+@click.command("benchmark_password_hashing")
+@click.option("--logins", default=32, help="Number of password checks of every mode.")
+@click.option("--concurrency", default=8, help="Number of concurrent request threads.")
+@with_appcontext
+def benchmark_password_hashing(logins, concurrency):
+    password = "Benchmark1!"
+    password_hash = generate_password_hash(
+        password, current_app.config["PASSWORD_HASH_METHOD"], current_app.config["PASSWORD_HASH_SALT_LENGTH"]
+    )
+    app = current_app._get_current_object()
+
+    def check_in_pool(_):
+        with app.app_context():
+            return password_hasher.check(password_hash, password)
+
+    password_hasher.check(password_hash, password)
+    for mode, check in (
+        ("request thread", lambda _: check_password_hash(password_hash, password)),
+        (f"process pool of {current_app.config['PASSWORD_HASH_WORKERS']}", check_in_pool),
+    ):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            if not all(executor.map(check, range(logins))):
+                raise click.ClickException("Password check failed")
+        elapsed = time.perf_counter() - start
+
+        click.echo(f"{mode}: {logins} logins by {concurrency} threads, {logins / elapsed:.1f} logins/s")
+
+
+class CountingHandler:
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 Message accepted for delivery"
+
+
+@click.command("benchmark_mail_delivery")
+@click.option("--mails", default=200, help="Number of mails sent by every mode.")
+@with_appcontext
+def benchmark_mail_delivery(mails):
+    # Local SMTP server stand-in, the rate limit is lifted so only the delivery is timed
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+
+    handler = CountingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    mail_state, rate_limit = current_app.extensions["mail"], current_app.config["MAIL_DESTINATION_RATE_LIMIT"]
+    current_app.extensions["mail"] = mail.init_mail({
+        "MAIL_SERVER": "127.0.0.1", "MAIL_PORT": port, "MAIL_MAX_EMAILS": current_app.config["MAIL_MAX_EMAILS"]
+    })
+    current_app.config["MAIL_DESTINATION_RATE_LIMIT"] = mails
+    controller.start()
+
+    try:
+        messages = [
+            {"subject": "Benchmark", "recipients": [f"user{i}@example.com"], "body": "Benchmark mail"}
+            for i in range(mails)
+        ]
+
+        def send_single():
+            for message in messages:
+                mail.send(Message(sender=MAIL_SENDER, **message))
+
+        def send_batched():
+            if send_batch(messages)[0] != mails:
+                raise click.ClickException("Batched delivery did not send every mail")
+
+        for mode, send in (("connection per mail", send_single), ("one connection per batch", send_batched)):
+            received = handler.received
+            start = time.perf_counter()
+            send()
+            elapsed = time.perf_counter() - start
+            if handler.received - received != mails:
+                raise click.ClickException(f"{mode}: the server received {handler.received - received} mails")
+
+            click.echo(f"{mode}: {mails} mails, {mails / elapsed:.1f} mails/s")
+    finally:
+        controller.stop()
+        current_app.extensions["mail"] = mail_state
+        current_app.config["MAIL_DESTINATION_RATE_LIMIT"] = rate_limit
+
+
+# The mail benchmark runs a local SMTP server, it is only registered when aiosmtpd is installed
+BENCHMARKS = (
+    benchmark_serializers, benchmark_pagination, benchmark_token_check, benchmark_revocation_memory,
+    benchmark_password_hashing
+) + ((benchmark_mail_delivery,) if Controller is not None else ())
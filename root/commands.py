@@ -0,0 +1,287 @@
+import time
+import click
+from alembic import command
+from alembic.operations import ops
+from flask import current_app
+from flask.cli import with_appcontext
+from marshmallow import Schema
+from sqlalchemy import func, inspect, or_, select, update, Boolean, DateTime
+from models import Post, User
+from models.mixins import track_changed_row
+from models.post import post_votes, get_post_rating, VOTE_LIKE, VOTE_DISLIKE
+from db_init import db, redis_store
+from revoked_tokens import get_max_token_lifetime, REVOKED_TOKENS_KEY
+
+EXPLAIN_PAGE_SIZE = 20
+DELETE_DUPLICATES_SQL = "DELETE FROM {table} duplicate USING {table} original " \
+                        "WHERE duplicate.ctid > original.ctid AND {conditions}"
+# Revoked jtis were stored as bare uuid4 keys without expiry, and then in a plain set
+LEGACY_REVOKED_TOKEN_PATTERN = "????????-????-????-????-????????????"
+LEGACY_REVOKED_TOKENS_KEY = "revoked_tokens"
+
+
+class IndexCandidate:
+    def __init__(self, table, columns, is_unique=False):
+        self.table = table
+        self.columns = tuple(columns)
+        self.is_unique = is_unique
+        self.reasons = set()
+
+    @property
+    def column_names(self):
+        return [column.name for column in self.columns]
+
+    @property
+    def name(self):
+        prefix = "uq" if self.is_unique else "ix"
+        return f"{prefix}_{self.table.name}_{'_'.join(self.column_names)}"
+
+    def is_covered_by(self, column_names, is_unique=False):
+        if self.is_unique:
+            return is_unique and set(self.column_names) == set(column_names)
+
+        # B-tree index serves every query on a leading prefix of its columns
+        return list(column_names[:len(self.columns)]) == self.column_names
+
+
+def get_view_model(view_class):
+    for attribute in vars(view_class).values():
+        if isinstance(attribute, Schema) and getattr(attribute.opts, "model", None) is not None:
+            return attribute.opts.model
+
+
+def get_mapped_column(relationship_field, related_field):
+    # Mapping on the related primary key is served by the foreign key column, like in RelationshipJoinMixin
+    relationship = relationship_field.property
+    for local_column, remote_column in relationship.local_remote_pairs:
+        if remote_column is related_field.property.columns[0]:
+            return local_column
+
+    return related_field.property.columns[0]
+
+
+def get_view_columns(view_class):
+    model = get_view_model(view_class)
+    filter_mappings = getattr(view_class, "filter_mappings", {})
+    sort_mappings = getattr(view_class, "sort_mappings", {})
+    view_columns = []
+
+    for reason, fields, mappings in (
+        ("filter", getattr(view_class, "filter_fields", ()), filter_mappings),
+        ("sort", sort_mappings.keys(), sort_mappings)
+    ):
+        for field in fields:
+            if field in mappings:
+                column = get_mapped_column(*mappings[field])
+            else:
+                column = getattr(model, field).property.columns[0]
+
+            view_columns.append((column, f"{reason} {view_class.__name__}.{field}"))
+
+    return model, view_columns
+
+
+def get_index_candidates():
+    candidates = {}
+
+    def add_candidate(table, columns, reason, is_unique=False):
+        candidate = candidates.setdefault((table.name, tuple(columns)), IndexCandidate(table, columns, is_unique))
+        candidate.reasons.add(reason)
+
+    for table in db.metadata.tables.values():
+        for foreign_key in table.foreign_keys:
+            add_candidate(table, [foreign_key.parent], f"foreign key to {foreign_key.target_fullname}")
+
+        # Association tables have no primary key, the pair of foreign keys has to be unique instead
+        if not table.primary_key and len(table.foreign_keys) == len(table.columns) > 1:
+            add_candidate(table, list(table.columns), "association table", is_unique=True)
+
+    for view_function in current_app.view_functions.values():
+        view_class = getattr(view_function, "view_class", None)
+        if view_class is None or not hasattr(view_class, "filter_fields"):
+            continue
+
+        model, view_columns = get_view_columns(view_class)
+        model_table = inspect(model).local_table
+
+        for column, reason in view_columns:
+            # Boolean flags are too unselective for an index of their own
+            if column.primary_key or isinstance(column.type, Boolean):
+                continue
+
+            add_candidate(column.table, [column], reason)
+
+        # Equality on a foreign key followed by a time range or order is served by one composite index
+        local_columns = [column for column, reason in view_columns if column.table is model_table]
+        for foreign_key_column in [column for column in local_columns if column.foreign_keys]:
+            for time_column in [column for column in local_columns if isinstance(column.type, DateTime)]:
+                add_candidate(
+                    model_table, [foreign_key_column, time_column], f"filter and sort {view_class.__name__}"
+                )
+
+    return sorted(candidates.values(), key=lambda candidate: (candidate.table.name, candidate.name))
+
+
+def get_missing_candidates(candidates):
+    inspector = inspect(db.engine)
+    missing_candidates = []
+
+    for candidate in candidates:
+        table_name = candidate.table.name
+        if not inspector.has_table(table_name):
+            continue
+
+        keys = [(inspector.get_pk_constraint(table_name)["constrained_columns"], True)]
+        keys += [(index["column_names"], index["unique"]) for index in inspector.get_indexes(table_name)]
+        keys += [(constraint["column_names"], True) for constraint in inspector.get_unique_constraints(table_name)]
+        # Index which is a prefix of another proposed index is not needed
+        keys += [
+            (other.column_names, other.is_unique) for other in candidates
+            if other is not candidate and other.table is candidate.table and len(other.columns) > len(candidate.columns)
+        ]
+
+        if not any(candidate.is_covered_by(column_names, is_unique) for column_names, is_unique in keys):
+            missing_candidates.append(candidate)
+
+    return missing_candidates
+
+
+def explain_candidate(candidate):
+    # Representative query: equality on the leading columns, ordered by a trailing time column
+    columns = list(candidate.columns)
+    order_columns = [columns.pop().desc()] if len(columns) > 1 and isinstance(columns[-1].type, DateTime) else []
+
+    sample = db.session.execute(
+        select(*columns).where(*[column.isnot(None) for column in columns]).limit(1)
+    ).first()
+    if sample is None:
+        return "no rows to sample"
+
+    statement = select(candidate.table).where(
+        *[column == value for column, value in zip(columns, sample)]
+    ).order_by(*order_columns).limit(EXPLAIN_PAGE_SIZE)
+    compiled = statement.compile(dialect=db.engine.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup) if compiled.positional else compiled.params
+
+    plan = db.session.connection().exec_driver_sql(f"EXPLAIN {compiled}", params).scalars().all()
+    scans = [str(line).strip(" ->") for line in plan if "Scan" in str(line)]
+
+    return scans[0] if scans else str(plan[0])
+
+
+def get_revision_operations(candidates):
+    upgrade_operations = []
+    downgrade_operations = []
+
+    for candidate in candidates:
+        table_name = candidate.table.name
+        if candidate.is_unique:
+            conditions = " AND ".join(
+                f"duplicate.{name} = original.{name}" for name in candidate.column_names
+            )
+            upgrade_operations.append(ops.ExecuteSQLOp(
+                DELETE_DUPLICATES_SQL.format(table=table_name, conditions=conditions)
+            ))
+            upgrade_operations.append(
+                ops.CreateUniqueConstraintOp(candidate.name, table_name, candidate.column_names)
+            )
+            downgrade_operations.append(ops.DropConstraintOp(candidate.name, table_name, type_="unique"))
+        else:
+            upgrade_operations.append(ops.CreateIndexOp(candidate.name, table_name, candidate.column_names))
+            downgrade_operations.append(ops.DropIndexOp(candidate.name, table_name))
+
+    return upgrade_operations, downgrade_operations[::-1]
+
+
+@click.command("advise_indexes")
+@click.option("--dry-run", is_flag=True, help="Only print the report, without writing an Alembic revision.")
+@click.option("--message", default="Add missing indexes", help="Message of the generated Alembic revision.")
+@with_appcontext
+def advise_indexes(dry_run, message):
+    candidates = get_missing_candidates(get_index_candidates())
+    if not candidates:
+        click.echo("All foreign keys, filters and sort mappings are indexed.")
+        return
+
+    for candidate in candidates:
+        click.echo(f"{candidate.name} ({', '.join(sorted(candidate.reasons))})")
+        click.echo(f"    {explain_candidate(candidate)}")
+
+    if dry_run:
+        return
+
+    upgrade_operations, downgrade_operations = get_revision_operations(candidates)
+
+    def add_operations(context, revision, directives):
+        directives[0].upgrade_ops.ops.extend(upgrade_operations)
+        directives[0].downgrade_ops.ops.extend(downgrade_operations)
+
+    # Revision environment gives the directives hook a migration context to render the operations
+    config = current_app.extensions["migrate"].migrate.get_config()
+    config.set_main_option("revision_environment", "true")
+    command.revision(config, message=message, process_revision_directives=add_operations)
+
+
+@click.command("index_revoked_tokens")
+@with_appcontext
+def index_revoked_tokens():
+    # One-off: moves the jtis revoked before the sorted set existed into it. Their expiry is unknown, so they are
+    # kept for the longest token lifetime, after which no token issued before now is valid anyway.
+    jtis = list(redis_store.scan_iter(match=LEGACY_REVOKED_TOKEN_PATTERN))
+    jtis += redis_store.smembers(LEGACY_REVOKED_TOKENS_KEY)
+
+    max_lifetime = get_max_token_lifetime(current_app)
+    expires_at = "+inf" if max_lifetime is None else time.time() + max_lifetime
+    if jtis:
+        pipeline = redis_store.pipeline()
+        pipeline.zadd(REVOKED_TOKENS_KEY, {jti: expires_at for jti in jtis})
+        pipeline.delete(LEGACY_REVOKED_TOKENS_KEY, *jtis)
+        pipeline.execute()
+
+    click.echo(f"Indexed {len(jtis)} revoked tokens, restart the workers to rebuild their filters.")
+
+
+def count_votes(column, key, vote):
+    return select(func.count()).where(column == key, post_votes.c.vote == vote).scalar_subquery()
+
+
+@click.command("reconcile_post_votes")
+@with_appcontext
+def reconcile_post_votes():
+    # Vote counters are only changed by deltas, this recounts them from the votes and fixes the rows which drifted,
+    # e.g. the users whose voted posts were deleted before their counters were taken back on delete
+    likes = count_votes(post_votes.c.post_id, Post.post_id, VOTE_LIKE)
+    dislikes = count_votes(post_votes.c.post_id, Post.post_id, VOTE_DISLIKE)
+    rating = get_post_rating(likes, dislikes)
+    post_ids = db.session.execute(
+        update(Post.__table__)
+        .where(or_(
+            Post.post_likes.is_distinct_from(likes),
+            Post.post_dislikes.is_distinct_from(dislikes),
+            Post.post_rating.is_distinct_from(rating)
+        ))
+        .values(post_likes=likes, post_dislikes=dislikes, post_rating=rating)
+        .returning(Post.post_id)
+    ).scalars().all()
+
+    liked_count = count_votes(post_votes.c.user_id, User.user_id, VOTE_LIKE)
+    disliked_count = count_votes(post_votes.c.user_id, User.user_id, VOTE_DISLIKE)
+    user_ids = db.session.execute(
+        update(User.__table__)
+        .where(or_(
+            User.user_liked_posts_count != liked_count,
+            User.user_disliked_posts_count != disliked_count
+        ))
+        .values(user_liked_posts_count=liked_count, user_disliked_posts_count=disliked_count)
+        .returning(User.user_id)
+    ).scalars().all()
+
+    for model, primary_keys in ((Post, post_ids), (User, user_ids)):
+        for primary_key in primary_keys:
+            track_changed_row(db.session, model, primary_key)
+    db.session.commit()
+
+    click.echo(f"Fixed the vote counters of {len(post_ids)} posts and {len(user_ids)} users.")
+
+
+COMMANDS = (advise_indexes, index_revoked_tokens, reconcile_post_votes)
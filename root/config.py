@@ -22,9 +22,20 @@ class Config:
     JWT_SECRET_KEY = get_env_variable("JWT_SECRET_KEY")
     JWT_BLACKLIST_ENABLED = True
     JWT_BLACKLIST_TOKEN_CHECKS = ['access', 'refresh']
+    REVOKED_TOKENS_FILTER_ENABLED = True
+    REVOKED_TOKENS_FILTER_CAPACITY = 100000
+    REVOKED_TOKENS_FILTER_ERROR_RATE = 0.001
+    # Password hashing, the method has the werkzeug "pbkdf2:<hash>:<iterations>" form. Stored hashes made with
+    # another method are rehashed on the next login.
+    PASSWORD_HASH_METHOD = "pbkdf2:sha256:600000"
+    PASSWORD_HASH_SALT_LENGTH = 16
+    # Hashing processes of every worker process
+    PASSWORD_HASH_WORKERS = 2
     JSON_SORT_KEYS = False
     ROOT_FOLDER = os.path.abspath(os.path.dirname(__name__))
     UPLOAD_FOLDER = os.path.join(ROOT_FOLDER, "media/uploads")
+    QUERY_COUNT_HEADER_ENABLED = False
+    COMPILED_SERIALIZERS_ENABLED = True
     #  Postgres config
     POSTGRES_URL = get_env_variable("POSTGRES_URL")
     POSTGRES_USER = get_env_variable("POSTGRES_USER")
@@ -46,10 +57,68 @@ class Config:
     MAIL_USE_SSL = True
     MAIL_USERNAME = get_env_variable("MAIL_USERNAME")
     MAIL_PASSWORD = get_env_variable("MAIL_PASSWORD")
+    # Mails are sent in batches over one connection, which is reopened after MAIL_MAX_EMAILS mails, and at most
+    # MAIL_DESTINATION_RATE_LIMIT per second go to a recipient domain. A failed mail is retried MAIL_MAX_RETRIES
+    # times, after MAIL_RETRY_DELAY seconds doubling every time.
+    MAIL_MAX_EMAILS = 100
+    MAIL_BATCH_SIZE = 100
+    MAIL_DESTINATION_RATE_LIMIT = 20
+    MAIL_MAX_RETRIES = 3
+    MAIL_RETRY_DELAY = 30
+    # Pagination
+    COUNT_CACHE_TIMEOUT = 60
+    COUNT_ESTIMATE_THRESHOLD = 10000
+    # Validation, ids of roles, universities and faculties are cached until one of them is inserted or deleted
+    REFERENCE_IDS_CACHE_TIMEOUT = 24 * 60 * 60
+    # Response cache
+    RESPONSE_CACHE_ENABLED = True
+    RESPONSE_CACHE_TIMEOUT = 60 * 60
     # Celery
     CELERY_BROKER_URL = get_env_variable("CELERY_BROKER_URL")
     CELERY_RESULT_BACKEND = get_env_variable("CELERY_RESULT_BACKEND")
     CELERY_INCLUDE = ["tasks"]
+    # Post votes, with write-behind enabled a vote only changes Redis and the beat task writes the votes and
+    # counters to the database every POST_VOTES_FLUSH_INTERVAL seconds. Votes known to Redis are kept for
+    # POST_VOTES_CACHE_TIMEOUT seconds, which has to be longer than the flush interval.
+    POST_VOTES_WRITE_BEHIND_ENABLED = False
+    POST_VOTES_CACHE_TIMEOUT = 24 * 60 * 60
+    POST_VOTES_FLUSH_INTERVAL = 5
+    POST_VOTES_FLUSH_BATCH_SIZE = 500
+    # Home feed timelines, posts of authors with more followers than FEED_FANOUT_FOLLOWERS_LIMIT are not pushed
+    # to the timelines of the followers but merged into the feed on read
+    FEED_TIMELINE_LENGTH = 800
+    FEED_TIMELINE_TIMEOUT = 7 * 24 * 60 * 60
+    FEED_FANOUT_FOLLOWERS_LIMIT = 10000
+    FEED_FANOUT_BATCH_SIZE = 1000
+    # Notification emails, the outbox is dispatched after every commit which adds to it, and by the beat task
+    # every NOTIFICATION_OUTBOX_DISPATCH_INTERVAL seconds for dispatches which could not be started
+    NOTIFICATION_OUTBOX_BATCH_SIZE = 500
+    NOTIFICATION_OUTBOX_DISPATCH_INTERVAL = 60
+    # Likes, comments and follows of the same target are merged into one notification for this many seconds
+    NOTIFICATION_AGGREGATION_WINDOW = 60 * 60
+    NOTIFICATION_LAST_ACTORS = 3
+    # Seen notifications older than NOTIFICATION_RETENTION_PERIOD seconds are deleted by the beat task every
+    # NOTIFICATION_PURGE_INTERVAL seconds, in batches of NOTIFICATION_PURGE_BATCH_SIZE rows
+    NOTIFICATION_RETENTION_PERIOD = 30 * 24 * 60 * 60
+    NOTIFICATION_PURGE_INTERVAL = 60 * 60
+    NOTIFICATION_PURGE_BATCH_SIZE = 1000
+    # Unread counters are counted again from the database when they were not read for this many seconds
+    UNREAD_COUNT_TIMEOUT = 24 * 60 * 60
+    # Longest transaction changing unread counters, a missing counter is not stored from the database while one
+    # of them is open (or for this many seconds after a worker died in one)
+    UNREAD_COUNT_PENDING_TIMEOUT = 60
+    # Redis url shared by the socket servers of all processes, so a notification committed by any of them reaches
+    # the receiver's connection
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get("SOCKETIO_MESSAGE_QUEUE")
+    CELERYBEAT_SCHEDULE = {
+        "flush_post_votes": {"task": "tasks.flush_post_votes", "schedule": POST_VOTES_FLUSH_INTERVAL},
+        "dispatch_notifications": {
+            "task": "tasks.dispatch_notifications", "schedule": NOTIFICATION_OUTBOX_DISPATCH_INTERVAL
+        },
+        "purge_seen_notifications": {
+            "task": "tasks.purge_seen_notifications", "schedule": NOTIFICATION_PURGE_INTERVAL
+        },
+    }
 
 
 class ProductionConfig(Config):
@@ -59,6 +128,7 @@ class ProductionConfig(Config):
 class DevelopmentConfig(Config):
     DEVELOPMENT = True
     DEBUG = True
+    QUERY_COUNT_HEADER_ENABLED = True
 
 
 class TestingConfig(Config):
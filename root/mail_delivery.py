@@ -0,0 +1,87 @@
+import time
+from flask import current_app
+from flask_mail import Message
+from app_init import mail
+from db_init import redis_store
+
+MAIL_SENDER = "noreply@studenthub.com"
+# Messages sent to a recipient domain in one second, the destination servers throttle or reject bursts above
+# their own limits
+MAIL_RATE_KEY = "mail_rate:{}:{}"
+
+
+def get_destination(message):
+    return message["recipients"][0].rsplit("@", 1)[-1].lower()
+
+
+def take_send_slots(destination, count):
+    # Returns how many of count messages can be sent to the destination in the current second
+    rate_key = MAIL_RATE_KEY.format(destination, int(time.time()))
+    pipeline = redis_store.pipeline()
+    pipeline.incrby(rate_key, count)
+    pipeline.expire(rate_key, 2)
+    sent_count = pipeline.execute()[0]
+
+    allowed = min(count, max(0, current_app.config["MAIL_DESTINATION_RATE_LIMIT"] - (sent_count - count)))
+    if allowed < count:
+        redis_store.decrby(rate_key, count - allowed)
+
+    return allowed
+
+
+def split_by_rate_limit(messages):
+    # Messages over the rate limit of their destination are deferred to the next batch
+    by_destination = {}
+    for message in messages:
+        by_destination.setdefault(get_destination(message), []).append(message)
+
+    allowed, deferred = [], []
+    for destination, destination_messages in by_destination.items():
+        slots = take_send_slots(destination, len(destination_messages))
+        allowed += destination_messages[:slots]
+        deferred += destination_messages[slots:]
+
+    return allowed, deferred
+
+
+def send_batch(messages):
+    # Messages are dicts of subject, recipients and body. They are sent over one SMTP connection, a failed message
+    # is returned without stopping the batch. Returns the sent count, the deferred and the failed messages.
+    allowed, deferred = split_by_rate_limit(messages)
+    failed = []
+    sent = 0
+    if not allowed:
+        return sent, deferred, failed
+
+    attempted = 0
+    try:
+        with mail.connect() as connection:
+            for message in allowed:
+                attempted += 1
+                try:
+                    connection.send(Message(
+                        subject=message["subject"],
+                        recipients=message["recipients"],
+                        body=message["body"],
+                        sender=MAIL_SENDER
+                    ))
+                    sent += 1
+                except Exception:
+                    failed.append(message)
+    except OSError:
+        # The connection could not be opened or was lost, the messages not tried over it fail as well
+        failed += allowed[attempted:]
+
+    return sent, deferred, failed
+
+
+def get_retries(messages):
+    # A failed message is retried alone, MAIL_RETRY_DELAY seconds after the first failure and doubling after that
+    retries = {}
+    for message in messages:
+        attempts = message.get("attempts", 0) + 1
+        if attempts <= current_app.config["MAIL_MAX_RETRIES"]:
+            delay = current_app.config["MAIL_RETRY_DELAY"] * 2 ** (attempts - 1)
+            retries.setdefault(delay, []).append({**message, "attempts": attempts})
+
+    return retries
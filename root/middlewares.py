@@ -1,15 +1,32 @@
-from db_init import redis_store
-from flask import request
-from flask_jwt_extended import get_jti, exceptions
+from flask import request, current_app, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from flask_jwt_extended import decode_token, exceptions
 from utilities import is_authorized_error_handler
 from exceptions import JWTRevokedError
+from revoked_tokens import is_token_revoked
 
 
 @is_authorized_error_handler()
 def check_blacklisted_tokens():
     jwt_header = request.headers.get("Authorization", None)
     if jwt_header:
-        token = jwt_header.split()[1]
-        jti = get_jti(encoded_token=token)
-        if redis_store.get(jti):
+        token = decode_token(jwt_header.split()[1])
+        # Redis is only asked about the tokens which the local revoked token filter can not rule out
+        if is_token_revoked(token):
             raise JWTRevokedError
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def count_request_queries(connection, cursor, statement, parameters, context, executemany):
+    # Kept on the request, since the application context (and g) outlives a single request here
+    if has_request_context():
+        request.query_count = getattr(request, "query_count", 0) + 1
+
+
+def add_query_count_header(response):
+    # Number of SQL queries the request issued, to verify that list pages do not query per item
+    if current_app.config["QUERY_COUNT_HEADER_ENABLED"]:
+        response.headers["X-Query-Count"] = str(getattr(request, "query_count", 0))
+
+    return response
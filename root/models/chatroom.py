@@ -5,7 +5,8 @@ from models.mixins import ModelMixinQuerySimplifier
 chatroom_user = db.Table(
     "chatroom_user",
     db.Column("chatroom_id", db.Integer, db.ForeignKey("chat_rooms.chatroom_id")),
-    db.Column("user_id", db.Integer, db.ForeignKey("users.user_id"))
+    db.Column("user_id", db.Integer, db.ForeignKey("users.user_id"), index=True),
+    db.UniqueConstraint("chatroom_id", "user_id", name="uq_chatroom_user_chatroom_id_user_id")
 )
 
 
@@ -1,21 +1,31 @@
 from db_init import db
 from datetime import datetime
-from models.mixins import ModelMixinQuerySimplifier
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+from models.post import Post
+from models.mixins import ModelMixinQuerySimplifier, change_counter
 
 
 class Comment(db.Model, ModelMixinQuerySimplifier):
     __tablename__ = "comments"
+    __table_args__ = (
+        db.Index("ix_comments_comment_author_comment_created_at", "comment_author", "comment_created_at"),
+        db.Index("ix_comments_comment_post_comment_created_at", "comment_post", "comment_created_at"),
+        db.Index("ix_comments_comment_parent_comment_created_at", "comment_parent", "comment_created_at"),
+    )
 
     comment_id = db.Column(db.Integer, primary_key=True)
     comment_text = db.Column(db.String(500), nullable=False)
-    comment_created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    comment_created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
     comment_modified_at = db.Column(db.DateTime, nullable=True, default=None)
     comment_author = db.Column(db.Integer, db.ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False)
     comment_post = db.Column(db.Integer, db.ForeignKey("posts.post_id", ondelete="CASCADE"), nullable=False)
     comment_parent = db.Column(db.Integer, db.ForeignKey("comments.comment_id", ondelete="CASCADE"), nullable=True)
     comment_child = db.relationship("Comment", backref=db.backref("parent_comment", remote_side="Comment.comment_id"),
                                     cascade="all, delete", lazy=True)
-    comment_image_id = db.Column(db.Integer, db.ForeignKey("files.file_id", ondelete="CASCADE"), nullable=True)
+    comment_image_id = db.Column(
+        db.Integer, db.ForeignKey("files.file_id", ondelete="CASCADE"), nullable=True, index=True
+    )
     comment_image = db.relationship("File", backref="uploaded_in_comment", cascade="all, delete", lazy=True)
 
     def __init__(self, comment_text: str, comment_created_at: str, comment_post: int,
@@ -34,3 +44,13 @@ class Comment(db.Model, ModelMixinQuerySimplifier):
 
     def __repr__(self):
         return f"Comment by {self.comment_author} under the post {self.comment_post })"
+
+
+@event.listens_for(Comment, "after_insert")
+def count_added_comment(mapper, connection, target):
+    change_counter(object_session(target), Post.post_comments_count, target.comment_post, 1)
+
+
+@event.listens_for(Comment, "after_delete")
+def count_removed_comment(mapper, connection, target):
+    change_counter(object_session(target), Post.post_comments_count, target.comment_post, -1)
@@ -4,11 +4,16 @@ from models.mixins import ModelMixinQuerySimplifier
 
 class Faculty(db.Model, ModelMixinQuerySimplifier):
     __tablename__ = "faculties"
+    __table_args__ = (
+        db.Index(
+            "ix_faculties_faculty_name_pattern", "faculty_name", postgresql_ops={"faculty_name": "varchar_pattern_ops"}
+        ),
+    )
 
     faculty_id = db.Column(db.Integer, primary_key=True)
-    faculty_name = db.Column(db.String(100), nullable=False)
+    faculty_name = db.Column(db.String(100), nullable=False, index=True)
     faculty_university = db.Column(
-        db.Integer, db.ForeignKey("universities.university_id", ondelete="CASCADE"), nullable=False
+        db.Integer, db.ForeignKey("universities.university_id", ondelete="CASCADE"), nullable=False, index=True
     )
     faculty_users = db.relationship("User", backref="faculty", cascade="all, delete", lazy=True)
 
@@ -13,7 +13,7 @@ class File(db.Model, ModelMixinQuerySimplifier):
     file_name = db.Column(db.String(256))
     file_url = db.Column(db.String(256))
     file_format = db.Column(db.String(6))
-    file_post_id = db.Column(db.Integer, db.ForeignKey("posts.post_id"))
+    file_post_id = db.Column(db.Integer, db.ForeignKey("posts.post_id"), index=True)
 
     def __init__(self, file_name: str, file_url):
         self.file_name = file_name
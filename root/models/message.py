@@ -5,15 +5,19 @@ from models.mixins import ModelMixinQuerySimplifier
 
 class Message(db.Model, ModelMixinQuerySimplifier):
     __tablename__ = "messages"
+    __table_args__ = (
+        db.Index("ix_messages_message_sender_message_created_at", "message_sender", "message_created_at"),
+        db.Index("ix_messages_message_receiver_message_created_at", "message_receiver", "message_created_at"),
+    )
 
     message_id = db.Column(db.Integer, primary_key=True)
     message_text = db.Column(db.String(1000))
     message_is_read = db.Column(db.Boolean, default=False)
-    message_created_at = db.Column(db.DateTime, default=datetime.utcnow().isoformat())
+    message_created_at = db.Column(db.DateTime, default=datetime.utcnow().isoformat(), index=True)
     message_edited_at = db.Column(db.DateTime, nullable=True, default=None)
     message_sender = db.Column(db.Integer, db.ForeignKey("users.user_id"))
     message_receiver = db.Column(db.Integer, db.ForeignKey("users.user_id"))
-    message_chatroom = db.Column(db.Integer, db.ForeignKey("chat_rooms.chatroom_id"))
+    message_chatroom = db.Column(db.Integer, db.ForeignKey("chat_rooms.chatroom_id"), index=True)
 
     def __init__(self, message_text, sender, receiver, message_chatroom,
                  message_created_at, message_is_read=False, message_edited_at=None):
@@ -1,4 +1,13 @@
-from db_init import db
+from flask import current_app
+from sqlalchemy import event, inspect, update
+from sqlalchemy.orm import Session, object_session
+from db_init import db, redis_store
+
+COUNT_VERSION_KEY = "count_version:{}"
+RESPONSE_CACHE_KEY = "response:{}:{}"
+RESPONSE_DEPENDENTS_KEY = "response_dependents:{}:{}:{}"
+RESPONSE_GENERATION_KEY = "response_generation"
+RESPONSE_CHANGED_KEY = "response_changed:{}:{}:{}"
 
 
 class ModelMixinQuerySimplifier:
@@ -13,3 +22,126 @@ class ModelMixinQuerySimplifier:
     @staticmethod
     def save_changes():
         db.session.commit()
+
+
+# Cached list counts are keyed by a per-table version, so bumping it after a commit drops all of them at once.
+# Core statements that change rows filtered or joined by list queries mark their tables the same way.
+def mark_table_changed(session, *table_names):
+    session.info.setdefault("changed_tables", set()).update(table_names)
+
+
+@event.listens_for(ModelMixinQuerySimplifier, "after_insert", propagate=True)
+@event.listens_for(ModelMixinQuerySimplifier, "after_delete", propagate=True)
+def track_changed_table(mapper, connection, target):
+    mark_table_changed(object_session(target), mapper.local_table.name)
+
+
+# A changed column can move the row into or out of a filtered list
+@event.listens_for(ModelMixinQuerySimplifier, "after_update", propagate=True)
+def track_updated_table(mapper, connection, target):
+    session = object_session(target)
+    if session.is_modified(target, include_collections=False):
+        mark_table_changed(session, mapper.local_table.name)
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_cached_counts(session):
+    for table_name in session.info.pop("changed_tables", set()):
+        redis_store.incr(COUNT_VERSION_KEY.format(table_name))
+
+
+# Cached responses are registered in dependents sets keyed by (table, column, value) of every row they embed:
+# its primary key, and the foreign key of the members of an embedded collection. A changed row drops the
+# cached responses of the sets of its primary and foreign keys, before and after the change. It is also marked
+# with a new generation, so a response built from the row read before the commit is not cached afterwards.
+def get_changed_row(model, primary_key):
+    primary_key_column = inspect(model).primary_key[0]
+    return primary_key_column.table.name, primary_key_column.name, primary_key
+
+
+def track_changed_row(session, model, primary_key):
+    session.info.setdefault("changed_rows", set()).add(get_changed_row(model, primary_key))
+
+
+def expire_changed_row(session, model, primary_key, attribute_names):
+    # Core statements are not seen by the model events, the loaded row and its cached responses are dropped here
+    track_changed_row(session, model, primary_key)
+
+    instance = session.identity_map.get(session.identity_key(model, primary_key))
+    if instance is not None:
+        session.expire(instance, attribute_names)
+
+
+@event.listens_for(ModelMixinQuerySimplifier, "after_insert", propagate=True)
+@event.listens_for(ModelMixinQuerySimplifier, "after_update", propagate=True)
+@event.listens_for(ModelMixinQuerySimplifier, "after_delete", propagate=True)
+def track_changed_rows(mapper, connection, target):
+    state = inspect(target)
+    changed_rows = state.session.info.setdefault("changed_rows", set())
+
+    for column in mapper.local_table.columns:
+        if not column.primary_key and not column.foreign_keys:
+            continue
+
+        history = state.attrs[mapper.get_property_by_column(column).key].history
+        for value in history.sum():
+            if value is not None:
+                changed_rows.add((column.table.name, column.name, value))
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_cached_responses(session):
+    drop_cached_responses(session.info.pop("changed_rows", set()))
+
+
+def drop_cached_responses(changed_rows):
+    dependents_keys = [RESPONSE_DEPENDENTS_KEY.format(*row) for row in changed_rows]
+    if not dependents_keys:
+        return
+
+    generation = redis_store.incr(RESPONSE_GENERATION_KEY)
+    timeout = current_app.config["RESPONSE_CACHE_TIMEOUT"]
+    pipeline = redis_store.pipeline()
+    for row in changed_rows:
+        pipeline.set(RESPONSE_CHANGED_KEY.format(*row), generation, ex=timeout)
+    for dependents_key in dependents_keys:
+        pipeline.smembers(dependents_key)
+    cache_keys = set().union(*pipeline.execute()[len(changed_rows):])
+
+    redis_store.delete(*cache_keys, *dependents_keys)
+
+
+# Denormalized counters are changed by an atomic "column = column + delta" update when the session flushes,
+# so concurrent requests do not overwrite each other's counts
+def change_counter(session, column, primary_key, delta):
+    if session is None or primary_key is None:
+        return
+
+    counter_deltas = session.info.setdefault("counter_deltas", {})
+    key = (column.class_, column.key, primary_key)
+    counter_deltas[key] = counter_deltas.get(key, 0) + delta
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def apply_counter_deltas(session, flush_context):
+    for (model, column_name, primary_key), delta in session.info.pop("counter_deltas", {}).items():
+        if not delta:
+            continue
+
+        column = getattr(model, column_name).property.columns[0]
+        session.connection().execute(
+            update(column.table).where(inspect(model).primary_key[0] == primary_key).values({column: column + delta})
+        )
+
+        track_changed_row(session, model, primary_key)
+
+        instance = session.identity_map.get(session.identity_key(model, primary_key))
+        if instance is not None and inspect(instance).persistent:
+            session.expire(instance, [column_name])
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_changed_tables(session):
+    session.info.pop("changed_tables", None)
+    session.info.pop("counter_deltas", None)
+    session.info.pop("changed_rows", None)
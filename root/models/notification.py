@@ -1,36 +1,372 @@
 from db_init import db
-from datetime import datetime
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, insert, select, update
 from sqlalchemy.event import listens_for
-from models.user import User
-from models.mixins import ModelMixinQuerySimplifier
-from tasks import send_mail
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session, object_session
+from app_init import socketio
+from db_init import redis_store
+from models.mixins import ModelMixinQuerySimplifier, mark_table_changed
+from tasks import dispatch_notifications
+
+# Committed notifications are pushed to the socket room of the receiver, and the number of unseen notifications
+# of a user is kept in Redis. A missing counter is counted from the database when it is read, changes of a
+# missing counter are skipped. The count is only stored when no transaction changing it was open while it was
+# counted: open ones are counted in the pending key, committed ones in the changes key, so a change is never
+# both missed by the stored count and skipped, nor both counted and applied to it.
+NOTIFICATIONS_ROOM = "notifications:{}"
+UNREAD_COUNT_KEY = "unread_notifications:{}"
+UNREAD_PENDING_KEY = "unread_notifications_pending:{}"
+UNREAD_CHANGES_KEY = "unread_notifications_changes:{}"
+
+# KEYS: the counter, the pending and the changes key. ARGV: the delta and the pending timeout.
+CHANGE_UNREAD_COUNT_SCRIPT = """
+redis.call('INCR', KEYS[3])
+redis.call('EXPIRE', KEYS[3], ARGV[2])
+if redis.call('DECR', KEYS[2]) <= 0 then
+    redis.call('DEL', KEYS[2])
+end
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('INCRBY', KEYS[1], ARGV[1])
+end
+"""
+
+# KEYS: the pending key of a rolled back transaction
+RELEASE_UNREAD_COUNT_SCRIPT = """
+if redis.call('DECR', KEYS[1]) <= 0 then
+    redis.call('DEL', KEYS[1])
+end
+"""
+
+# KEYS: the counter, the pending and the changes key. ARGV: the changes read before counting, the count and
+# the counter timeout.
+STORE_UNREAD_COUNT_SCRIPT = """
+if tonumber(redis.call('GET', KEYS[2]) or '0') > 0 or (redis.call('GET', KEYS[3]) or '') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3], 'NX')
+return 1
+"""
+
+change_unread_count_script = redis_store.register_script(CHANGE_UNREAD_COUNT_SCRIPT)
+release_unread_count_script = redis_store.register_script(RELEASE_UNREAD_COUNT_SCRIPT)
+store_unread_count_script = redis_store.register_script(STORE_UNREAD_COUNT_SCRIPT)
+
+NOTIFICATION_POST_LIKED = "post_liked"
+NOTIFICATION_POST_DISLIKED = "post_disliked"
+NOTIFICATION_POST_COMMENTED = "post_commented"
+NOTIFICATION_COMMENT_ANSWERED = "comment_answered"
+NOTIFICATION_USER_FOLLOWED = "user_followed"
+NOTIFICATION_TEXTS = {
+    NOTIFICATION_POST_LIKED: "Your post {subject} have been liked by {actors}.",
+    NOTIFICATION_POST_DISLIKED: "Your post {subject} have been disliked by {actors}.",
+    NOTIFICATION_POST_COMMENTED: "Your post {subject} have been commented by {actors}.",
+    NOTIFICATION_COMMENT_ANSWERED: "Your comment {subject} received an answer from {actors}!",
+    NOTIFICATION_USER_FOLLOWED: "{actors} followed you.",
+}
 
 
 class Notification(db.Model, ModelMixinQuerySimplifier):
     __tablename__ = "notifications"
+    __table_args__ = (
+        db.Index(
+            "ix_notifications_notification_receiver_notification_created_at",
+            "notification_receiver",
+            "notification_created_at"
+        ),
+        db.Index(
+            "ix_notifications_notification_receiver_notification_type_notification_target_id",
+            "notification_receiver",
+            "notification_type",
+            "notification_target_id"
+        ),
+        # Filters on the seen flag alone or with the receiver, the unread lists and counts
+        db.Index(
+            "ix_notifications_notification_is_seen_notification_receiver",
+            "notification_is_seen",
+            "notification_receiver"
+        ),
+    )
 
     notification_id = db.Column(db.Integer, primary_key=True)
-    notification_text = db.Column(db.String(100))
+    notification_text = db.Column(db.String(255))
     notification_receiver = db.Column(db.Integer, db.ForeignKey("users.user_id", ondelete="CASCADE"))
     notification_is_seen = db.Column(db.Boolean, default=False)
-    notification_created_at = db.Column(db.DateTime, default=datetime.utcnow().isoformat())
+    notification_created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     notification_sender_url = db.Column(db.String(100), nullable=True)
+    # Events of the same type on the same target are merged into one notification, which keeps the number of
+    # actors and the last NOTIFICATION_LAST_ACTORS of them, newest first
+    notification_type = db.Column(db.String(20), nullable=True, index=True)
+    notification_target_id = db.Column(db.Integer, nullable=True)
+    notification_actors_count = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    notification_actors = db.Column(db.JSON, nullable=True)
 
     def __init__(self, notification_text, notification_receiver, notification_is_seen=False,
-                 notification_sender_url=None):
+                 notification_sender_url=None, notification_type=None, notification_target_id=None,
+                 notification_actors=None):
         self.notification_text = notification_text
         self.notification_receiver = notification_receiver.user_id
         self.notification_is_seen = notification_is_seen
         self.notification_sender_url = notification_sender_url
+        self.notification_type = notification_type
+        self.notification_target_id = notification_target_id
+        self.notification_actors_count = 1
+        self.notification_actors = notification_actors
 
     def __repr__(self):
         return f"Notification {self.notification_id} to {self.notification_receiver}"
 
 
+def get_actors_text(actors, actors_count):
+    names = [f"{actor['user_name']} {actor['user_surname']}" for actor in actors]
+    if actors_count == 1:
+        return names[0]
+    if actors_count == 2 and len(names) == 2:
+        return f"{names[0]} and {names[1]}"
+
+    return f"{names[0]} and {actors_count - 1} others"
+
+
+def get_notification_text(notification_type, subject, actors, actors_count):
+    text = NOTIFICATION_TEXTS[notification_type].format(
+        subject=subject, actors=get_actors_text(actors, actors_count)
+    )
+    return text[:Notification.notification_text.type.length]
+
+
+def add_notification(session, receiver, notification_type, target_id, actor, subject, sender_url):
+    # An unseen notification of the same event on the same target, created in the last
+    # NOTIFICATION_AGGREGATION_WINDOW seconds, is updated instead of adding a new one, so its email is sent once.
+    # The row is locked, so concurrent events are counted one after another.
+    window_start = datetime.utcnow() - timedelta(seconds=current_app.config["NOTIFICATION_AGGREGATION_WINDOW"])
+    notification = session.execute(
+        select(Notification)
+        .where(
+            Notification.notification_receiver == receiver.user_id,
+            Notification.notification_type == notification_type,
+            Notification.notification_target_id == target_id,
+            Notification.notification_is_seen.is_(False),
+            Notification.notification_created_at >= window_start
+        )
+        .order_by(Notification.notification_id.desc())
+        .limit(1)
+        .with_for_update()
+    ).scalar()
+
+    actor_data = {"user_id": actor.user_id, "user_name": actor.user_name, "user_surname": actor.user_surname}
+    if notification is None:
+        notification = Notification(
+            notification_text=get_notification_text(notification_type, subject, [actor_data], 1),
+            notification_receiver=receiver,
+            notification_sender_url=sender_url,
+            notification_type=notification_type,
+            notification_target_id=target_id,
+            notification_actors=[actor_data]
+        )
+        session.add(notification)
+        return notification
+
+    # One of the last actors repeating the event, e.g. liking the post again after taking the like back, is not
+    # counted again
+    previous_actors = notification.notification_actors or []
+    if all(previous_actor["user_id"] != actor.user_id for previous_actor in previous_actors):
+        notification.notification_actors_count += 1
+
+    actors = [actor_data] + [previous for previous in previous_actors if previous["user_id"] != actor.user_id]
+    notification.notification_actors = actors[:current_app.config["NOTIFICATION_LAST_ACTORS"]]
+    notification.notification_text = get_notification_text(
+        notification_type, subject, notification.notification_actors, notification.notification_actors_count
+    )
+    return notification
+
+
+# Emails of new notifications are queued in the outbox by the transaction which inserts them, and sent by the
+# dispatch task after the commit, so a rolled back notification is never sent
+notification_outbox = db.Table(
+    "notification_outbox",
+    db.Column("outbox_id", db.Integer, primary_key=True),
+    db.Column(
+        "notification_id", db.Integer, db.ForeignKey("notifications.notification_id", ondelete="CASCADE"),
+        nullable=False, index=True
+    )
+)
+
+
 @listens_for(Notification, "after_insert")
-def send_notification_by_email(mapper, connection, target):
-    send_mail.delay(
-        subject="New notification has been received!",
-        recipients=[User.query.get(target.notification_receiver).user_email],
-        body=target.notification_text
+def queue_notification_email(mapper, connection, target):
+    object_session(target).info.setdefault("outbox_notification_ids", []).append(target.notification_id)
+
+
+@listens_for(Session, "after_flush_postexec")
+def write_notification_outbox(session, flush_context):
+    notification_ids = session.info.pop("outbox_notification_ids", [])
+    if notification_ids:
+        session.connection().execute(
+            insert(notification_outbox), [{"notification_id": _id} for _id in notification_ids]
+        )
+        session.info["outbox_changed"] = True
+
+
+@listens_for(Session, "after_commit")
+def start_notifications_dispatch(session):
+    if not session.info.pop("outbox_changed", False):
+        return
+
+    # The transaction is already committed, the beat task dispatches the outbox when the broker is not reachable
+    try:
+        dispatch_notifications.delay()
+    except Exception:
+        current_app.logger.exception("Notification dispatch could not be started")
+
+
+@listens_for(Session, "after_rollback")
+def discard_notification_changes(session):
+    session.info.pop("outbox_notification_ids", None)
+    session.info.pop("outbox_changed", None)
+    session.info.pop("unread_deltas", None)
+    session.info.pop("pushed_notifications", None)
+    for user_id in session.info.pop("unread_pending", set()):
+        release_unread_count_script(keys=[UNREAD_PENDING_KEY.format(user_id)])
+    session.info.pop("notification_payloads", None)
+
+
+def mark_notifications_seen(session, receiver_id, notification_ids=None, up_to_id=None):
+    # One UPDATE of the receiver's unseen notifications, by their ids or all up to an id
+    condition = (
+        Notification.notification_id.in_(notification_ids) if notification_ids is not None
+        else Notification.notification_id <= up_to_id
     )
+    seen_count = session.execute(
+        update(Notification)
+        .where(
+            Notification.notification_receiver == receiver_id, Notification.notification_is_seen.is_(False), condition
+        )
+        .values(notification_is_seen=True)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    change_unread_counts(session, {receiver_id: -seen_count})
+    if seen_count:
+        mark_table_changed(session, Notification.__tablename__)
+
+    return seen_count
+
+
+def delete_seen_notifications(session, created_before, batch_size):
+    # Deletes one batch of the oldest seen notifications, so every transaction locks a bounded number of rows
+    batch_ids = (
+        select(Notification.notification_id)
+        .where(Notification.notification_is_seen.is_(True), Notification.notification_created_at < created_before)
+        .order_by(Notification.notification_id)
+        .limit(batch_size)
+    )
+    deleted_count = session.execute(
+        delete(Notification)
+        .where(Notification.notification_id.in_(batch_ids))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if deleted_count:
+        mark_table_changed(session, Notification.__tablename__)
+
+    return deleted_count
+
+
+def get_unread_count(user_id):
+    # Every read extends the counter's lifetime, so only the counters of inactive users expire
+    unread_count_key = UNREAD_COUNT_KEY.format(user_id)
+    unread_count = redis_store.getex(unread_count_key, ex=current_app.config["UNREAD_COUNT_TIMEOUT"])
+    if unread_count is None:
+        changes = redis_store.get(UNREAD_CHANGES_KEY.format(user_id)) or b""
+        unread_count = Notification.query.filter_by(notification_receiver=user_id, notification_is_seen=False).count()
+        store_unread_count_script(
+            keys=[unread_count_key, UNREAD_PENDING_KEY.format(user_id), UNREAD_CHANGES_KEY.format(user_id)],
+            args=[changes, unread_count, current_app.config["UNREAD_COUNT_TIMEOUT"]]
+        )
+
+    return int(unread_count)
+
+
+def change_unread_counts(session, deltas):
+    # Counted in the session and applied after the commit, bulk updates and deletes add their own deltas. The
+    # first change of a user in the transaction marks the user's counter as pending until it ends.
+    unread_deltas = session.info.setdefault("unread_deltas", {})
+    pending_user_ids = session.info.setdefault("unread_pending", set())
+    pipeline = redis_store.pipeline()
+    for user_id, delta in deltas.items():
+        unread_deltas[user_id] = unread_deltas.get(user_id, 0) + delta
+        if user_id not in pending_user_ids:
+            pending_user_ids.add(user_id)
+            pipeline.incr(UNREAD_PENDING_KEY.format(user_id))
+            pipeline.expire(UNREAD_PENDING_KEY.format(user_id), current_app.config["UNREAD_COUNT_PENDING_TIMEOUT"])
+    pipeline.execute()
+
+
+@listens_for(Notification, "after_insert")
+def track_added_notification(mapper, connection, target):
+    if not target.notification_is_seen:
+        change_unread_counts(object_session(target), {target.notification_receiver: 1})
+    object_session(target).info.setdefault("pushed_notifications", []).append(target)
+
+
+@listens_for(Notification, "after_update")
+def track_changed_notification(mapper, connection, target):
+    state = sa_inspect(target)
+    was_seen = state.attrs.notification_is_seen.history.deleted
+    if was_seen and bool(was_seen[0]) != bool(target.notification_is_seen):
+        delta = -1 if target.notification_is_seen else 1
+        change_unread_counts(object_session(target), {target.notification_receiver: delta})
+
+    # Merged notifications are pushed again, seen ones are not
+    if state.attrs.notification_actors_count.history.has_changes():
+        object_session(target).info.setdefault("pushed_notifications", []).append(target)
+
+
+@listens_for(Notification, "after_delete")
+def track_deleted_notification(mapper, connection, target):
+    if not target.notification_is_seen:
+        change_unread_counts(object_session(target), {target.notification_receiver: -1})
+
+
+@listens_for(Session, "after_flush_postexec")
+def dump_pushed_notifications(session, flush_context):
+    # Committed instances are expired, so the pushed data is dumped while they are still loaded
+    from schemas import NotificationGetSchema  # schemas import models
+
+    pushed_notifications = session.info.pop("pushed_notifications", [])
+    if not pushed_notifications:
+        return
+
+    notification_schema = NotificationGetSchema(exclude=("receiver",))
+    payloads = session.info.setdefault("notification_payloads", {})
+    for notification in pushed_notifications:
+        payloads[notification.notification_id] = (
+            notification.notification_receiver, notification_schema.dump(notification)
+        )
+
+
+@listens_for(Session, "after_commit")
+def push_committed_notifications(session):
+    unread_deltas = session.info.pop("unread_deltas", {})
+    pending_user_ids = session.info.pop("unread_pending", set())
+    payloads = session.info.pop("notification_payloads", {})
+    if not pending_user_ids and not payloads:
+        return
+
+    user_ids = list(pending_user_ids)
+    pipeline = redis_store.pipeline()
+    for user_id in user_ids:
+        change_unread_count_script(
+            keys=[
+                UNREAD_COUNT_KEY.format(user_id), UNREAD_PENDING_KEY.format(user_id),
+                UNREAD_CHANGES_KEY.format(user_id)
+            ],
+            args=[unread_deltas.get(user_id, 0), current_app.config["UNREAD_COUNT_PENDING_TIMEOUT"]],
+            client=pipeline
+        )
+    unread_counts = pipeline.execute() if user_ids else []
+
+    for receiver_id, payload in payloads.values():
+        socketio.emit("notification", payload, to=NOTIFICATIONS_ROOM.format(receiver_id))
+    for user_id, unread_count in zip(user_ids, unread_counts):
+        if unread_count is not None and unread_deltas.get(user_id):
+            socketio.emit("unread_count", {"unread_count": unread_count}, to=NOTIFICATIONS_ROOM.format(user_id))
@@ -1,42 +1,60 @@
 from db_init import db
 from datetime import datetime
+from sqlalchemy import and_, case, cast, delete, event, func, select, tuple_, update
+from sqlalchemy.orm import object_session
+from sqlalchemy.dialects.postgresql import insert
 from models.file import File
-from models.mixins import ModelMixinQuerySimplifier
+from models.user import User
+from models.mixins import ModelMixinQuerySimplifier, change_counter, expire_changed_row, mark_table_changed
 
+VOTE_LIKE = 1
+VOTE_DISLIKE = -1
 
-user_likes_post = db.Table(
-    "user_likes_post",
-    db.Column("user_id", db.Integer, db.ForeignKey("users.user_id")),
-    db.Column("post_id", db.Integer, db.ForeignKey("posts.post_id"))
-)
-
-user_dislikes_post = db.Table(
-    "user_dislikes_post",
-    db.Column("user_id", db.Integer, db.ForeignKey("users.user_id")),
-    db.Column("post_id", db.Integer, db.ForeignKey("posts.post_id"))
+# One row per vote of a user on a post, the unique constraint makes a second vote of the same user on the post
+# a conflict of the insert instead of a lookup in the list of the post's voters
+post_votes = db.Table(
+    "post_votes",
+    db.Column("user_id", db.Integer, db.ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False),
+    db.Column("post_id", db.Integer, db.ForeignKey("posts.post_id", ondelete="CASCADE"), nullable=False, index=True),
+    db.Column("vote", db.SmallInteger, nullable=False),
+    db.UniqueConstraint("user_id", "post_id", name="uq_post_votes_user_id_post_id")
 )
 
 
 class Post(db.Model, ModelMixinQuerySimplifier):
     __tablename__ = "posts"
+    __table_args__ = (db.Index("ix_posts_post_author_post_created_at", "post_author", "post_created_at"),)
 
     post_id = db.Column(db.Integer, primary_key=True)
     post_heading = db.Column(db.String(100), nullable=False)
     post_text = db.Column(db.String(2500), nullable=False)
-    post_created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    post_created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
     post_modified_at = db.Column(db.DateTime, nullable=True, default=None)
     post_author = db.Column(db.Integer, db.ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False)
     post_comments = db.relationship("Comment", backref="post", cascade="all, delete", lazy=True)
+    post_comments_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
     post_likes = db.Column(db.Integer, default=0)
     post_dislikes = db.Column(db.Integer, default=0)
-    post_rating = db.Column(db.Float, default=0)
-    post_liked_by = db.relationship("User", secondary=user_likes_post, backref="user_liked_posts")
-    post_disliked_by = db.relationship("User", secondary=user_dislikes_post, backref="user_disliked_posts")
-    post_image_id = db.Column(db.Integer, db.ForeignKey("files.file_id", ondelete="CASCADE"), nullable=True)
+    post_rating = db.Column(db.Float, default=0, index=True)
+    post_liked_by = db.relationship(
+        "User", secondary=post_votes, viewonly=True,
+        primaryjoin=lambda: and_(Post.post_id == post_votes.c.post_id, post_votes.c.vote == VOTE_LIKE),
+        secondaryjoin=lambda: User.user_id == post_votes.c.user_id,
+        backref=db.backref("user_liked_posts", viewonly=True)
+    )
+    post_disliked_by = db.relationship(
+        "User", secondary=post_votes, viewonly=True,
+        primaryjoin=lambda: and_(Post.post_id == post_votes.c.post_id, post_votes.c.vote == VOTE_DISLIKE),
+        secondaryjoin=lambda: User.user_id == post_votes.c.user_id,
+        backref=db.backref("user_disliked_posts", viewonly=True)
+    )
+    post_image_id = db.Column(
+        db.Integer, db.ForeignKey("files.file_id", ondelete="CASCADE"), nullable=True, index=True
+    )
     post_image = db.relationship("File", backref="image_in_post", cascade="all, delete",
                                  lazy=True, foreign_keys=[post_image_id])
     post_files = db.relationship("File", backref="post", cascade="all, delete",
-                                 lazy='dynamic',  foreign_keys=[File.file_post_id])
+                                 lazy=True, foreign_keys=[File.file_post_id])
 
     def __init__(self, post_heading: str, post_text: str, post_created_at: str,
                  post_author: int, post_modified_at=None, post_image=None, post_files=None):
@@ -53,3 +71,135 @@ class Post(db.Model, ModelMixinQuerySimplifier):
 
     def __repr__(self):
         return f"Post({self.post_id} {self.post_heading})"
+
+
+def get_post_rating(likes, dislikes):
+    # Share of likes in percent, 0 for a post without votes
+    return case(
+        (likes + dislikes == 0, 0.0),
+        else_=func.round(cast(likes * 100, db.Numeric) / (likes + dislikes), 2)
+    )
+
+
+def get_post_vote(session, post_id, user_id):
+    return session.execute(
+        select(post_votes.c.vote).where(post_votes.c.user_id == user_id, post_votes.c.post_id == post_id)
+    ).scalar()
+
+
+def save_post_votes(session, votes):
+    # Writes the final votes of (user_id, post_id) pairs, a None vote removes the pair's row
+    cast_votes = [
+        {"user_id": user_id, "post_id": post_id, "vote": vote}
+        for (user_id, post_id), vote in votes.items() if vote is not None
+    ]
+    removed_votes = [pair for pair, vote in votes.items() if vote is None]
+
+    if cast_votes:
+        statement = insert(post_votes)
+        session.execute(
+            statement.on_conflict_do_update(
+                index_elements=["user_id", "post_id"], set_={"vote": statement.excluded.vote}
+            ),
+            cast_votes
+        )
+
+    if removed_votes:
+        session.execute(
+            delete(post_votes).where(tuple_(post_votes.c.user_id, post_votes.c.post_id).in_(removed_votes))
+        )
+
+    if votes:
+        mark_table_changed(session, post_votes.name)
+
+
+def vote_post(session, post_id, user_id, vote):
+    # Sets the vote of the user on the post, None removes it, and returns the previous vote. Counters of the post
+    # and of the user are changed by the difference of the votes, without counting the votes of the post.
+    if vote is None:
+        previous_vote = session.execute(
+            delete(post_votes)
+            .where(post_votes.c.user_id == user_id, post_votes.c.post_id == post_id)
+            .returning(post_votes.c.vote)
+        ).scalar()
+    else:
+        previous_vote = None
+        inserted = session.execute(
+            insert(post_votes)
+            .values(user_id=user_id, post_id=post_id, vote=vote)
+            .on_conflict_do_nothing(index_elements=["user_id", "post_id"])
+            .returning(post_votes.c.vote)
+        ).scalar()
+
+        if inserted is None:
+            # Votes are either a like or a dislike, so a changed vote was the opposite one
+            changed = session.execute(
+                update(post_votes)
+                .where(post_votes.c.user_id == user_id, post_votes.c.post_id == post_id, post_votes.c.vote != vote)
+                .values(vote=vote)
+                .returning(post_votes.c.vote)
+            ).scalar()
+            previous_vote = vote if changed is None else -vote
+
+    if previous_vote == vote:
+        return previous_vote
+
+    mark_table_changed(session, post_votes.name)
+
+    likes_delta = (vote == VOTE_LIKE) - (previous_vote == VOTE_LIKE)
+    dislikes_delta = (vote == VOTE_DISLIKE) - (previous_vote == VOTE_DISLIKE)
+    apply_vote_deltas(session, {post_id: (likes_delta, dislikes_delta)}, {user_id: (likes_delta, dislikes_delta)})
+
+    return previous_vote
+
+
+def apply_vote_deltas(session, post_deltas, user_deltas):
+    # Every post and user takes a single "column = column + delta" update, which also recomputes the rating
+    mark_table_changed(session, Post.__tablename__, User.__tablename__)
+    likes = func.coalesce(Post.post_likes, 0)
+    dislikes = func.coalesce(Post.post_dislikes, 0)
+
+    for post_id, (likes_delta, dislikes_delta) in post_deltas.items():
+        if not likes_delta and not dislikes_delta:
+            continue
+
+        session.execute(
+            update(Post.__table__)
+            .where(Post.post_id == post_id)
+            .values(
+                post_likes=likes + likes_delta,
+                post_dislikes=dislikes + dislikes_delta,
+                post_rating=get_post_rating(likes + likes_delta, dislikes + dislikes_delta)
+            )
+        )
+        expire_changed_row(session, Post, post_id, ["post_likes", "post_dislikes", "post_rating"])
+
+    for user_id, (likes_delta, dislikes_delta) in user_deltas.items():
+        if not likes_delta and not dislikes_delta:
+            continue
+
+        session.execute(
+            update(User.__table__)
+            .where(User.user_id == user_id)
+            .values(
+                user_liked_posts_count=User.user_liked_posts_count + likes_delta,
+                user_disliked_posts_count=User.user_disliked_posts_count + dislikes_delta
+            )
+        )
+        expire_changed_row(session, User, user_id, ["user_liked_posts_count", "user_disliked_posts_count"])
+
+
+# Votes of a deleted post are removed by the cascade of the database, so the voters' counters are taken back
+# before the post row is deleted
+@event.listens_for(Post, "before_delete")
+def count_removed_post_votes(mapper, connection, target):
+    session = object_session(target)
+    votes = connection.execute(
+        select(post_votes.c.user_id, post_votes.c.vote).where(post_votes.c.post_id == target.post_id)
+    ).all()
+    for user_id, vote in votes:
+        column = User.user_liked_posts_count if vote == VOTE_LIKE else User.user_disliked_posts_count
+        change_counter(session, column, user_id, -1)
+
+    if votes:
+        mark_table_changed(session, post_votes.name)
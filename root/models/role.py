@@ -4,9 +4,12 @@ from models.mixins import ModelMixinQuerySimplifier
 
 class Role(db.Model, ModelMixinQuerySimplifier):
     __tablename__ = "user_roles"
+    __table_args__ = (
+        db.Index("ix_user_roles_role_name_pattern", "role_name", postgresql_ops={"role_name": "varchar_pattern_ops"}),
+    )
 
     role_id = db.Column(db.Integer, primary_key=True)
-    role_name = db.Column(db.String(50), nullable=False)
+    role_name = db.Column(db.String(50), nullable=False, index=True)
     role_users = db.relationship("User", backref="role", cascade="all, delete", lazy=True)
 
     def __init__(self, role_name: str):
@@ -4,14 +4,26 @@ from models.mixins import ModelMixinQuerySimplifier
 
 class University(db.Model, ModelMixinQuerySimplifier):
     __tablename__ = "universities"
+    __table_args__ = (
+        db.Index(
+            "ix_universities_university_name_pattern", "university_name",
+            postgresql_ops={"university_name": "varchar_pattern_ops"}
+        ),
+        db.Index(
+            "ix_universities_university_email_pattern", "university_email",
+            postgresql_ops={"university_email": "varchar_pattern_ops"}
+        ),
+    )
 
     university_id = db.Column(db.Integer, primary_key=True)
-    university_name = db.Column(db.String(60), nullable=False)
+    university_name = db.Column(db.String(60), nullable=False, index=True)
     university_email = db.Column(db.String(100), nullable=False, unique=True)
     university_phone = db.Column(db.String(50), nullable=False)
     university_users = db.relationship("User", backref="university", cascade="all, delete", lazy=True)
     university_faculties = db.relationship("Faculty", backref="university", cascade="all, delete", lazy=True)
-    university_image_id = db.Column(db.Integer, db.ForeignKey("files.file_id", ondelete="CASCADE"), nullable=True)
+    university_image_id = db.Column(
+        db.Integer, db.ForeignKey("files.file_id", ondelete="CASCADE"), nullable=True, index=True
+    )
     university_image = db.relationship("File", backref="uploaded_by_uni", cascade="all, delete", lazy=True)
 
     def __init__(self, university_name: str, university_email: str, university_phone: str, university_image=None):
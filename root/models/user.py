@@ -1,34 +1,55 @@
 from db_init import db
-from models.mixins import ModelMixinQuerySimplifier
+from sqlalchemy import case, delete, update
+from sqlalchemy.dialects.postgresql import insert
+from models.mixins import ModelMixinQuerySimplifier, expire_changed_row, mark_table_changed
 
 
 user_follower = db.Table(
     "user_follower",
     db.Column("user_id", db.Integer, db.ForeignKey("users.user_id")),
-    db.Column("follower_id", db.Integer, db.ForeignKey("users.user_id"))
+    db.Column("follower_id", db.Integer, db.ForeignKey("users.user_id"), index=True),
+    db.UniqueConstraint("user_id", "follower_id", name="uq_user_follower_user_id_follower_id")
 )
 
 
 class User(db.Model, ModelMixinQuerySimplifier):
     __tablename__ = "users"
+    # The prefix filter compiles to LIKE 'x%', which only a pattern ops index serves under a non-C collation
+    __table_args__ = (
+        db.Index("ix_users_user_name_pattern", "user_name", postgresql_ops={"user_name": "varchar_pattern_ops"}),
+        db.Index(
+            "ix_users_user_surname_pattern", "user_surname", postgresql_ops={"user_surname": "varchar_pattern_ops"}
+        ),
+        db.Index("ix_users_user_email_pattern", "user_email", postgresql_ops={"user_email": "varchar_pattern_ops"}),
+    )
 
     user_id = db.Column(db.Integer, primary_key=True)
-    user_name = db.Column(db.String(50), nullable=False)
+    user_name = db.Column(db.String(50), nullable=False, index=True)
     user_birthday = db.Column(db.DateTime, nullable=True)
     user_tg_link = db.Column(db.String(200), nullable=True, unique=True)
-    user_enrolment_year = db.Column(db.DateTime, nullable=False)
-    user_surname = db.Column(db.String(50), nullable=False)
+    user_enrolment_year = db.Column(db.DateTime, nullable=False, index=True)
+    user_surname = db.Column(db.String(50), nullable=False, index=True)
     user_card_id = db.Column(db.String(15), nullable=False)
     user_email = db.Column(db.String(150), unique=True, nullable=False)
     user_phone = db.Column(db.String(50), unique=True, nullable=True)
     user_password = db.Column(db.String(250))
-    user_image_id = db.Column(db.Integer, db.ForeignKey("files.file_id", ondelete="CASCADE"), nullable=True)
+    user_followers_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    user_following_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    user_liked_posts_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    user_disliked_posts_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    user_image_id = db.Column(
+        db.Integer, db.ForeignKey("files.file_id", ondelete="CASCADE"), nullable=True, index=True
+    )
     user_image = db.relationship("File", backref="uploaded_by_user", cascade="all, delete", lazy=True)
-    user_role = db.Column(db.Integer, db.ForeignKey("user_roles.role_id", ondelete="CASCADE"), nullable=False)
+    user_role = db.Column(
+        db.Integer, db.ForeignKey("user_roles.role_id", ondelete="CASCADE"), nullable=False, index=True
+    )
     user_university = db.Column(
-        db.Integer, db.ForeignKey("universities.university_id", ondelete="CASCADE"), nullable=False
+        db.Integer, db.ForeignKey("universities.university_id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    user_faculty = db.Column(
+        db.Integer, db.ForeignKey("faculties.faculty_id", ondelete="CASCADE"), nullable=True, index=True
     )
-    user_faculty = db.Column(db.Integer, db.ForeignKey("faculties.faculty_id", ondelete="CASCADE"), nullable=True)
     user_posts = db.relationship("Post", backref="author", cascade="all, delete", lazy=True)
     user_comments = db.relationship("Comment", backref="author", cascade="all, delete", lazy=True)
     user_notifications = db.relationship("Notification", backref="receiver", cascade="all, delete", lazy=True)
@@ -74,3 +95,47 @@ class User(db.Model, ModelMixinQuerySimplifier):
 
     def __repr__(self):
         return f"{self.user_name}: {self.user_email}"
+
+
+# Follows are single statements on user_follower: the unique constraint turns an existing follow into a conflict
+# of the insert, and the delete reports whether there was one, so no follower list is loaded to check it
+def add_follower(session, user_id, follower_id):
+    is_added = session.execute(
+        insert(user_follower)
+        .values(user_id=user_id, follower_id=follower_id)
+        .on_conflict_do_nothing(index_elements=["user_id", "follower_id"])
+        .returning(user_follower.c.user_id)
+    ).scalar() is not None
+
+    if is_added:
+        change_follow_counters(session, user_id, follower_id, 1)
+
+    return is_added
+
+
+def remove_follower(session, user_id, follower_id):
+    is_removed = session.execute(
+        delete(user_follower)
+        .where(user_follower.c.user_id == user_id, user_follower.c.follower_id == follower_id)
+        .returning(user_follower.c.user_id)
+    ).scalar() is not None
+
+    if is_removed:
+        change_follow_counters(session, user_id, follower_id, -1)
+
+    return is_removed
+
+
+def change_follow_counters(session, user_id, follower_id, delta):
+    mark_table_changed(session, user_follower.name, User.__tablename__)
+    # Both users take the change in one update, in the transaction of the follow itself
+    session.execute(
+        update(User.__table__)
+        .where(User.user_id.in_((user_id, follower_id)))
+        .values(
+            user_followers_count=User.user_followers_count + case((User.user_id == user_id, delta), else_=0),
+            user_following_count=User.user_following_count + case((User.user_id == follower_id, delta), else_=0)
+        )
+    )
+    expire_changed_row(session, User, user_id, ["user_followers_count", "user_followers"])
+    expire_changed_row(session, User, follower_id, ["user_following_count", "user_following"])
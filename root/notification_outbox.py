@@ -0,0 +1,51 @@
+from sqlalchemy import delete, select
+from db_init import db
+from models import Notification, User
+from models.notification import notification_outbox
+from flask import current_app
+from tasks import send_mails
+
+NOTIFICATION_EMAIL_SUBJECT = "New notification has been received!"
+
+
+def take_outbox_batch(batch_size):
+    # Locked rows are skipped, so concurrent dispatches send different batches
+    return db.session.execute(
+        select(notification_outbox.c.outbox_id, Notification.notification_text, User.user_email)
+        .join(Notification, Notification.notification_id == notification_outbox.c.notification_id)
+        .outerjoin(User, User.user_id == Notification.notification_receiver)
+        .order_by(notification_outbox.c.outbox_id)
+        .limit(batch_size)
+        .with_for_update(of=notification_outbox, skip_locked=True)
+    ).all()
+
+
+def dispatch_outbox(batch_size):
+    # A batch is removed from the outbox in the transaction which queued its emails, a failed one stays there
+    # for the next dispatch. Emails are queued in chunks of MAIL_BATCH_SIZE, which are sent over one connection.
+    dispatched = 0
+    while True:
+        rows = take_outbox_batch(batch_size)
+        if not rows:
+            db.session.commit()
+            return dispatched
+
+        messages = [
+            {"subject": NOTIFICATION_EMAIL_SUBJECT, "recipients": [user_email], "body": notification_text}
+            for _, notification_text, user_email in rows if user_email
+        ]
+        mail_batch_size = current_app.config["MAIL_BATCH_SIZE"]
+
+        try:
+            for start in range(0, len(messages), mail_batch_size):
+                send_mails.delay(messages[start:start + mail_batch_size])
+
+            db.session.execute(
+                delete(notification_outbox).where(notification_outbox.c.outbox_id.in_([row[0] for row in rows]))
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        dispatched += len(rows)
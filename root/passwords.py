@@ -0,0 +1,52 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordHasher:
+    # Key derivation runs in a fixed size process pool, so a burst of registrations or logins keeps the CPU bound
+    # work out of the request threads of the worker, and at most PASSWORD_HASH_WORKERS hashes run at once
+    def __init__(self):
+        self.executor = None
+        self.executor_pid = None
+        self.lock = threading.Lock()
+
+    def get_executor(self):
+        # Pool processes belong to the process which started them, so every forked worker starts its own pool
+        if self.executor_pid != os.getpid():
+            with self.lock:
+                if self.executor_pid != os.getpid():
+                    self.executor = ProcessPoolExecutor(max_workers=current_app.config["PASSWORD_HASH_WORKERS"])
+                    self.executor_pid = os.getpid()
+
+        return self.executor
+
+    def run(self, function, *args):
+        try:
+            return self.get_executor().submit(function, *args).result()
+        except BrokenProcessPool:
+            # A killed pool process breaks the whole pool, the next call starts a new one
+            self.executor_pid = None
+            raise
+
+    def hash(self, password):
+        return self.run(
+            generate_password_hash,
+            password,
+            current_app.config["PASSWORD_HASH_METHOD"],
+            current_app.config["PASSWORD_HASH_SALT_LENGTH"]
+        )
+
+    def check(self, password_hash, password):
+        return self.run(check_password_hash, password_hash, password)
+
+    @staticmethod
+    def needs_rehash(password_hash):
+        # Hashes start with the method they were made with, e.g. "pbkdf2:sha256:260000$salt$hash"
+        return password_hash.split("$", 1)[0] != current_app.config["PASSWORD_HASH_METHOD"]
+
+
+password_hasher = PasswordHasher()
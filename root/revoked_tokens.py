@@ -0,0 +1,177 @@
+import os
+import math
+import time
+import hashlib
+import threading
+from datetime import timedelta
+from flask import current_app
+from redis.exceptions import RedisError
+from db_init import redis_store
+
+# Revoked jtis scored by the expiry of their token, and the per-user revocation epochs scored by their time:
+# tokens of a user issued before the epoch are revoked. Entries past the longest token lifetime are trimmed
+# on every write, so both sorted sets only hold what can still be presented.
+REVOKED_TOKENS_KEY = "revoked_jtis"
+REVOCATION_EPOCHS_KEY = "revocation_epochs"
+REVOKED_TOKENS_CHANNEL = "revoked_tokens"
+TOKEN_MESSAGE_PREFIX = "token:"
+EPOCH_MESSAGE_PREFIX = "user:"
+RESUBSCRIBE_DELAY = 1
+
+
+def get_max_token_lifetime(app):
+    # Seconds for which the longest lived token stays valid, None when tokens do not expire
+    lifetimes = []
+    for setting in ("JWT_ACCESS_TOKEN_EXPIRES", "JWT_REFRESH_TOKEN_EXPIRES"):
+        lifetime = app.config[setting]
+        if lifetime is False:
+            return None
+
+        lifetimes.append(lifetime.total_seconds() if isinstance(lifetime, timedelta) else lifetime)
+
+    return max(lifetimes)
+
+
+class BloomFilter:
+    # Has no false negatives: a revoked jti is always reported, an unknown one only with the given error rate
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def get_positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first_hash, second_hash = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little")
+        return [(first_hash + i * second_hash) % self.size for i in range(self.hash_count)]
+
+    def add(self, value):
+        for position in self.get_positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.get_positions(value))
+
+
+class RevokedTokenFilter:
+    # Local copy of the revoked jtis and revocation epochs of every worker process. It is rebuilt from Redis
+    # whenever the subscription to the revocation channel is (re)established, and receives the new revocations
+    # through it, so a revocation is never missed. Until the first build, and while the subscription is down,
+    # the filter is not ready and every token is checked in Redis.
+    def __init__(self):
+        self.bloom_filter = None
+        self.user_epochs = {}
+        self.listener_pid = None
+        self.lock = threading.Lock()
+
+    @property
+    def is_ready(self):
+        return self.bloom_filter is not None
+
+    def ensure_listening(self, app):
+        # Threads do not survive a fork, so every worker process starts its own listener
+        if self.listener_pid == os.getpid():
+            return
+
+        with self.lock:
+            if self.listener_pid != os.getpid():
+                self.bloom_filter = None
+                self.listener_pid = os.getpid()
+                threading.Thread(target=self.listen, args=(app,), daemon=True).start()
+
+    def listen(self, app):
+        while True:
+            pubsub = redis_store.pubsub()
+            try:
+                pubsub.subscribe(REVOKED_TOKENS_CHANNEL)
+                for message in pubsub.listen():
+                    if message["type"] == "subscribe":
+                        self.build(app)
+                    elif message["type"] == "message" and self.is_ready:
+                        self.add(message["data"].decode())
+            except RedisError:
+                self.bloom_filter = None
+                time.sleep(RESUBSCRIBE_DELAY)
+            finally:
+                pubsub.close()
+
+    def build(self, app):
+        now = time.time()
+        max_lifetime = get_max_token_lifetime(app)
+
+        pipeline = redis_store.pipeline()
+        pipeline.zrangebyscore(REVOKED_TOKENS_KEY, now, "+inf")
+        pipeline.zrangebyscore(
+            REVOCATION_EPOCHS_KEY, "-inf" if max_lifetime is None else now - max_lifetime, "+inf", withscores=True
+        )
+        revoked_jtis, user_epochs = pipeline.execute()
+
+        bloom_filter = BloomFilter(
+            max(app.config["REVOKED_TOKENS_FILTER_CAPACITY"], 2 * len(revoked_jtis)),
+            app.config["REVOKED_TOKENS_FILTER_ERROR_RATE"]
+        )
+        for jti in revoked_jtis:
+            bloom_filter.add(jti.decode())
+
+        self.user_epochs = {user_id.decode(): epoch for user_id, epoch in user_epochs}
+        self.bloom_filter = bloom_filter
+
+    def add(self, message):
+        if message.startswith(TOKEN_MESSAGE_PREFIX):
+            self.bloom_filter.add(message[len(TOKEN_MESSAGE_PREFIX):])
+        elif message.startswith(EPOCH_MESSAGE_PREFIX):
+            user_id, epoch = message[len(EPOCH_MESSAGE_PREFIX):].split(":")
+            self.user_epochs[user_id] = max(float(epoch), self.user_epochs.get(user_id, 0))
+
+
+revoked_token_filter = RevokedTokenFilter()
+
+
+def trim_revocations(pipeline, now):
+    pipeline.zremrangebyscore(REVOKED_TOKENS_KEY, "-inf", now)
+
+    max_lifetime = get_max_token_lifetime(current_app)
+    if max_lifetime is not None:
+        pipeline.zremrangebyscore(REVOCATION_EPOCHS_KEY, "-inf", now - max_lifetime)
+
+
+def revoke_token(token):
+    # Entry is written before the message is published, so a filter built in between has the jti as well
+    now = time.time()
+    pipeline = redis_store.pipeline()
+    trim_revocations(pipeline, now)
+    pipeline.zadd(REVOKED_TOKENS_KEY, {token["jti"]: token.get("exp", math.inf)})
+    pipeline.publish(REVOKED_TOKENS_CHANNEL, TOKEN_MESSAGE_PREFIX + token["jti"])
+    pipeline.execute()
+
+
+def revoke_user_tokens(user_id):
+    # One epoch per user revokes all of the user's sessions, instead of an entry per token. "iat" has whole
+    # seconds, so the epoch is the start of the current second: a token issued right after the revocation is
+    # kept, one issued earlier in the same second is kept as well.
+    now = time.time()
+    epoch = math.floor(now)
+    pipeline = redis_store.pipeline()
+    trim_revocations(pipeline, now)
+    pipeline.zadd(REVOCATION_EPOCHS_KEY, {str(user_id): epoch})
+    pipeline.publish(REVOKED_TOKENS_CHANNEL, f"{EPOCH_MESSAGE_PREFIX}{user_id}:{epoch}")
+    pipeline.execute()
+
+
+def is_token_revoked(token):
+    # Tokens issued before the second of the user's epoch are revoked
+    user_id = str(token[current_app.config["JWT_IDENTITY_CLAIM"]])
+
+    if current_app.config["REVOKED_TOKENS_FILTER_ENABLED"]:
+        revoked_token_filter.ensure_listening(current_app._get_current_object())
+        if revoked_token_filter.is_ready:
+            if token["iat"] < revoked_token_filter.user_epochs.get(user_id, 0):
+                return True
+            if token["jti"] not in revoked_token_filter.bloom_filter:
+                return False
+
+    pipeline = redis_store.pipeline(transaction=False)
+    pipeline.zscore(REVOKED_TOKENS_KEY, token["jti"])
+    pipeline.zscore(REVOCATION_EPOCHS_KEY, user_id)
+    revoked_until, user_epoch = pipeline.execute()
+
+    return revoked_until is not None or token["iat"] < (user_epoch or 0)
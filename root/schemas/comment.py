@@ -1,47 +1,44 @@
-from marshmallow import fields, validate, validates, ValidationError, EXCLUDE, pre_load
+from marshmallow import fields, validate, ValidationError, EXCLUDE, pre_load
 from models import User, Comment, Post
 from app_init import ma
+from schemas.compiled import CompiledDumpMixin
 from schemas.user import UserGetSchema
 from schemas.file import FileCreateSchema, FileGetSchema
-from utilities import instance_exists_by_id
+from schemas.validation import ReferenceValidationMixin, SessionInstanceMixin, get_existing_ids
 from text_templates import OBJECT_DOES_NOT_EXIST
 from db_init import db
 
 
-class CommentSchemaMixin:
+class CommentSchemaMixin(ReferenceValidationMixin):
     comment_author = fields.Integer(required=True)
     comment_post = fields.Integer(required=True)
     comment_image = fields.Nested(FileCreateSchema(), allow_none=True)
 
+    reference_fields = {
+        "author": (User, OBJECT_DOES_NOT_EXIST.format("User", "{}")),
+        "comment_post": (Post, OBJECT_DOES_NOT_EXIST.format("Post", "{}")),
+        "parent_comment": (Comment, OBJECT_DOES_NOT_EXIST.format("Comment", "{}"))
+    }
+
     @pre_load
     def serialize_data(self, data, **kwargs):
         image_file = data.get("comment_image")
 
-        if data.get("comment_parent"):
-            data["comment_parent"] = CommentGetSchema().dump(Comment.query.get(data["comment_parent"]))
+        # The parent is loaded by its id only, a missing one is rejected before the nested schema would create it.
+        # An existing one is already in the session, loaded with the other references.
+        parent_id = data.get("comment_parent")
+        if parent_id:
+            if parent_id not in get_existing_ids(Comment, [parent_id]):
+                raise ValidationError(OBJECT_DOES_NOT_EXIST.format("Comment", parent_id), "comment_parent")
+            data["comment_parent"] = {"comment_id": parent_id}
 
         if image_file:
             data["comment_image"] = {"file_raw": image_file}
 
         return data
 
-    @validates("comment_author")
-    def validate_comment_author(self, value):
-        if not instance_exists_by_id(_id=value, model=User):
-            raise ValidationError(OBJECT_DOES_NOT_EXIST.format("User", value))
-
-    @validates("comment_post")
-    def validate_comment_post(self, value):
-        if not instance_exists_by_id(_id=value, model=Post):
-            raise ValidationError(OBJECT_DOES_NOT_EXIST.format("Post", value))
-
-    @validates("comment_parent")
-    def validate_comment_parent(self, value):
-        if not instance_exists_by_id(_id=value, model=Comment):
-            raise ValidationError(OBJECT_DOES_NOT_EXIST.format("Comment", value))
-
 
-class CommentGetSchema(ma.SQLAlchemyAutoSchema):
+class CommentGetSchema(CompiledDumpMixin, SessionInstanceMixin, ma.SQLAlchemyAutoSchema):
     author = fields.Nested(UserGetSchema(only=("user_id", "user_name", "user_surname")), data_key="comment_author")
     parent_comment = fields.Nested("self", data_key="comment_parent",
                                    exclude=("parent_comment", "comment_post"))
@@ -63,7 +60,7 @@ class CommentCreateSchema(ma.SQLAlchemyAutoSchema, CommentSchemaMixin):
     comment_text = fields.Str(required=True, validate=validate.Length(min=1, max=250))
     comment_created_at = fields.DateTime(required=True)
     author = fields.Nested(UserGetSchema(only=("user_id",)), data_key="comment_author")
-    parent_comment = fields.Nested(CommentGetSchema(exclude=("parent_comment", "comment_post")),
+    parent_comment = fields.Nested(CommentGetSchema(only=("comment_id",)),
                                    data_key="comment_parent", allow_none=True)
 
     class Meta:
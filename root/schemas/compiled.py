@@ -0,0 +1,119 @@
+from datetime import date, datetime
+from flask import current_app
+from marshmallow import Schema, fields, missing
+from marshmallow.decorators import PRE_DUMP, POST_DUMP
+
+# Fast paths of the plain fields: a value of the expected type is dumped inline, anything else goes through
+# the field itself, so the output stays the same as marshmallow's
+SIMPLE_FIELD_EXPRESSIONS = {
+    fields.Integer: "value if value is None or value.__class__ is int else {field}._serialize(value, {attr}, obj)",
+    fields.Float: "value if value is None or value.__class__ is float else {field}._serialize(value, {attr}, obj)",
+    fields.String: "value if value is None or value.__class__ is str else {field}._serialize(value, {attr}, obj)",
+    fields.Boolean: "value if value is None or value.__class__ is bool else {field}._serialize(value, {attr}, obj)",
+    fields.DateTime: "None if value is None else value.isoformat() if value.__class__ is datetime "
+                     "else {field}._serialize(value, {attr}, obj)",
+    fields.Date: "None if value is None else value.isoformat() if value.__class__ is date "
+                 "else {field}._serialize(value, {attr}, obj)",
+}
+
+
+class CompiledDump:
+    def __init__(self, schema):
+        self.schema = schema
+        self.has_post_dump = schema._has_processors(POST_DUMP)
+        self.serialize = None
+
+    def __call__(self, obj, many):
+        result = [self.serialize(item) for item in obj] if many and obj is not None else self.serialize(obj)
+
+        if self.has_post_dump:
+            result = self.schema._invoke_dump_processors(POST_DUMP, result, many=many, original_data=obj)
+
+        return result
+
+
+def get_compiled_dump(schema):
+    # Compiled dump is kept on the schema instance; schemas with pre_dump hooks or a custom attribute getter
+    # are left to marshmallow
+    if "_compiled_dump" not in schema.__dict__:
+        supported = not schema._has_processors(PRE_DUMP) and type(schema).get_attribute is Schema.get_attribute
+        schema._compiled_dump = CompiledDump(schema) if supported else None
+
+        if schema._compiled_dump is not None:
+            schema._compiled_dump.serialize = compile_serialize(schema)
+
+    return schema._compiled_dump
+
+
+def get_nested_dump(field):
+    schema = field.schema
+    compiled_dump = get_compiled_dump(schema)
+    if compiled_dump is not None:
+        return compiled_dump
+
+    return lambda value, many: schema.dump(value, many=many)
+
+
+def get_field_expression(field, name, namespace):
+    field_type = type(field)
+
+    if field_type in (fields.DateTime, fields.Date) and (field.format or field.DEFAULT_FORMAT) not in ("iso", "iso8601"):
+        return None
+
+    if field_type in SIMPLE_FIELD_EXPRESSIONS and not getattr(field, "as_string", False):
+        return SIMPLE_FIELD_EXPRESSIONS[field_type].format(field=name, attr=repr(field.name))
+
+    if field_type is fields.Nested:
+        namespace[f"{name}_dump"] = get_nested_dump(field)
+        return f"None if value is None else {name}_dump(value, {bool(field.schema.many or field.many)})"
+
+    if field_type is fields.List and type(field.inner) is fields.Nested:
+        namespace[f"{name}_dump"] = get_nested_dump(field.inner)
+        many = bool(field.inner.schema.many or field.inner.many)
+        return f"None if value is None else [None if item is None else {name}_dump(item, {many}) for item in value]"
+
+    return None
+
+
+def compile_serialize(schema):
+    # Generates a plain function equal to schema._serialize of a single object for the schema dump fields
+    namespace = {"missing": missing, "date": date, "datetime": datetime, "schema": schema}
+    lines = [
+        "def serialize(obj):",
+        "    if hasattr(obj, '__getitem__'):",
+        "        return schema._serialize(obj, many=False)",
+        "    data = {}",
+    ]
+
+    for index, (attr_name, field) in enumerate(schema.dump_fields.items()):
+        name = f"field_{index}"
+        namespace[name] = field
+        key = repr(field.data_key if field.data_key is not None else attr_name)
+        attribute = field.attribute or attr_name
+        expression = get_field_expression(field, name, namespace)
+
+        if expression is None or "." in attribute or field.dump_default is not missing:
+            # Unsupported fields are serialized by marshmallow field by field
+            lines.append(f"    value = {name}.serialize({attr_name!r}, obj, accessor=schema.get_attribute)")
+            lines.append("    if value is not missing:")
+            lines.append(f"        data[{key}] = value")
+            continue
+
+        lines.append(f"    value = getattr(obj, {attribute!r}, missing)")
+        lines.append("    if value is not missing:")
+        lines.append(f"        data[{key}] = {expression}")
+
+    lines.append("    return data")
+
+    exec(compile("\n".join(lines), f"<compiled {type(schema).__name__}>", "exec"), namespace)
+
+    return namespace["serialize"]
+
+
+class CompiledDumpMixin:
+    def dump(self, obj, *, many=None):
+        compiled_dump = get_compiled_dump(self) if current_app.config["COMPILED_SERIALIZERS_ENABLED"] else None
+        if compiled_dump is None:
+            return super().dump(obj, many=many)
+
+        return compiled_dump(obj, self.many if many is None else bool(many))
@@ -1,20 +1,19 @@
-from marshmallow import fields, validates, ValidationError, EXCLUDE
+from marshmallow import fields, EXCLUDE
 from models import Faculty, University
 from app_init import ma
-from utilities import is_name_valid, instance_exists_by_id
+from schemas.compiled import CompiledDumpMixin
+from schemas.validation import ReferenceValidationMixin
+from utilities import is_name_valid
 
 
-class FacultySchemaMixin:
+class FacultySchemaMixin(ReferenceValidationMixin):
     faculty_name = fields.Str(required=False, validate=is_name_valid)
     faculty_university = fields.Integer(required=False)
 
-    @validates("faculty_university")
-    def validate_faculty_university(self, value):
-        if not instance_exists_by_id(_id=value, model=University):
-            raise ValidationError(f"University with id = {value} does not exist.")
+    reference_fields = {"faculty_university": (University, "University with id = {} does not exist.")}
 
 
-class FacultyGetSchema(ma.SQLAlchemyAutoSchema):
+class FacultyGetSchema(CompiledDumpMixin, ma.SQLAlchemyAutoSchema):
     class Meta:
         model = Faculty
         fields = ("faculty_id", "faculty_name", "faculty_university")
@@ -4,6 +4,7 @@ from werkzeug.utils import secure_filename
 from flask import url_for
 from models import File
 from app_init import ma
+from schemas.compiled import CompiledDumpMixin
 from marshmallow import fields, EXCLUDE, post_load
 from db_init import db
 
@@ -29,7 +30,7 @@ class FileCreateSchema(ma.SQLAlchemyAutoSchema):
         unknown = EXCLUDE
 
 
-class FileGetSchema(ma.SQLAlchemyAutoSchema):
+class FileGetSchema(CompiledDumpMixin, ma.SQLAlchemyAutoSchema):
     class Meta:
         model = File
         ordered = True
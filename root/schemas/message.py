@@ -1,30 +1,23 @@
 from app_init import ma
+from schemas.compiled import CompiledDumpMixin
 from db_init import db
 from models import Message, User
-from marshmallow import fields, validates, validate, ValidationError, EXCLUDE
-from utilities import instance_exists_by_id
+from marshmallow import fields, validate, EXCLUDE
+from schemas.validation import ReferenceValidationMixin
 from text_templates import OBJECT_DOES_NOT_EXIST
 from schemas.user import UserGetSchema
 
 
-class MessageSchemaMixin:
+class MessageSchemaMixin(ReferenceValidationMixin):
     message_text = fields.Str(required=True, validate=validate.Length(min=1, max=1000))
 
-    @classmethod
-    def validate_message_user(cls, value):
-        if not instance_exists_by_id(model=User, _id=value):
-            raise ValidationError(OBJECT_DOES_NOT_EXIST.format("User", value))
+    reference_fields = {
+        "sender": (User, OBJECT_DOES_NOT_EXIST.format("User", "{}")),
+        "receiver": (User, OBJECT_DOES_NOT_EXIST.format("User", "{}"))
+    }
 
-    @validates("message_sender")
-    def validate_message_sender(self, value):
-        self.validate_message_user(value)
 
-    @validates("message_receiver")
-    def validate_message_receiver(self, value):
-        self.validate_message_user(value)
-
-
-class MessageGetSchema(ma.SQLAlchemyAutoSchema):
+class MessageGetSchema(CompiledDumpMixin, ma.SQLAlchemyAutoSchema):
     sender = fields.Nested(UserGetSchema(only=("user_id", "user_name", "user_surname", "user_image")),
                            data_key="message_sender")
     receiver = fields.Nested(UserGetSchema(only=("user_id", "user_name", "user_surname", "user_image")),
@@ -1,11 +1,12 @@
 from models import Notification
 from schemas.user import UserGetSchema
 from app_init import ma
+from schemas.compiled import CompiledDumpMixin
 from marshmallow import fields
 from db_init import db
 
 
-class NotificationGetSchema(ma.SQLAlchemyAutoSchema):
+class NotificationGetSchema(CompiledDumpMixin, ma.SQLAlchemyAutoSchema):
     receiver = fields.Nested(
         UserGetSchema(only=("user_id", "user_name", "user_surname", "user_image")),
         data_key="notification_receiver"
@@ -15,7 +16,8 @@ class NotificationGetSchema(ma.SQLAlchemyAutoSchema):
         model = Notification
         ordered = True
         fields = ("notification_id", "notification_text", "receiver", "notification_created_at",
-                  "notification_is_seen", "notification_sender_url")
+                  "notification_is_seen", "notification_sender_url", "notification_type", "notification_target_id",
+                  "notification_actors_count", "notification_actors")
         load_instance = True
         include_relationships = True
         include_fk = True
@@ -1,17 +1,20 @@
-import json
-import urllib
-from marshmallow import fields, validate, validates, ValidationError, EXCLUDE, pre_load, post_dump
+from flask import current_app
+from marshmallow import fields, validate, EXCLUDE, pre_load, post_dump
 from schemas.user import UserGetSchema
 from schemas.file import FileCreateSchema, FileGetSchema
 from models import Post, User
 from app_init import ma
-from utilities import instance_exists_by_id
+from schemas.compiled import CompiledDumpMixin
+from schemas.validation import ReferenceValidationMixin
 from text_templates import OBJECT_DOES_NOT_EXIST
+from vote_counters import add_pending_votes
 
 
-class PostSchemaMixin:
+class PostSchemaMixin(ReferenceValidationMixin):
     post_image = fields.Nested(FileCreateSchema(), allow_none=True)
 
+    reference_fields = {"post_author": (User, OBJECT_DOES_NOT_EXIST.format("User", "{}"))}
+
     @pre_load
     def serialize_data(self, data, **kwargs):
         image_file = data.get("post_image")
@@ -25,32 +28,24 @@ class PostSchemaMixin:
 
         return data
 
-    @validates("post_author")
-    def validate_post_author(self, value):
-        if not instance_exists_by_id(_id=value, model=User):
-            raise ValidationError(OBJECT_DOES_NOT_EXIST.format("Post", value))
-
 
-class PostGetSchema(ma.SQLAlchemyAutoSchema):
+class PostGetSchema(CompiledDumpMixin, ma.SQLAlchemyAutoSchema):
     author = fields.Nested(UserGetSchema(only=("user_id", "user_name", "user_surname")), data_key="post_author")
     post_image = fields.Nested(FileGetSchema())
     post_files = fields.List(fields.Nested(FileGetSchema()))
 
-    def get_post_comments_link(self, post_data):
-        post_id = post_data.get("post_id")
-        filters = {"comment_post": post_id}
-        filters_json = json.dumps(filters)
-        encoded_filters = urllib.parse.quote(filters_json)
+    # Comments are not dumped with the post, only their count and a link to the paginated list
+    @post_dump
+    def add_comments_link(self, data, **kwargs):
+        if "post_id" in data and "post_comments_count" in data:
+            data["post_comments_link"] = f"/post/{data['post_id']}/comments"
 
-        return f'/comments?filters={encoded_filters}'
+        return data
 
-    @post_dump(pass_many=True)
-    def add_comments_links(self, data, many, **kwargs):
-        if many:
-            for post in data:
-                post["post_comments_link"] = self.get_post_comments_link(post)
-        else:
-            data["post_comments_link"] = self.get_post_comments_link(data)
+    @post_dump(pass_many=True, pass_original=True)
+    def add_live_vote_counters(self, data, original, many, **kwargs):
+        if current_app.config["POST_VOTES_WRITE_BEHIND_ENABLED"]:
+            add_pending_votes(data if many else [data], original if many else [original])
 
         return data
 
@@ -58,7 +53,7 @@ class PostGetSchema(ma.SQLAlchemyAutoSchema):
         model = Post
         ordered = True
         fields = ("post_id", "post_heading", "post_text", "post_rating", "post_image", "post_likes", "post_dislikes",
-                  "post_created_at", "post_modified_at", "author", "post_comments", "post_files")
+                  "post_created_at", "post_modified_at", "author", "post_comments_count", "post_files")
         include_relationships = True
         load_instance = True
         include_fk = True
@@ -1,10 +1,11 @@
 from marshmallow import fields, EXCLUDE
 from models import Role
 from app_init import ma
+from schemas.compiled import CompiledDumpMixin
 from utilities import is_name_valid
 
 
-class RoleGetSchema(ma.SQLAlchemyAutoSchema):
+class RoleGetSchema(CompiledDumpMixin, ma.SQLAlchemyAutoSchema):
     class Meta:
         model = Role
         fields = ("role_id", "role_name")
@@ -3,7 +3,9 @@ from models import University
 from schemas.faculty import FacultyGetSchema
 from schemas.file import FileGetSchema, FileCreateSchema
 from app_init import ma
+from schemas.compiled import CompiledDumpMixin
 from utilities import is_name_valid, is_email_valid, is_phone_valid
+from db_init import db
 
 
 class UniversitySchemaMixin:
@@ -19,11 +21,11 @@ class UniversitySchemaMixin:
 
     @validates("university_email")
     def validate_university_email(self, value):
-        if University.query.filter_by(university_email=value).first() is not None:
+        if db.session.query(University.query.filter_by(university_email=value).exists()).scalar():
             raise ValidationError("University with this email is already exists.")
 
 
-class UniversityGetSchema(ma.SQLAlchemyAutoSchema):
+class UniversityGetSchema(CompiledDumpMixin, ma.SQLAlchemyAutoSchema):
     university_faculties = fields.Nested(FacultyGetSchema(), many=True)
     university_image = fields.Nested(FileGetSchema())
 
@@ -1,20 +1,28 @@
-from marshmallow import fields, post_load, validates, ValidationError, EXCLUDE, pre_load
-from werkzeug.security import generate_password_hash
+from marshmallow import fields, post_load, post_dump, validates, ValidationError, EXCLUDE, pre_load
 from models import User, Role, Faculty, University
 from app_init import ma
+from schemas.compiled import CompiledDumpMixin
 from schemas.file import FileCreateSchema, FileGetSchema
 from schemas.university import UniversityGetSchema
 from schemas.role import RoleGetSchema
 from schemas.faculty import FacultyGetSchema
-from utilities import is_email_valid, instance_exists_by_id, is_phone_valid, is_name_valid, is_password_valid
+from schemas.validation import ReferenceValidationMixin, SessionInstanceMixin
+from utilities import is_email_valid, is_phone_valid, is_name_valid, is_password_valid
 from db_init import db
+from passwords import password_hasher
 
 
-class UserSchemaMixin:
+class UserSchemaMixin(ReferenceValidationMixin):
     user_tg_link = fields.Str(required=False, allow_none=True)
     user_phone = fields.Str(required=False, allow_none=True, validate=is_phone_valid)
     user_image = fields.Nested(FileCreateSchema(), allow_none=True)
 
+    reference_fields = {
+        "user_role": (Role, "Role with role_id = {} does not exist."),
+        "user_university": (University, "University with university_id = {} does not exist."),
+        "user_faculty": (Faculty, "Faculty with faculty_id = {} does not exist.")
+    }
+
     @pre_load
     def serialize_data(self, data, **kwargs):
         image_file = data.get("user_image")
@@ -25,51 +33,46 @@ class UserSchemaMixin:
 
     @validates("user_email")
     def validate_user_email(self, value):
-        if len(User.query.filter_by(user_email=value).all()):
+        if db.session.query(User.query.filter_by(user_email=value).exists()).scalar():
             raise ValidationError("User with this email already exists!")
 
     @validates("user_phone")
     def validate_user_phone(self, value):
-        if value and len(User.query.filter_by(user_phone=value).all()):
+        if value and db.session.query(User.query.filter_by(user_phone=value).exists()).scalar():
             raise ValidationError("User with this phone already exists!")
 
-    @validates("user_role")
-    def validate_user_role(self, value):
-        if not instance_exists_by_id(_id=value, model=Role):
-            raise ValidationError(f"Role with role_id = {value} does not exist.")
-
-    @validates("user_university")
-    def validate_user_university(self, value):
-        if not instance_exists_by_id(_id=value, model=University):
-            raise ValidationError(f"University with university_id = {value} does not exist.")
-
-    @validates("user_faculty")
-    def validate_user_faculty(self, value):
-        if not instance_exists_by_id(_id=value, model=Faculty):
-            raise ValidationError(f"Faculty with faculty_id = {value} does not exist.")
-
     @post_load
     def create_user_password_hash(self, data, **kwargs):
         if data.get("user_password"):
-            data["user_password"] = generate_password_hash(data["user_password"])
+            data["user_password"] = password_hasher.hash(data["user_password"])
 
         return data
 
 
-class UserGetSchema(ma.SQLAlchemyAutoSchema):
+class UserGetSchema(CompiledDumpMixin, SessionInstanceMixin, ma.SQLAlchemyAutoSchema):
     user_image = fields.Nested(FileGetSchema())
     university = fields.Nested(UniversityGetSchema(only=("university_id", "university_name")),
                                data_key="user_university")
     faculty = fields.Nested(FacultyGetSchema(only=("faculty_id", "faculty_name")), data_key="user_faculty")
     role = fields.Nested(RoleGetSchema(only=("role_id", "role_name")), data_key="user_role")
 
+    # Related users and posts are not dumped with the user, only their counts and links to the paginated lists
+    @post_dump
+    def add_relations_links(self, data, **kwargs):
+        user_id = data.get("user_id")
+        for relation in ("followers", "following", "liked_posts"):
+            if user_id is not None and f"user_{relation}_count" in data:
+                data[f"user_{relation}_link"] = f"/user/{user_id}/{relation}"
+
+        return data
+
     class Meta:
         model = User
         ordered = True
         fields = ("user_id", "user_name", "user_surname", "user_email", "user_card_id",
                   "user_birthday", "user_image", "role", "faculty", "university", "user_enrolment_year",
-                  "user_tg_link", "user_phone", "user_followers", "user_following", "user_liked_posts",
-                  "user_disliked_posts")
+                  "user_tg_link", "user_phone", "user_followers_count", "user_following_count",
+                  "user_liked_posts_count", "user_disliked_posts_count")
         include_relationships = True
         load_instance = True
         unknown = EXCLUDE
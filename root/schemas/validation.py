@@ -0,0 +1,138 @@
+from flask import current_app
+from marshmallow import fields, pre_load, validates_schema, ValidationError
+from sqlalchemy import inspect, select
+from db_init import db, redis_store
+from models import Role, University, Faculty
+from models.mixins import COUNT_VERSION_KEY
+
+# Ids of the reference data are cached in Redis sets keyed by the table version, which is bumped after every
+# committed insert or delete, so a deleted row is never reported as existing
+REFERENCE_MODELS = (Role, University, Faculty)
+REFERENCE_IDS_KEY = "reference_ids:{}:{}"
+
+
+def get_existing_ids(model, ids):
+    # Rows loaded in the session exist, the rest is looked up in the cache and then by one IN (...) query
+    mapper = inspect(model)
+    existing_ids = set()
+    for _id in ids:
+        instance = db.session.identity_map.get(mapper.identity_key_from_primary_key([_id]))
+        if instance is not None and not inspect(instance).expired:
+            existing_ids.add(_id)
+
+    missing_ids = list(set(ids) - existing_ids)
+    if not missing_ids:
+        return existing_ids
+
+    cache_key = None
+    if model in REFERENCE_MODELS:
+        table_name = mapper.local_table.name
+        cache_key = REFERENCE_IDS_KEY.format(table_name, int(redis_store.get(COUNT_VERSION_KEY.format(table_name)) or 0))
+        cached = redis_store.smismember(cache_key, missing_ids)
+        existing_ids.update(_id for _id, is_cached in zip(missing_ids, cached) if is_cached)
+        missing_ids = [_id for _id, is_cached in zip(missing_ids, cached) if not is_cached]
+        if not missing_ids:
+            return existing_ids
+
+    primary_key = mapper.primary_key[0]
+    found_ids = set(db.session.execute(select(primary_key).where(primary_key.in_(missing_ids))).scalars())
+
+    if cache_key is not None and found_ids:
+        pipeline = redis_store.pipeline()
+        pipeline.sadd(cache_key, *found_ids)
+        pipeline.expire(cache_key, current_app.config["REFERENCE_IDS_CACHE_TIMEOUT"])
+        pipeline.execute()
+
+    return existing_ids | found_ids
+
+
+def load_instances(model, ids):
+    # Loads the rows of the ids which are not in the session yet by one IN (...) query. The identity map does not
+    # keep unchanged instances alive, so they are also held by the session info until the session is closed.
+    mapper = inspect(model)
+    missing_ids = set()
+    for _id in ids:
+        instance = db.session.identity_map.get(mapper.identity_key_from_primary_key([_id]))
+        if instance is None or inspect(instance).expired:
+            missing_ids.add(_id)
+
+    if missing_ids:
+        instances = db.session.execute(select(model).where(mapper.primary_key[0].in_(missing_ids))).scalars().all()
+        db.session.info.setdefault("loaded_references", []).extend(instances)
+
+
+class SessionInstanceMixin:
+    # Nested schemas of references look the instance up in the session first, where it was loaded together with
+    # the other references of its model, instead of querying every one of them
+    def get_instance(self, data):
+        if self.transient:
+            return None
+
+        primary_key = [data.get(column.key) for column in inspect(self.opts.model).primary_key]
+        if None in primary_key:
+            return None
+
+        return self.session.get(self.opts.model, primary_key)
+
+
+class ReferenceValidationMixin:
+    # Referenced rows of the loaded data as {attribute: (model, error message)}, checked after all fields are loaded
+    # with one query per model. An attribute holds an id, or an instance loaded by a nested schema, which is a new
+    # (transient) one when the nested schema did not find it in the database. Rows of nested fields are loaded
+    # before the fields, so the nested schemas take them from the session.
+    reference_fields = {}
+
+    @pre_load(pass_many=True)
+    def load_nested_references(self, data, many, **kwargs):
+        ids = {}
+        for item in (data if many else [data]):
+            for name, field in self.load_fields.items():
+                reference = self.reference_fields.get(field.attribute or name)
+                if reference is None or not isinstance(field, fields.Nested) or not isinstance(item, dict):
+                    continue
+
+                model = reference[0]
+                value = item.get(field.data_key or name)
+                if isinstance(value, dict):
+                    value = value.get(inspect(model).primary_key[0].key)
+                if isinstance(value, int) and not isinstance(value, bool):
+                    ids.setdefault(model, set()).add(value)
+
+        for model, model_ids in ids.items():
+            load_instances(model, model_ids)
+
+        return data
+
+    @validates_schema(pass_many=True)
+    def validate_references(self, data, many, **kwargs):
+        items = data if many else [data]
+        ids = {model: set() for model, _ in self.reference_fields.values()}
+        for item in items:
+            for attribute, (model, _) in self.reference_fields.items():
+                if isinstance(item.get(attribute), int):
+                    ids[model].add(item[attribute])
+
+        existing_ids = {model: get_existing_ids(model, model_ids) for model, model_ids in ids.items() if model_ids}
+
+        errors = {}
+        for index, item in enumerate(items):
+            for attribute, (model, message) in self.reference_fields.items():
+                value = item.get(attribute)
+                if value is None or (isinstance(value, int) and value in existing_ids[model]):
+                    continue
+
+                if isinstance(value, int):
+                    _id = value
+                else:
+                    if inspect(value).persistent:
+                        continue
+                    _id = inspect(model).primary_key_from_instance(value)[0]
+
+                field_name = next(
+                    field.data_key or name for name, field in self.load_fields.items()
+                    if (field.attribute or name) == attribute
+                )
+                errors.setdefault(index, {})[field_name] = [message.format(_id)]
+
+        if errors:
+            raise ValidationError(errors if many else errors[0])
@@ -1,23 +1,58 @@
-import http_codes
-from flask_mail import Message
-from flask_restful import abort
 from celery import shared_task
-from typing import List
-from app_init import mail, celery
+from app_init import app, celery
 
 
-@shared_task(bind=True)
-def send_mail(self, recipients: List[str], subject: str, body: str, *args, **kwargs):
-    message = Message(
-        subject=subject,
-        recipients=recipients,
-        body=body,
-        sender="noreply@studenthub.com"
-    )
+@shared_task
+def send_mails(messages):
+    # Deferred messages are sent in the next second, failed ones are retried with a backoff
+    from mail_delivery import send_batch, get_retries
 
-    try:
-        mail.send(message)
-    except Exception as e:
-        abort(http_codes.HTTP_BAD_REQUEST_400, error_message=str(e))
+    sent, deferred, failed = send_batch(messages)
+    if deferred:
+        send_mails.apply_async((deferred,), countdown=1)
+    for delay, retried_messages in get_retries(failed).items():
+        send_mails.apply_async((retried_messages,), countdown=delay)
 
-    return "Done"
+    return sent
+
+
+# Bound to the app's Celery instance, since it is started after commits of async views as well
+@celery.task
+def dispatch_notifications():
+    from notification_outbox import dispatch_outbox
+
+    return dispatch_outbox(app.config["NOTIFICATION_OUTBOX_BATCH_SIZE"])
+
+
+@shared_task
+def purge_seen_notifications():
+    from datetime import datetime, timedelta
+    from db_init import db
+    from models.notification import delete_seen_notifications
+
+    created_before = datetime.utcnow() - timedelta(seconds=app.config["NOTIFICATION_RETENTION_PERIOD"])
+    batch_size = app.config["NOTIFICATION_PURGE_BATCH_SIZE"]
+    purged = 0
+    while True:
+        deleted_count = delete_seen_notifications(db.session, created_before, batch_size)
+        db.session.commit()
+        purged += deleted_count
+        if deleted_count < batch_size:
+            return purged
+
+
+@shared_task
+def flush_post_votes():
+    # Models import this module for sending mails, so the vote counters are imported on the first run
+    from vote_counters import flush_votes
+
+    return flush_votes(app.config["POST_VOTES_FLUSH_BATCH_SIZE"])
+
+
+# Bound to the app's Celery instance, since async views run in another thread, where a shared task resolves to
+# the default Celery app and its broker
+@celery.task
+def fan_out_post(post_id, author_id):
+    from timelines import push_post
+
+    return push_post(post_id, author_id)
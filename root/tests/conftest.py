@@ -0,0 +1,68 @@
+import os
+import sys
+from datetime import datetime
+
+import fakeredis
+import pytest
+import redis
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The config reads these when it is imported, the services behind them are replaced below
+for name, value in {
+    "SECRET_KEY": "test", "JWT_SECRET_KEY": "test" * 8, "POSTGRES_URL": "localhost", "POSTGRES_USER": "test",
+    "POSTGRES_PW": "test", "POSTGRES_DB": "test", "REDIS_HOST": "localhost", "REDIS_PORT": "6379", "REDIS_DB": "0",
+    "MAIL_USERNAME": "test", "MAIL_PASSWORD": "test", "CELERY_BROKER_URL": "memory://",
+    "CELERY_RESULT_BACKEND": "cache+memory://"
+}.items():
+    os.environ.setdefault(name, value)
+
+# Redis is faked for the whole app, the Lua scripts run on fakeredis with lupa
+redis.Redis = fakeredis.FakeRedis
+
+from app_init import app  # noqa: E402
+
+app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+app.config["TESTING"] = True
+
+from db_init import db, redis_store  # noqa: E402
+from models import Role, University, Faculty, User, Post  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def database():
+    db.create_all()
+    yield db
+    db.session.remove()
+    db.drop_all()
+    redis_store.flushdb()
+
+
+@pytest.fixture
+def user():
+    role = Role("student")
+    university = University("University", "university@example.com", "+380000000000")
+    db.session.add_all([role, university])
+    db.session.flush()
+    faculty = Faculty("Faculty", university.university_id)
+    db.session.add(faculty)
+    db.session.flush()
+
+    user = User(
+        user_name="name", user_surname="surname", user_email="user@example.com", user_card_id="1",
+        user_enrolment_year=datetime(2020, 9, 1), user_role=role.role_id, user_university=university.university_id,
+        user_faculty=faculty.faculty_id, user_password="password"
+    )
+    db.session.add(user)
+    db.session.commit()
+
+    return user
+
+
+@pytest.fixture
+def post(user):
+    post = Post(post_heading="heading", post_text="text", post_created_at=datetime(2023, 1, 1), post_author=user.user_id)
+    db.session.add(post)
+    db.session.commit()
+
+    return post
@@ -0,0 +1,127 @@
+import pytest
+from db_init import db, redis_store
+from models.post import VOTE_LIKE, VOTE_DISLIKE
+import vote_counters
+from vote_counters import (
+    CHANGED_POSTS_KEY, POST_VOTE_CHANGES_KEY, POST_VOTE_DELTAS_KEY, USER_VOTE_DELTAS_KEY,
+    flush_votes, get_pending_deltas, record_vote, restore_changes, take_changes
+)
+
+
+def get_counters(post, user):
+    db.session.expire_all()
+    return (
+        (post.post_likes or 0, post.post_dislikes or 0),
+        (user.user_liked_posts_count, user.user_disliked_posts_count)
+    )
+
+
+def test_vote_flip_and_unvote_change_deltas(post, user):
+    assert record_vote(post.post_id, user.user_id, VOTE_LIKE, None) is None
+    assert get_pending_deltas([post.post_id]) == {post.post_id: (1, 0)}
+
+    assert record_vote(post.post_id, user.user_id, VOTE_DISLIKE, None) == VOTE_LIKE
+    assert get_pending_deltas([post.post_id]) == {post.post_id: (0, 1)}
+
+    assert record_vote(post.post_id, user.user_id, None, None) == VOTE_DISLIKE
+    assert get_pending_deltas([post.post_id]) == {post.post_id: (0, 0)}
+
+    votes, post_deltas, user_deltas = take_changes(10)
+    assert votes == {(user.user_id, post.post_id): None}
+    assert post_deltas == {post.post_id: (0, 0)}
+    assert user_deltas == {user.user_id: (0, 0)}
+
+
+def test_repeated_vote_does_not_change_deltas(post, user):
+    record_vote(post.post_id, user.user_id, VOTE_LIKE, None)
+
+    assert record_vote(post.post_id, user.user_id, VOTE_LIKE, None) == VOTE_LIKE
+    assert get_pending_deltas([post.post_id]) == {post.post_id: (1, 0)}
+
+
+def test_stored_vote_is_the_previous_one(post, user):
+    # Redis does not know the vote, so the one of the database is changed
+    assert record_vote(post.post_id, user.user_id, VOTE_DISLIKE, VOTE_LIKE) == VOTE_LIKE
+    assert get_pending_deltas([post.post_id]) == {post.post_id: (-1, 1)}
+
+
+def test_take_changes_drains_changes(post, user):
+    record_vote(post.post_id, user.user_id, VOTE_LIKE, None)
+
+    votes, post_deltas, user_deltas = take_changes(10)
+    assert votes == {(user.user_id, post.post_id): VOTE_LIKE}
+    assert post_deltas == {post.post_id: (1, 0)}
+    assert user_deltas == {user.user_id: (1, 0)}
+
+    assert take_changes(10) == ({}, {}, {})
+    assert not redis_store.exists(
+        CHANGED_POSTS_KEY, USER_VOTE_DELTAS_KEY,
+        POST_VOTE_CHANGES_KEY.format(post.post_id), POST_VOTE_DELTAS_KEY.format(post.post_id)
+    )
+
+
+def test_vote_after_take_changes_goes_to_next_batch(post, user):
+    record_vote(post.post_id, user.user_id, VOTE_LIKE, None)
+    take_changes(10)
+
+    record_vote(post.post_id, user.user_id, VOTE_DISLIKE, None)
+
+    votes, post_deltas, user_deltas = take_changes(10)
+    assert votes == {(user.user_id, post.post_id): VOTE_DISLIKE}
+    assert post_deltas == {post.post_id: (-1, 1)}
+    assert user_deltas == {user.user_id: (-1, 1)}
+
+
+def test_restore_changes_keeps_newer_votes(post, user):
+    record_vote(post.post_id, user.user_id, VOTE_LIKE, None)
+    batch = take_changes(10)
+    record_vote(post.post_id, user.user_id, VOTE_DISLIKE, None)
+
+    restore_changes(*batch)
+
+    votes, post_deltas, user_deltas = take_changes(10)
+    assert votes == {(user.user_id, post.post_id): VOTE_DISLIKE}
+    assert post_deltas == {post.post_id: (0, 1)}
+    assert user_deltas == {user.user_id: (0, 1)}
+
+
+def test_failed_flush_restores_changes(post, user, monkeypatch):
+    record_vote(post.post_id, user.user_id, VOTE_LIKE, None)
+
+    def fail_apply_vote_deltas(*args):
+        raise RuntimeError("database is unavailable")
+
+    monkeypatch.setattr(vote_counters, "apply_vote_deltas", fail_apply_vote_deltas)
+    with pytest.raises(RuntimeError):
+        flush_votes(10)
+
+    assert get_counters(post, user) == ((0, 0), (0, 0))
+    assert get_pending_deltas([post.post_id]) == {post.post_id: (1, 0)}
+
+    monkeypatch.undo()
+    assert flush_votes(10) == 1
+    assert get_counters(post, user) == ((1, 0), (1, 0))
+
+
+def test_flush_votes_applies_changes_once(post, user):
+    record_vote(post.post_id, user.user_id, VOTE_LIKE, None)
+    record_vote(post.post_id, user.user_id, VOTE_DISLIKE, None)
+
+    assert flush_votes(10) == 1
+    assert get_counters(post, user) == ((0, 1), (0, 1))
+    assert post.post_rating == 0.0
+
+    assert flush_votes(10) == 0
+    assert get_counters(post, user) == ((0, 1), (0, 1))
+    assert get_pending_deltas([post.post_id]) == {post.post_id: (0, 0)}
+
+
+def test_deleted_post_takes_back_user_counters(post, user):
+    record_vote(post.post_id, user.user_id, VOTE_LIKE, None)
+    flush_votes(10)
+    assert get_counters(post, user) == ((1, 0), (1, 0))
+
+    post.delete()
+
+    db.session.expire_all()
+    assert (user.user_liked_posts_count, user.user_disliked_posts_count) == (0, 0)
@@ -0,0 +1,119 @@
+from flask import current_app
+from sqlalchemy import select
+from db_init import db, redis_store
+from models import Post, User
+from models.user import user_follower
+
+# Home feeds: the timeline of a user is a sorted set of the post ids of the followed authors, scored by the id and
+# capped to the FEED_TIMELINE_LENGTH newest posts. A new post is pushed to the timelines of the author's followers
+# (fan-out on write), except posts of authors with more than FEED_FANOUT_FOLLOWERS_LIMIT followers, which are
+# merged into the feed when it is read (fan-out on read). A timeline is built from the database on the first read
+# and expires when it is not read for FEED_TIMELINE_TIMEOUT seconds.
+TIMELINE_KEY = "timeline:{}"
+# Marks a built timeline which has no posts; it has the lowest score, so it is the first one trimmed
+EMPTY_TIMELINE_MEMBER = 0
+
+# Posts are only pushed to built timelines, a missing one is built with the post on its next read
+PUSH_POST_SCRIPT = """
+for _, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+        redis.call('ZADD', key, ARGV[1], ARGV[1])
+        redis.call('ZREMRANGEBYRANK', key, 0, -tonumber(ARGV[2]) - 1)
+    end
+end
+"""
+
+push_post_script = redis_store.register_script(PUSH_POST_SCRIPT)
+
+
+def get_followed_authors(user_id, fanned_out_on_write):
+    limit = current_app.config["FEED_FANOUT_FOLLOWERS_LIMIT"]
+    return (
+        select(User.user_id)
+        .join(user_follower, user_follower.c.user_id == User.user_id)
+        .where(
+            user_follower.c.follower_id == user_id,
+            User.user_followers_count <= limit if fanned_out_on_write else User.user_followers_count > limit
+        )
+    )
+
+
+def push_post(post_id, author_id):
+    # Followers are read in batches by the keyset of the (user_id, follower_id) unique constraint. The worker
+    # shares one app context between tasks, so the session is removed at the end: no transaction is left open
+    # between tasks, and the next task does not see the counters loaded by this one.
+    try:
+        followers_count = db.session.execute(
+            select(User.user_followers_count).where(User.user_id == author_id)
+        ).scalar()
+        if followers_count is None or followers_count > current_app.config["FEED_FANOUT_FOLLOWERS_LIMIT"]:
+            return 0
+
+        pushed_timelines = 0
+        last_follower_id = 0
+        while True:
+            follower_ids = db.session.execute(
+                select(user_follower.c.follower_id)
+                .where(user_follower.c.user_id == author_id, user_follower.c.follower_id > last_follower_id)
+                .order_by(user_follower.c.follower_id)
+                .limit(current_app.config["FEED_FANOUT_BATCH_SIZE"])
+            ).scalars().all()
+            if not follower_ids:
+                return pushed_timelines
+
+            push_post_script(
+                keys=[TIMELINE_KEY.format(follower_id) for follower_id in follower_ids],
+                args=[post_id, current_app.config["FEED_TIMELINE_LENGTH"]]
+            )
+            pushed_timelines += len(follower_ids)
+            last_follower_id = follower_ids[-1]
+    finally:
+        db.session.remove()
+
+
+def build_timeline(user_id):
+    post_ids = db.session.execute(
+        select(Post.post_id)
+        .where(Post.post_author.in_(get_followed_authors(user_id, fanned_out_on_write=True)))
+        .order_by(Post.post_id.desc())
+        .limit(current_app.config["FEED_TIMELINE_LENGTH"])
+    ).scalars().all()
+
+    # Posts pushed while the timeline was built are kept, ZADD only adds to them
+    timeline_key = TIMELINE_KEY.format(user_id)
+    pipeline = redis_store.pipeline()
+    pipeline.zadd(timeline_key, {EMPTY_TIMELINE_MEMBER: 0, **{post_id: post_id for post_id in post_ids}})
+    pipeline.expire(timeline_key, current_app.config["FEED_TIMELINE_TIMEOUT"])
+    pipeline.execute()
+
+
+def drop_timeline(user_id):
+    # Followed authors changed, the timeline is built again on the next read
+    redis_store.delete(TIMELINE_KEY.format(user_id))
+
+
+def get_feed_post_ids(user_id, before_post_id, count):
+    # Newest post ids of the feed which are older than before_post_id, None starts from the newest post
+    timeline_key = TIMELINE_KEY.format(user_id)
+    if not redis_store.exists(timeline_key):
+        build_timeline(user_id)
+
+    pipeline = redis_store.pipeline()
+    pipeline.zrevrangebyscore(
+        timeline_key, "+inf" if before_post_id is None else f"({before_post_id}", f"({EMPTY_TIMELINE_MEMBER}",
+        start=0, num=count
+    )
+    pipeline.expire(timeline_key, current_app.config["FEED_TIMELINE_TIMEOUT"])
+    timeline_post_ids = [int(post_id) for post_id in pipeline.execute()[0]]
+
+    pulled_posts_query = (
+        select(Post.post_id)
+        .where(Post.post_author.in_(get_followed_authors(user_id, fanned_out_on_write=False)))
+        .order_by(Post.post_id.desc())
+        .limit(count)
+    )
+    if before_post_id is not None:
+        pulled_posts_query = pulled_posts_query.where(Post.post_id < before_post_id)
+    pulled_post_ids = db.session.execute(pulled_posts_query).scalars().all()
+
+    return sorted(set(timeline_post_ids) | set(pulled_post_ids), reverse=True)[:count]
@@ -4,9 +4,10 @@ import os
 import aiofiles
 from app_init import app
 import http_codes
+from flask_jwt_extended import get_jwt_identity
 from flask_jwt_extended.exceptions import NoAuthorizationError
 from jwt.exceptions import ExpiredSignatureError
-from flask import current_app
+from flask import current_app, request
 from flask_restful import abort
 from marshmallow import ValidationError
 from exceptions import JWTRevokedError
@@ -25,8 +26,20 @@ async def delete_file(file_url):
         os.remove(file_path)
 
 
-def instance_exists_by_id(_id: int, model) -> bool:
-    return model.query.get(_id) is not None
+# Current user is loaded at most once per request, and kept on the request, since the application context
+# (and g) outlives a single request here
+def get_current_user():
+    from models import User  # models import utilities
+
+    if not hasattr(request, "current_user"):
+        request.current_user = User.query.get(get_jwt_identity())
+
+    return request.current_user
+
+
+# Ownership is checked on the foreign key of the object, without loading the related user
+def is_current_user(user_id) -> bool:
+    return user_id is not None and user_id == get_jwt_identity()
 
 
 def is_password_valid(password: str):
@@ -1,11 +1,15 @@
 from .user import UserRegisterView, UserListViewSet, UserDetailedViewSet, UserLoginView, UserChangePassword,\
-    UserMeView, UserFollowView, UserLogOutView
+    UserMeView, UserFollowView, UserLogOutView, UserFollowersView, UserFollowingView, UserLikedPostsView,\
+    UserLogOutAllView
 from .role import RoleDetailedViewSet, RoleListViewSet
 from .university import UniversityListView, UniversityDetailedView
 from .faculty import FacultyListView, FacultyDetailedView
-from .post import PostListView, PostDetailedView, PostRateView, PostAddFile, PostDeleteFile, PostBulkEditFiles
+from .post import PostListView, PostDetailedView, PostRateView, PostAddFile, PostDeleteFile, PostBulkEditFiles, \
+    PostCommentsView, PostCommentTreeView
 from .comment import CommentListView, CommentDetailedView
 from .technical import RefreshJWTView
-from .notification import NotificationListView, NotificationDetailedView
+from .notification import NotificationListView, NotificationDetailedView, NotificationUnreadCountView, \
+    NotificationSeenView
 from .message import MessageListView, MessageDetailedView
 from .chat import ChatView
+from .feed import FeedView
@@ -7,8 +7,8 @@ from app_init import socketio, app
 from flask_socketio import join_room, leave_room, emit
 from models import User, ChatRoom, Message
 from flask_restful import Resource
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from utilities import is_authorized_error_handler
+from flask_jwt_extended import jwt_required
+from utilities import is_authorized_error_handler, get_current_user, is_current_user
 from text_templates import OBJECT_DOES_NOT_EXIST
 
 
@@ -19,9 +19,9 @@ class ChatView(Resource):
     def get(self, receiver_id: int):
         with db.session.begin():
             receiver = User.query.get_or_404(receiver_id, description=OBJECT_DOES_NOT_EXIST.format("User", receiver_id))
-            sender = User.query.get(get_jwt_identity())
+            sender = get_current_user()
 
-            if sender is receiver:
+            if is_current_user(receiver_id):
                 room = db.session.execute(
                     text("""
                         SELECT cr.chatroom_id
@@ -1,6 +1,5 @@
 import http_codes
 import asyncio
-from sqlalchemy.orm import joinedload
 from db_init import db
 from flask_restful import Resource, abort, reqparse
 from werkzeug.datastructures import FileStorage
@@ -8,11 +7,12 @@ from datetime import datetime
 from marshmallow import ValidationError
 from flask import jsonify, make_response
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import Comment, User, Notification, Post
-from schemas import CommentGetSchema, CommentCreateSchema, CommentUpdateSchema, UserGetSchema
+from models import Comment, User, Post
+from models.notification import add_notification, NOTIFICATION_POST_COMMENTED, NOTIFICATION_COMMENT_ANSWERED
+from schemas import CommentGetSchema, CommentCreateSchema, CommentUpdateSchema
 from text_templates import OBJECT_DOES_NOT_EXIST, OBJECT_DELETED, OBJECT_EDIT_NOT_ALLOWED, OBJECT_DELETE_NOT_ALLOWED
-from utilities import is_authorized_error_handler, save_file
-from views.mixins import PaginationMixin, FilterMixin, SortMixin
+from utilities import is_authorized_error_handler, save_file, is_current_user
+from views.mixins import PaginationMixin, FilterMixin, SortMixin, SparseFieldsMixin, ResponseCacheMixin
 from views.technical import sort_filter_parser
 
 
@@ -21,10 +21,21 @@ parser.add_argument("comment_text", location="form")
 parser.add_argument("comment_image", type=FileStorage, location="files", nullable=True)
 
 
-class CommentListView(Resource, PaginationMixin, FilterMixin, SortMixin):
+class CommentListView(Resource, PaginationMixin, FilterMixin, SortMixin, SparseFieldsMixin):
     comments_get_schema = CommentGetSchema(many=True)
     comment_get_schema = CommentGetSchema()
     comment_create_schema = CommentCreateSchema()
+    filter_fields = ("comment_id", "comment_post", "comment_author", "comment_parent", "comment_created_at")
+    filter_mappings = {
+        "comment_parent": (Comment.parent_comment, Comment.comment_id),
+        "comment_post": (Comment.post, Post.post_id),
+        "comment_author": (Comment.author, User.user_id)
+    }
+    sort_mappings = {
+        "comment_author": (Comment.author, User.user_id),
+        "comment_parent": (Comment.parent_comment, Comment.comment_id),
+        "comment_post": (Comment.post, Post.post_id),
+    }
 
     @is_authorized_error_handler()
     @jwt_required()
@@ -33,39 +44,25 @@ class CommentListView(Resource, PaginationMixin, FilterMixin, SortMixin):
         filters = data.get("filters")
         sort_by = data.get("sort_by")
 
-        comments_query = Comment.query.options(
-            joinedload(Comment.author),
-            joinedload(Comment.post),
-            joinedload(Comment.parent_comment)
-        )
+        comments_get_schema = self.get_fields_schema(self.comments_get_schema)
+        comments_query = Comment.query
 
         try:
             if filters:
-                filter_mappings = {
-                    "comment_parent": (Comment.parent_comment, Comment.comment_id),
-                    "comment_post": (Comment.post, Post.post_id),
-                    "comment_author": (Comment.author, User.user_id)
-                }
-
                 comments_query = self.get_filtered_query(
                     query=comments_query,
                     model=Comment,
                     filters=filters,
-                    filter_mappings=filter_mappings
+                    filter_mappings=self.filter_mappings,
+                    filter_fields=self.filter_fields
                 )
 
             if sort_by:
-                sort_mappings = {
-                    "comment_author": (User, User.user_id),
-                    "comment_parent": (Comment, Comment.comment_id),
-                    "comment_post": (Post, Post.post_id),
-                }
-
                 comments_query = self.get_sorted_query(
                     query=comments_query,
                     model=Comment,
                     sort_fields=sort_by,
-                    sort_mappings=sort_mappings
+                    sort_mappings=self.sort_mappings
                 )
             else:
                 comments_query = comments_query.order_by(Comment.comment_id)
@@ -73,9 +70,14 @@ class CommentListView(Resource, PaginationMixin, FilterMixin, SortMixin):
         except AttributeError as e:
             abort(http_codes.HTTP_BAD_REQUEST_400, error_message=str(e))
 
+        comments_query = comments_query.options(*self.get_load_options(
+            comments_get_schema,
+            eager_relationships=[Comment.author, Comment.post, Comment.parent_comment]
+        ))
+
         response = self.get_paginated_response(
             query=comments_query,
-            items_schema=self.comments_get_schema,
+            items_schema=comments_get_schema,
             model_plural_name="comments",
             count_field_name="comment_count"
         )
@@ -92,8 +94,7 @@ class CommentListView(Resource, PaginationMixin, FilterMixin, SortMixin):
                 parser_post.add_argument("comment_parent", type=int, location="form")
                 data = parser_post.parse_args()
 
-                comment_author = User.query.get(get_jwt_identity())
-                data["comment_author"] = UserGetSchema(only=("user_id",)).dump(comment_author)
+                data["comment_author"] = {"user_id": get_jwt_identity()}
                 data["comment_created_at"] = datetime.utcnow().isoformat()
                 image_file = data["comment_image"]
 
@@ -112,37 +113,42 @@ class CommentListView(Resource, PaginationMixin, FilterMixin, SortMixin):
 
                 await asyncio.gather(*async_tasks)
 
-                if comment_author is not Post.query.get(comment.comment_post).author:
-                    notification_post_commented = Notification(
-                        notification_text=f"Your post {comment.post} have been commented.",
-                        notification_receiver=comment.post.author,
-                        notification_sender_url=f"/comment/{comment.comment_id}"
+                post = Post.query.get(comment.comment_post)
+                if not is_current_user(post.post_author):
+                    add_notification(
+                        db.session, post.author, NOTIFICATION_POST_COMMENTED, post.post_id, comment.author, post,
+                        f"/post/{post.post_id}/comments"
                     )
-                    db.session.add(notification_post_commented)
 
-                if comment.parent_comment and comment.parent_comment.author is not comment_author:
-                    notification_comment_answered = Notification(
-                        notification_text=f"Your comment {comment.comment_parent} received an answer!",
-                        notification_receiver=comment.parent_comment.author,
-                        notification_sender_url=f"/comment/{comment.comment_id}"
+                if comment.parent_comment and not is_current_user(comment.parent_comment.comment_author):
+                    add_notification(
+                        db.session, comment.parent_comment.author, NOTIFICATION_COMMENT_ANSWERED,
+                        comment.comment_parent, comment.author, comment.comment_parent,
+                        f"/comment/{comment.comment_parent}"
                     )
-                    db.session.add(notification_comment_answered)
 
             return make_response(jsonify(self.comment_get_schema.dump(comment)), http_codes.HTTP_CREATED_201)
         except ValidationError as e:
             abort(http_codes.HTTP_BAD_REQUEST_400, error_message=str(e))
 
 
-class CommentDetailedView(Resource):
+class CommentDetailedView(Resource, SparseFieldsMixin, ResponseCacheMixin):
     comment_get_schema = CommentGetSchema()
     comment_update_schema = CommentUpdateSchema()
 
     @is_authorized_error_handler()
     @jwt_required()
     def get(self, comment_id):
-        comment = Comment.query.get_or_404(comment_id, description=OBJECT_DOES_NOT_EXIST.format("Comment", comment_id))
+        comment_get_schema = self.get_fields_schema(self.comment_get_schema)
+        cached_response = self.get_cached_response(Comment, comment_id)
+        if cached_response is not None:
+            return cached_response
+
+        comment = Comment.query.options(*self.get_load_options(comment_get_schema)).get_or_404(
+            comment_id, description=OBJECT_DOES_NOT_EXIST.format("Comment", comment_id)
+        )
 
-        return jsonify(self.comment_get_schema.dump(comment))
+        return self.cache_response(comment, comment_get_schema)
 
     @classmethod
     @is_authorized_error_handler()
@@ -150,8 +156,7 @@ class CommentDetailedView(Resource):
     async def delete(cls, comment_id):
         comment = Comment.query.get_or_404(comment_id, description=OBJECT_DOES_NOT_EXIST.format("Comment", comment_id))
 
-        editor = User.query.get(get_jwt_identity())
-        if editor is not comment.author:
+        if not is_current_user(comment.comment_author):
             abort(http_codes.HTTP_FORBIDDEN_403, error_message=OBJECT_DELETE_NOT_ALLOWED.format("comment"))
 
         comment.delete()
@@ -167,8 +172,7 @@ class CommentDetailedView(Resource):
                     comment_id, description=OBJECT_DOES_NOT_EXIST.format("Comment", comment_id)
                 )
 
-                editor = User.query.get(get_jwt_identity())
-                if editor is not comment.author:
+                if not is_current_user(comment.comment_author):
                     abort(http_codes.HTTP_FORBIDDEN_403, error_message=OBJECT_EDIT_NOT_ALLOWED.format("comment"))
 
                 data = parser.parse_args()
@@ -1,5 +1,4 @@
 import http_codes
-from sqlalchemy.orm import joinedload
 from flask_restful import Resource, abort, reqparse
 from marshmallow import ValidationError
 from flask import jsonify, make_response
@@ -8,7 +7,7 @@ from models import Faculty, University
 from schemas import FacultyGetSchema, FacultyCreateSchema, FacultyUpdateSchema
 from text_templates import OBJECT_DOES_NOT_EXIST, OBJECT_DELETED
 from utilities import is_authorized_error_handler
-from views.mixins import PaginationMixin, FilterMixin, SortMixin
+from views.mixins import PaginationMixin, FilterMixin, SortMixin, SparseFieldsMixin, ResponseCacheMixin
 from views.technical import sort_filter_parser
 
 
@@ -17,10 +16,13 @@ parser.add_argument("faculty_name", location="form")
 parser.add_argument("faculty_university", type=int, location="form")
 
 
-class FacultyListView(Resource, PaginationMixin, FilterMixin, SortMixin):
+class FacultyListView(Resource, PaginationMixin, FilterMixin, SortMixin, SparseFieldsMixin):
     faculties_get_schema = FacultyGetSchema(many=True)
     faculty_get_schema = FacultyGetSchema()
     faculty_create_schema = FacultyCreateSchema()
+    filter_fields = ("faculty_id", "faculty_name", "faculty_university")
+    filter_mappings = {"faculty_university": (Faculty.university, University.university_name)}
+    sort_mappings = {"faculty_university": (Faculty.university, University.university_name)}
 
     @is_authorized_error_handler()
     @jwt_required()
@@ -29,34 +31,40 @@ class FacultyListView(Resource, PaginationMixin, FilterMixin, SortMixin):
         filters = data.get("filters")
         sort_by = data.get("sort_by")
 
-        faculties_query = Faculty.query.options(joinedload(Faculty.university))
+        faculties_get_schema = self.get_fields_schema(self.faculties_get_schema)
+        faculties_query = Faculty.query
 
         try:
             if filters:
-                filter_mappings = {"faculty_university": (Faculty.university, University.university_name)}
                 faculties_query = self.get_filtered_query(
                     query=faculties_query,
                     model=Faculty,
                     filters=filters,
-                    filter_mappings=filter_mappings
+                    filter_mappings=self.filter_mappings,
+                    filter_fields=self.filter_fields
                 )
 
-                if sort_by:
-                    faculties_query = self.get_sorted_query(
-                        query=faculties_query,
-                        model=Faculty,
-                        sort_fields=sort_by,
-                        sort_mappings={"faculty_university": (University, University.university_name)}
-                    )
-                else:
-                    faculties_query = faculties_query.order_by(Faculty.faculty_id)
+            if sort_by:
+                faculties_query = self.get_sorted_query(
+                    query=faculties_query,
+                    model=Faculty,
+                    sort_fields=sort_by,
+                    sort_mappings=self.sort_mappings
+                )
+            else:
+                faculties_query = faculties_query.order_by(Faculty.faculty_id)
 
         except AttributeError as e:
             abort(http_codes.HTTP_BAD_REQUEST_400, error_message=str(e))
 
+        faculties_query = faculties_query.options(*self.get_load_options(
+            faculties_get_schema,
+            eager_relationships=[Faculty.university]
+        ))
+
         response = self.get_paginated_response(
             query=faculties_query,
-            items_schema=self.faculties_get_schema,
+            items_schema=faculties_get_schema,
             model_plural_name="faculties",
             count_field_name="faculty_count"
         )
@@ -77,16 +85,23 @@ class FacultyListView(Resource, PaginationMixin, FilterMixin, SortMixin):
             abort(http_codes.HTTP_BAD_REQUEST_400, error_mesage=str(e))
 
 
-class FacultyDetailedView(Resource):
+class FacultyDetailedView(Resource, SparseFieldsMixin, ResponseCacheMixin):
     faculty_get_schema = FacultyGetSchema()
     faculty_update_schema = FacultyUpdateSchema()
 
     @is_authorized_error_handler()
     @jwt_required()
     def get(self, faculty_id: int):
-        faculty = Faculty.query.get_or_404(faculty_id, description=OBJECT_DOES_NOT_EXIST.format("Faculty", faculty_id))
+        faculty_get_schema = self.get_fields_schema(self.faculty_get_schema)
+        cached_response = self.get_cached_response(Faculty, faculty_id)
+        if cached_response is not None:
+            return cached_response
+
+        faculty = Faculty.query.options(*self.get_load_options(faculty_get_schema)).get_or_404(
+            faculty_id, description=OBJECT_DOES_NOT_EXIST.format("Faculty", faculty_id)
+        )
 
-        return jsonify(self.faculty_get_schema.dump(faculty))
+        return self.cache_response(faculty, faculty_get_schema)
 
     @classmethod
     @is_authorized_error_handler()
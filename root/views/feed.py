@@ -0,0 +1,40 @@
+from flask import request
+from flask_restful import Resource
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models import Post
+from schemas import PostGetSchema
+from timelines import get_feed_post_ids
+from utilities import is_authorized_error_handler
+from views.mixins import PaginationMixin, SparseFieldsMixin
+
+
+class FeedView(Resource, PaginationMixin, SparseFieldsMixin):
+    posts_get_schema = PostGetSchema(many=True)
+
+    # Newest posts of the followed authors, paginated by a cursor with the last seen post id
+    @is_authorized_error_handler()
+    @jwt_required()
+    def get(self):
+        page_size = self.get_cursor_page_size()
+        cursor = request.args.get("cursor", default="", type=str)
+        before_post_id = self.decode_cursor(cursor, [Post.post_id])[0] if cursor else None
+
+        post_ids = get_feed_post_ids(get_jwt_identity(), before_post_id, page_size + 1)
+        has_next = len(post_ids) > page_size
+        post_ids = post_ids[:page_size]
+
+        # Posts of the page are loaded by one IN (...) query, deleted ones are skipped
+        posts_get_schema = self.get_fields_schema(self.posts_get_schema)
+        posts_query = Post.query.filter(Post.post_id.in_(post_ids)).options(
+            *self.get_load_options(posts_get_schema, eager_relationships=[Post.author])
+        )
+        posts_by_id = {post.post_id: post for post in posts_query}
+
+        links = {}
+        if has_next:
+            links["next"] = self.get_page_url(cursor=self.encode_cursor([post_ids[-1]]))
+
+        return {
+            "posts": posts_get_schema.dump([posts_by_id[post_id] for post_id in post_ids if post_id in posts_by_id]),
+            "links": links
+        }
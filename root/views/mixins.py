@@ -1,28 +1,63 @@
+import re
 import json
+import base64
+import hashlib
+import http_codes
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 from urllib.parse import urlparse, parse_qs, urlunparse, urlencode
-from flask import request
+from sqlalchemy import and_, or_, false, func, inspect, text, Date, DateTime, String
+from functools import lru_cache
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.util import find_tables
+from sqlalchemy.orm import aliased, contains_eager, joinedload, selectinload, load_only, noload
+from sqlalchemy.orm.interfaces import ONETOMANY
+from marshmallow.fields import Nested
+from flask import request, current_app, jsonify
+from flask_restful import abort
+from db_init import db, redis_store
+from models.mixins import (
+    COUNT_VERSION_KEY, RESPONSE_CACHE_KEY, RESPONSE_CHANGED_KEY, RESPONSE_DEPENDENTS_KEY, RESPONSE_GENERATION_KEY
+)
 
 
 class PaginationMixin:
-    def get_paginated_response(self, query, items_schema, model_plural_name, count_field_name):
+    # Count which is already known (e.g. a denormalized counter column) is used instead of a COUNT query
+    def get_paginated_response(self, query, items_schema, model_plural_name, count_field_name, count=None):
+        if "cursor" in request.args:
+            return self.get_cursor_paginated_response(query, items_schema, model_plural_name, count_field_name, count)
+
         page = request.args.get("page", default=1, type=int)
         page_size = request.args.get("page_size", default=10, type=int)
-        paginated_items = query.paginate(page=page, per_page=page_size)
 
-        items = paginated_items.items
-        count = paginated_items.total
+        if self.is_count_requested():
+            paginated_items = query.paginate(page=page, per_page=page_size, count=False)
+            paginated_items.total = self.get_count(query) if count is None else count
+
+            items = paginated_items.items
+            count = paginated_items.total
+            has_next = paginated_items.has_next
+        else:
+            if page < 1 or page_size < 1:
+                abort(http_codes.HTTP_NOT_FOUND_404)
+
+            # Without the total, one extra row tells whether the next page exists
+            items = query.limit(page_size + 1).offset((page - 1) * page_size).all()
+            count = None
+            has_next = len(items) > page_size
+            items = items[:page_size]
 
         url_parts = list(urlparse(request.url))
         query_params = parse_qs(url_parts[4], keep_blank_values=True)
         query_params.pop("page", None)
 
         links = {}
-        if paginated_items.has_prev:
-            query_params["page"] = paginated_items.prev_num
+        if page > 1:
+            query_params["page"] = page - 1
             prev_url = urlunparse(url_parts[:4] + [urlencode(query_params, doseq=True)] + url_parts[5:])
             links["prev"] = prev_url
-        if paginated_items.has_next:
-            query_params["page"] = paginated_items.next_num
+        if has_next:
+            query_params["page"] = page + 1
             next_url = urlunparse(url_parts[:4] + [urlencode(query_params, doseq=True)] + url_parts[5:])
             links["next"] = next_url
 
@@ -34,26 +69,338 @@ class PaginationMixin:
 
         return response
 
+    # Keyset pagination: the next page starts right after the sort key of the last item instead of an OFFSET,
+    # so every page costs the same. The cursor is an opaque token with the last seen sort key values.
+    def get_cursor_paginated_response(self, query, items_schema, model_plural_name, count_field_name, count=None):
+        page_size = self.get_cursor_page_size()
+        cursor = request.args.get("cursor", default="", type=str)
+
+        sort_keys = self.get_sort_keys(query)
+        sort_columns = [column for column, _ in sort_keys]
+        if not self.is_count_requested():
+            count = None
+        elif count is None:
+            count = self.get_count(query)
+
+        query = query.order_by(None).order_by(
+            *[column.desc() if is_descending else column for column, is_descending in sort_keys]
+        )
+        if cursor:
+            last_values = self.decode_cursor(cursor, sort_columns)
+            query = query.filter(self.get_keyset_condition(sort_keys, last_values))
+
+        rows = query.add_columns(*sort_columns).limit(page_size + 1).all()
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
+
+        url_parts = list(urlparse(request.url))
+        query_params = parse_qs(url_parts[4], keep_blank_values=True)
+        query_params.pop("page", None)
+
+        links = {}
+        if has_next:
+            query_params["cursor"] = self.encode_cursor(rows[-1][1:])
+            next_url = urlunparse(url_parts[:4] + [urlencode(query_params, doseq=True)] + url_parts[5:])
+            links["next"] = next_url
+
+        response = {
+            model_plural_name: items_schema.dump([row[0] for row in rows]),
+            count_field_name: count,
+            "links": links
+        }
+
+        return response
+
+    @staticmethod
+    def get_page_url(**params):
+        # URL of the current request with the given query parameters replaced
+        url_parts = list(urlparse(request.url))
+        query_params = parse_qs(url_parts[4], keep_blank_values=True)
+        query_params.update(params)
+        return urlunparse(url_parts[:4] + [urlencode(query_params, doseq=True)] + url_parts[5:])
+
+    @staticmethod
+    def is_count_requested():
+        return request.args.get("include_count", default="true", type=str).lower() not in ("false", "0")
+
+    @staticmethod
+    def get_count(query):
+        model = query.column_descriptions[0]["entity"]
+        table = inspect(model).local_table
+        primary_key = inspect(model).primary_key[0]
+
+        # Counting only the primary key leaves the eager loaded joins out of the COUNT query
+        count_query = query.with_entities(func.count(primary_key)).order_by(None)
+        statement = count_query.statement
+        froms = statement.get_final_froms()
+
+        # Unfiltered count of a big table is served from the planner statistics instead of a full scan
+        if statement.whereclause is None and len(froms) == 1 and froms[0] is table:
+            estimate = db.session.execute(
+                text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table_name AS regclass)"),
+                {"table_name": table.name}
+            ).scalar()
+            if estimate is not None and estimate >= current_app.config["COUNT_ESTIMATE_THRESHOLD"]:
+                return estimate
+
+        compiled_statement = statement.compile()
+        statement_hash = hashlib.sha1(
+            (str(compiled_statement) + json.dumps(compiled_statement.params, sort_keys=True, default=str)).encode()
+        ).hexdigest()
+        # Filters on related fields join other tables, a change of any of them drops the cached count
+        table_names = sorted({table.name, *(joined.name for joined in find_tables(statement))})
+        count_versions = redis_store.mget([COUNT_VERSION_KEY.format(table_name) for table_name in table_names])
+        cache_key = "count:{}:{}:{}".format(
+            table.name, ",".join(str(int(version or 0)) for version in count_versions), statement_hash
+        )
+
+        count = redis_store.get(cache_key)
+        if count is None:
+            count = count_query.scalar()
+            redis_store.set(cache_key, count, ex=current_app.config["COUNT_CACHE_TIMEOUT"])
+
+        return int(count)
+
+    @staticmethod
+    def get_sort_keys(query):
+        # Returns (column, is_descending) pairs of the query ordering, ended by the primary key as a tie-breaker
+        sort_keys = []
+        for clause in query._order_by_clauses:
+            if getattr(clause, "modifier", None) is operators.desc_op:
+                sort_keys.append((clause.element, True))
+            elif getattr(clause, "modifier", None) is operators.asc_op:
+                sort_keys.append((clause.element, False))
+            else:
+                sort_keys.append((clause, False))
+
+        model = query.column_descriptions[0]["entity"]
+        for primary_key in inspect(model).primary_key:
+            if not any(column.compare(primary_key) for column, _ in sort_keys):
+                sort_keys.append((primary_key, False))
+
+        return sort_keys
+
+    @staticmethod
+    def get_keyset_condition(sort_keys, last_values):
+        # Postgres puts NULLs last in ascending order and first in descending one
+        conditions = []
+        equal_conditions = []
+
+        for (column, is_descending), value in zip(sort_keys, last_values):
+            if value is None:
+                after_condition = column.isnot(None) if is_descending else false()
+                equal_condition = column.is_(None)
+            elif is_descending:
+                after_condition = column < value
+                equal_condition = column == value
+            else:
+                after_condition = or_(column > value, column.is_(None)) if getattr(column, "nullable", True) else column > value
+                equal_condition = column == value
+
+            conditions.append(and_(*equal_conditions, after_condition))
+            equal_conditions.append(equal_condition)
+
+        return or_(*conditions)
+
+    @staticmethod
+    def encode_cursor(values):
+        values = [value.isoformat() if isinstance(value, date) else value for value in values]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor, sort_columns):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if not isinstance(values, list) or len(values) != len(sort_columns):
+                raise ValueError
+
+            return [PaginationMixin.decode_cursor_value(value, column) for value, column in zip(values, sort_columns)]
+        except (ValueError, TypeError):
+            abort(http_codes.HTTP_BAD_REQUEST_400, error_message="Pagination cursor is invalid.")
+
+    @staticmethod
+    def get_cursor_page_size():
+        # A cursor page ends with the item the next cursor is made of, so it can not be empty
+        page_size = request.args.get("page_size", default=10, type=int)
+        if page_size < 1:
+            abort(http_codes.HTTP_BAD_REQUEST_400, error_message="Page size must be a positive number.")
+
+        return page_size
+
+    @staticmethod
+    def decode_cursor_value(value, column):
+        # Values come from the client, so they are checked against the column type before they reach the SQL
+        if value is None:
+            return value
+        if isinstance(column.type, DateTime):
+            return datetime.fromisoformat(value)
+        if isinstance(column.type, Date):
+            return date.fromisoformat(value)
+
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            return value
+
+        if python_type in (float, Decimal):
+            is_valid = isinstance(value, (int, float)) and not isinstance(value, bool)
+        elif python_type is int:
+            is_valid = isinstance(value, int) and not isinstance(value, bool)
+        else:
+            is_valid = isinstance(value, python_type)
+        if not is_valid:
+            raise ValueError
+
+        return value
+
+
+class RelationshipJoinMixin:
+    # One aliased join per relationship is shared by filtering, sorting and eager loading of the request query
+    def get_relationship_join(self, query, relationship_field, is_outer=False):
+        if not hasattr(self, "relationship_joins"):
+            self.relationship_joins = {}
+
+        relationship = relationship_field.property
+        if relationship not in self.relationship_joins:
+            related_model = aliased(relationship.mapper.class_)
+            query = query.join(relationship_field.of_type(related_model), isouter=is_outer)
+            self.relationship_joins[relationship] = related_model
+
+        return query, self.relationship_joins[relationship]
+
+    def get_related_column(self, query, relationship_field, related_field, is_outer=False):
+        # The related primary key is the foreign key column itself, only other related fields need a join
+        relationship = relationship_field.property
+        for local_column, remote_column in relationship.local_remote_pairs:
+            if remote_column is related_field.property.columns[0]:
+                return query, getattr(relationship.parent.class_, local_column.key)
+
+        query, related_model = self.get_relationship_join(query, relationship_field, is_outer=is_outer)
+
+        return query, getattr(related_model, related_field.key)
+
+    def get_eager_loader(self, relationship_field):
+        # Relationship which is already joined is loaded from that join instead of a second eager join
+        related_model = getattr(self, "relationship_joins", {}).get(relationship_field.property)
+        if related_model is not None:
+            return contains_eager(relationship_field.of_type(related_model)), related_model
+
+        return joinedload(relationship_field), relationship_field.property.mapper.class_
 
-class FilterMixin:
-    def get_filtered_query(self, query, model, filters, filter_mappings={}):
-        filters_dict = json.loads(filters)
+
+class FilterMixin(RelationshipJoinMixin):
+    # Filters are a JSON object: {"post_author": 1} is an equality check,
+    # {"post_created_at": {"gte": "2023-06-01", "lt": "2023-07-01"}, "post_author": {"in": [1, 2]}} uses operators
+    filter_operators = {
+        "eq": lambda column, value: column == value,
+        "ne": lambda column, value: column != value,
+        "gt": lambda column, value: column > value,
+        "gte": lambda column, value: column >= value,
+        "lt": lambda column, value: column < value,
+        "lte": lambda column, value: column <= value,
+        "in": lambda column, value: column.in_(value),
+        "prefix": lambda column, value: column.startswith(value, autoescape=True),
+        "is_null": lambda column, value: column.is_(None) if value else column.isnot(None),
+        "on": lambda column, value: and_(
+            column >= date.fromisoformat(value), column < date.fromisoformat(value) + timedelta(days=1)
+        ),
+        "last": lambda column, value: column >= datetime.utcnow() - FilterMixin.parse_time_window(value),
+    }
+    # Operators compared with the column itself, their operands are converted to its type
+    converted_operators = ("eq", "ne", "gt", "gte", "lt", "lte")
+
+    def get_filtered_query(self, query, model, filters, filter_mappings={}, filter_fields=None):
+        try:
+            filters_dict = json.loads(filters)
+        except ValueError:
+            filters_dict = None
+
+        if not isinstance(filters_dict, dict):
+            abort(http_codes.HTTP_BAD_REQUEST_400, error_message="Filters should be a JSON object.")
 
         for key, value in filters_dict.items():
+            # Only whitelisted (indexed) fields can be filtered, so clients can not trigger full table scans
+            if filter_fields is not None and key not in filter_fields:
+                abort(http_codes.HTTP_BAD_REQUEST_400, error_message=f"Filtering by {key} is not allowed.")
+
             if key in filter_mappings.keys():
                 filter_nested_field, filter_field = filter_mappings[key]
-                query = query.filter(filter_nested_field.has(filter_field == value))
+                query, column = self.get_related_column(query, filter_nested_field, filter_field)
             else:
-                query = query.filter(getattr(model, key) == value)
+                column = getattr(model, key)
+
+            conditions = value.items() if isinstance(value, dict) else [("eq", value)]
+            for operator, operand in conditions:
+                query = query.filter(self.get_filter_condition(column, operator, operand))
 
         return query
 
+    def get_filter_condition(self, column, operator, value):
+        if operator not in self.filter_operators:
+            abort(
+                http_codes.HTTP_BAD_REQUEST_400,
+                error_message=f"Unknown filter operator {operator}, use one of: {', '.join(self.filter_operators)}."
+            )
+
+        if operator == "in" and not isinstance(value, list):
+            abort(http_codes.HTTP_BAD_REQUEST_400, error_message="Filter operator in expects a list of values.")
+
+        if operator == "prefix" and not (isinstance(column.type, String) and isinstance(value, str)):
+            abort(http_codes.HTTP_BAD_REQUEST_400, error_message="Filter operator prefix works only with text fields.")
+
+        try:
+            if operator == "in":
+                operand = [self.convert_filter_value(item, column) for item in value]
+            elif operator in self.converted_operators:
+                operand = self.convert_filter_value(value, column)
+            else:
+                operand = value
+            return self.filter_operators[operator](column, operand)
+        except (ValueError, TypeError, ArithmeticError):
+            abort(http_codes.HTTP_BAD_REQUEST_400, error_message=f"Invalid value {value} for filter operator {operator}.")
+
+    @staticmethod
+    def convert_filter_value(value, column):
+        # Operands are converted to the column type here, so a wrong one is a bad request and not a database error
+        if value is None:
+            return value
+        if isinstance(column.type, (DateTime, Date)):
+            if not isinstance(value, str):
+                raise TypeError
+            return (datetime if isinstance(column.type, DateTime) else date).fromisoformat(value)
+
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            return value
+
+        # bool("false") and int(1.5) would silently give another value, so only exact ones are taken
+        if isinstance(value, (list, dict)) or isinstance(value, bool) != (python_type is bool):
+            raise TypeError
+        if python_type is str and not isinstance(value, str):
+            raise TypeError
+        if python_type is int and isinstance(value, float) and not value.is_integer():
+            raise ValueError
+
+        return python_type(value)
+
+    @staticmethod
+    def parse_time_window(value):
+        # Time windows look like "30m", "12h" or "7d"
+        window = re.match(r"^(\d+)([mhd])$", value)
+        if not window:
+            raise ValueError
+
+        amount, unit = int(window.group(1)), window.group(2)
+        return {"m": timedelta(minutes=amount), "h": timedelta(hours=amount), "d": timedelta(days=amount)}[unit]
 
-class SortMixin:
+
+class SortMixin(RelationshipJoinMixin):
     def get_sorted_query(self, query, model, sort_fields, sort_mappings={}):
         sort_columns = []
+        sorted_columns = []
 
-        for index, sort_field in enumerate(sort_fields):
+        for sort_field in sort_fields:
             sort_order = True
 
             if sort_field[0] == "-":
@@ -62,15 +409,211 @@ class SortMixin:
 
             column = getattr(model, sort_field)
             if sort_field in sort_mappings:
-                sort_model, field = sort_mappings.get(sort_field)
-                query = query.join(sort_model)
-                column = field
+                sort_nested_field, field = sort_mappings.get(sort_field)
+                # Outer join keeps the rows with an empty relationship in the result
+                query, column = self.get_related_column(query, sort_nested_field, field, is_outer=True)
 
-            if not sort_order:
-                column = column.desc()
+            sorted_columns.append(column)
+            sort_columns.append(column if sort_order else column.desc())
 
-            sort_columns.append(column)
+        # Primary key breaks the ties, so the order is stable between pages
+        for primary_key in inspect(model).primary_key:
+            if not any(column.compare(primary_key) for column in sorted_columns):
+                sort_columns.append(primary_key)
 
         query = query.order_by(*sort_columns)
 
         return query
+
+
+class SparseFieldsMixin(RelationshipJoinMixin):
+    def get_fields_schema(self, schema):
+        fields = request.args.get("fields", default="", type=str)
+        if not fields:
+            return schema
+
+        only = tuple(self.get_field_path(schema, path.strip()) for path in fields.split(",") if path.strip())
+
+        try:
+            fields_schema = self.get_cached_fields_schema(type(schema), schema.many, only)
+
+            # Nested "only" options are checked lazily by marshmallow, so they are resolved right away
+            for name in {path.split(".")[0] for path in only if "." in path}:
+                field = fields_schema.fields[name]
+                getattr(field, "inner", field).schema
+        except ValueError as e:
+            abort(http_codes.HTTP_BAD_REQUEST_400, error_message=str(e))
+
+        return fields_schema
+
+    @staticmethod
+    @lru_cache(maxsize=128)
+    def get_cached_fields_schema(schema_class, many, only):
+        return schema_class(many=many, only=only)
+
+    @staticmethod
+    def get_field_path(schema, path):
+        # Clients see data keys (e.g. "post_author"), while marshmallow "only" expects attribute names ("author")
+        names = []
+        for data_key in path.split("."):
+            if schema is None:
+                names.append(data_key)
+                continue
+
+            names_by_data_key = {field.data_key or name: name for name, field in schema.fields.items()}
+            name = names_by_data_key.get(data_key, data_key)
+            names.append(name)
+
+            field = schema.fields.get(name)
+            field = getattr(field, "inner", field)
+            schema = field.schema if isinstance(field, Nested) else None
+
+        return ".".join(names)
+
+    def get_load_options(self, schema, eager_relationships=()):
+        return self.get_fields_load_options(schema.opts.model, schema, eager_relationships)
+
+    def get_fields_load_options(self, model, schema, eager_relationships=(), loader=None):
+        # Only the columns and relationships behind the dumped fields are fetched from the database.
+        # Relationships which are not joined eagerly are batched: one IN (...) query per relationship for the
+        # whole page, instead of a lazy query per dumped item.
+        mapper = inspect(model).mapper
+        fields_by_attribute = {field.attribute or name: field for name, field in schema.fields.items()}
+        eager_keys = {relationship.key for relationship in eager_relationships}
+
+        columns = [getattr(model, column.key) for column in mapper.column_attrs if column.key in fields_by_attribute]
+        options = []
+
+        for relationship in mapper.relationships:
+            if relationship.lazy == "dynamic":
+                continue
+
+            attribute = getattr(model, relationship.key)
+            if relationship.key not in fields_by_attribute:
+                if schema.only is not None:
+                    options.append(loader.noload(attribute) if loader else noload(attribute))
+                continue
+
+            columns.extend(
+                getattr(model, mapper.get_property_by_column(column).key) for column in relationship.local_columns
+            )
+
+            if relationship.key in eager_keys:
+                relationship_loader, related_model = self.get_eager_loader(attribute)
+            else:
+                relationship_loader = loader.selectinload(attribute) if loader else selectinload(attribute)
+                related_model = relationship.mapper.class_
+
+            field = fields_by_attribute[relationship.key]
+            field = getattr(field, "inner", field)
+            nested_options = []
+            if isinstance(field, Nested):
+                nested_options = self.get_fields_load_options(related_model, field.schema, loader=relationship_loader)
+
+            options.extend(nested_options or [relationship_loader])
+
+        if schema.only is not None:
+            options.insert(0, loader.load_only(*columns) if loader else load_only(*columns))
+
+        return options
+
+
+# Stores the response only when none of its rows was changed after the generation read before it was built,
+# and registers it in the dependents sets in the same step, so a later change always finds it.
+# KEYS: the response hash, then ARGV[5] changed keys and as many dependents keys of the embedded rows.
+# ARGV: the generation, the "fields" variant, the body, the timeout and the number of embedded rows.
+STORE_RESPONSE_SCRIPT = """
+local count = tonumber(ARGV[5])
+for i = 2, count + 1 do
+    local changed = redis.call('GET', KEYS[i])
+    if changed and tonumber(changed) > tonumber(ARGV[1]) then
+        return 0
+    end
+end
+redis.call('HSET', KEYS[1], ARGV[2], ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+for i = count + 2, 2 * count + 1 do
+    redis.call('SADD', KEYS[i], KEYS[1])
+    redis.call('EXPIRE', KEYS[i], ARGV[4])
+end
+return 1
+"""
+
+store_response_script = redis_store.register_script(STORE_RESPONSE_SCRIPT)
+
+
+class ResponseCacheMixin:
+    # Serialized detail responses are kept in a Redis hash per object, with an entry per "fields" variant.
+    # The hash is registered in the dependents sets of every row embedded into the response, which are dropped
+    # by the model events when one of these rows changes (see models.mixins).
+    @staticmethod
+    def get_cached_response(model, primary_key):
+        if not current_app.config["RESPONSE_CACHE_ENABLED"]:
+            return None
+
+        cache_key = RESPONSE_CACHE_KEY.format(inspect(model).local_table.name, primary_key)
+        body = redis_store.hget(cache_key, request.args.get("fields", default="", type=str))
+        if body is None:
+            # Read before the rows are loaded, the changes committed after it are not missed by cache_response.
+            # Kept on the request, g lives in the app context which is pushed for the whole process.
+            request.response_generation = int(redis_store.get(RESPONSE_GENERATION_KEY) or 0)
+            return None
+
+        response = current_app.response_class(body, mimetype="application/json")
+
+        return ResponseCacheMixin.make_conditional_response(response)
+
+    def cache_response(self, instance, schema):
+        response = jsonify(schema.dump(instance))
+
+        if current_app.config["RESPONSE_CACHE_ENABLED"] and hasattr(request, "response_generation"):
+            state = inspect(instance)
+            cache_key = RESPONSE_CACHE_KEY.format(state.mapper.local_table.name, state.identity[0])
+            dependencies = list(self.get_response_dependencies(schema, instance))
+
+            store_response_script(
+                keys=[
+                    cache_key,
+                    *(RESPONSE_CHANGED_KEY.format(*dependency) for dependency in dependencies),
+                    *(RESPONSE_DEPENDENTS_KEY.format(*dependency) for dependency in dependencies)
+                ],
+                args=[
+                    request.response_generation, request.args.get("fields", default="", type=str), response.get_data(),
+                    current_app.config["RESPONSE_CACHE_TIMEOUT"], len(dependencies)
+                ]
+            )
+
+        return self.make_conditional_response(response)
+
+    @staticmethod
+    def make_conditional_response(response):
+        # Responds with 304 Not Modified when "If-None-Match" has the ETag of the body
+        response.set_etag(hashlib.sha1(response.get_data()).hexdigest())
+        return response.make_conditional(request)
+
+    @classmethod
+    def get_response_dependencies(cls, schema, instance):
+        state = inspect(instance)
+        mapper = state.mapper
+        dependencies = {
+            (column.table.name, column.name, value) for column, value in zip(mapper.primary_key, state.identity)
+        }
+
+        for name, field in schema.dump_fields.items():
+            nested_field = getattr(field, "inner", field)
+            relationship = mapper.relationships.get(field.attribute or name)
+            if not isinstance(nested_field, Nested) or relationship is None:
+                continue
+
+            # Rows added to or removed from a dumped collection change the response as well
+            if relationship.direction is ONETOMANY:
+                for local_column, remote_column in relationship.local_remote_pairs:
+                    value = getattr(instance, mapper.get_property_by_column(local_column).key)
+                    dependencies.add((remote_column.table.name, remote_column.name, value))
+
+            related = getattr(instance, relationship.key)
+            for related_instance in (related if relationship.uselist else [related]):
+                if related_instance is not None:
+                    dependencies |= cls.get_response_dependencies(nested_field.schema, related_instance)
+
+        return dependencies
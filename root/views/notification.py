@@ -1,19 +1,26 @@
 import http_codes
-from sqlalchemy.orm import joinedload
 from models import Notification, User
-from flask import jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from db_init import db
+from models.notification import get_unread_count, mark_notifications_seen, NOTIFICATIONS_ROOM
+from flask import current_app, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity, decode_token
+from flask_socketio import join_room, emit
+from app_init import socketio
+from revoked_tokens import is_token_revoked
 from schemas import NotificationGetSchema
 from flask_restful import Resource, reqparse, abort
 from text_templates import OBJECT_DOES_NOT_EXIST, OBJECT_DELETED, OBJECT_DELETE_NOT_ALLOWED, OBJECT_EDIT_NOT_ALLOWED, \
     OBJECT_VIEW_NOT_ALLOWED
-from utilities import is_authorized_error_handler
-from views.mixins import PaginationMixin, FilterMixin, SortMixin
+from utilities import is_authorized_error_handler, is_current_user
+from views.mixins import PaginationMixin, FilterMixin, SortMixin, SparseFieldsMixin
 from views.technical import sort_filter_parser
 
 
-class NotificationListView(Resource, PaginationMixin, FilterMixin, SortMixin):
+class NotificationListView(Resource, PaginationMixin, FilterMixin, SortMixin, SparseFieldsMixin):
     notifications_get_schema = NotificationGetSchema(many=True)
+    filter_fields = ("notification_receiver", "notification_is_seen", "notification_created_at", "notification_type")
+    filter_mappings = {"notification_receiver": (Notification.receiver, User.user_id)}
+    sort_mappings = {"notification_receiver": (Notification.receiver, User.user_id)}
 
     @jwt_required()
     def get(self):
@@ -21,17 +28,16 @@ class NotificationListView(Resource, PaginationMixin, FilterMixin, SortMixin):
         filters = data.get("filters")
         sort_by = data.get("sort_by")
 
-        notifications_query = Notification.query.options(
-            joinedload(Notification.receiver)
-        )
+        notifications_get_schema = self.get_fields_schema(self.notifications_get_schema)
+        notifications_query = Notification.query
 
         if filters:
-            filter_mappings = {"notification_receiver": (Notification.receiver, User.user_id)}
             notifications_query = self.get_filtered_query(
                 query=notifications_query,
                 model=Notification,
                 filters=filters,
-                filter_mappings=filter_mappings
+                filter_mappings=self.filter_mappings,
+                filter_fields=self.filter_fields
             )
 
         if sort_by:
@@ -39,14 +45,19 @@ class NotificationListView(Resource, PaginationMixin, FilterMixin, SortMixin):
                 query=notifications_query,
                 model=Notification,
                 sort_fields=sort_by,
-                sort_mappings={"notification_receiver": (User, User.user_id)}
+                sort_mappings=self.sort_mappings
             )
         else:
             notifications_query = notifications_query.order_by(Notification.notification_id)
 
+        notifications_query = notifications_query.options(*self.get_load_options(
+            notifications_get_schema,
+            eager_relationships=[Notification.receiver]
+        ))
+
         response = self.get_paginated_response(
             query=notifications_query,
-            items_schema=self.notifications_get_schema,
+            items_schema=notifications_get_schema,
             model_plural_name="notifications",
             count_field_name="notification_count"
         )
@@ -54,21 +65,67 @@ class NotificationListView(Resource, PaginationMixin, FilterMixin, SortMixin):
         return response
 
 
-class NotificationDetailedView(Resource):
+class NotificationUnreadCountView(Resource):
+
+    @is_authorized_error_handler()
+    @jwt_required()
+    def get(self):
+        return {"unread_count": get_unread_count(get_jwt_identity())}
+
+
+class NotificationSeenView(Resource):
+
+    # Marks the listed notifications of the current user seen, or all of them up to an id
+    @is_authorized_error_handler()
+    @jwt_required()
+    def put(self):
+        parser = reqparse.RequestParser()
+        parser.add_argument("notification_ids", type=int, location="form", action="append")
+        parser.add_argument("up_to_id", type=int, location="form")
+        data = parser.parse_args()
+
+        if (data["notification_ids"] is None) == (data["up_to_id"] is None):
+            abort(http_codes.HTTP_BAD_REQUEST_400, error_message="Either notification_ids or up_to_id is required.")
+
+        user_id = get_jwt_identity()
+        seen_count = mark_notifications_seen(db.session, user_id, data["notification_ids"], data["up_to_id"])
+        db.session.commit()
+
+        return {"seen_count": seen_count, "unread_count": get_unread_count(user_id)}
+
+
+# Clients join the room of their notifications with their access token, and get the committed notifications and
+# unread counts pushed to it
+@socketio.on("join_notifications")
+def join_notifications(data):
+    try:
+        token = decode_token((data or {}).get("access_token"))
+    except Exception:
+        return
+    # Refresh tokens live longer and are not accepted by the views, so they do not open the socket either
+    if token.get("type") != "access" or is_token_revoked(token):
+        return
+
+    user_id = token[current_app.config["JWT_IDENTITY_CLAIM"]]
+    join_room(NOTIFICATIONS_ROOM.format(user_id))
+    emit("unread_count", {"unread_count": get_unread_count(user_id)})
+
+
+class NotificationDetailedView(Resource, SparseFieldsMixin):
     notification_get_schema = NotificationGetSchema()
 
     @is_authorized_error_handler()
     @jwt_required()
     def get(self, notification_id: int):
-        notification = Notification.query.get_or_404(
+        notification_get_schema = self.get_fields_schema(self.notification_get_schema)
+        notification = Notification.query.options(*self.get_load_options(notification_get_schema)).get_or_404(
             notification_id,
             description=OBJECT_DOES_NOT_EXIST.format("Notification", notification_id)
         )
-        requester = User.query.get(get_jwt_identity())
-        if requester is not notification.notification_receiver:
+        if not is_current_user(notification.notification_receiver):
             abort(http_codes.HTTP_FORBIDDEN_403, error_message=OBJECT_VIEW_NOT_ALLOWED.format("notification"))
 
-        return jsonify(self.notification_get_schema.dump(notification))
+        return jsonify(notification_get_schema.dump(notification))
 
     @classmethod
     @is_authorized_error_handler()
@@ -78,8 +135,7 @@ class NotificationDetailedView(Resource):
             notification_id,
             description=OBJECT_DOES_NOT_EXIST.format("Notification", notification_id)
         )
-        requester = User.query.get(get_jwt_identity())
-        if requester is not notification.notification_receiver:
+        if not is_current_user(notification.notification_receiver):
             abort(http_codes.HTTP_FORBIDDEN_403, error_message=OBJECT_DELETE_NOT_ALLOWED.format("notification"))
 
         notification.delete()
@@ -94,8 +150,7 @@ class NotificationDetailedView(Resource):
             description=OBJECT_DOES_NOT_EXIST.format("Notification", notification_id)
         )
 
-        requester = User.query.get(get_jwt_identity())
-        if requester is not notification.notification_receiver:
+        if not is_current_user(notification.notification_receiver):
             abort(http_codes.HTTP_FORBIDDEN_403, error_message=OBJECT_EDIT_NOT_ALLOWED.format("notification"))
 
         parser = reqparse.RequestParser()
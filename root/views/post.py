@@ -1,20 +1,24 @@
 import http_codes
 import asyncio
-from sqlalchemy.orm import joinedload
-from sqlalchemy import text
+from sqlalchemy import func, literal, select
+from sqlalchemy.orm import aliased, joinedload
 from flask_restful import Resource, abort, reqparse
 from werkzeug.datastructures import FileStorage
 from datetime import datetime
 from marshmallow import ValidationError
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from flask import jsonify, make_response
-from models import Post, User, File, Notification
+from flask import current_app, jsonify, make_response, request
+from models import Post, User, File, Comment
+from models.post import VOTE_LIKE, VOTE_DISLIKE, vote_post, get_post_vote
+from models.notification import add_notification, NOTIFICATION_POST_LIKED, NOTIFICATION_POST_DISLIKED
 from db_init import db
-from schemas import PostGetSchema, PostCreateSchema, PostUpdateSchema, FileCreateSchema
+from schemas import PostGetSchema, PostCreateSchema, PostUpdateSchema, FileCreateSchema, CommentGetSchema
 from text_templates import OBJECT_DOES_NOT_EXIST, OBJECT_DELETED, OBJECT_EDIT_NOT_ALLOWED, OBJECT_DELETE_NOT_ALLOWED
-from utilities import is_authorized_error_handler, save_file, delete_file
-from views.mixins import PaginationMixin, FilterMixin, SortMixin
+from utilities import is_authorized_error_handler, save_file, delete_file, get_current_user, is_current_user
+from views.mixins import PaginationMixin, FilterMixin, SortMixin, SparseFieldsMixin, ResponseCacheMixin
 from views.technical import sort_filter_parser
+from vote_counters import record_vote
+from tasks import fan_out_post
 
 parser = reqparse.RequestParser(bundle_errors=True)
 parser.add_argument("post_heading", location="form")
@@ -22,10 +26,13 @@ parser.add_argument("post_text", location="form")
 parser.add_argument("post_image", type=FileStorage, location="files")
 
 
-class PostListView(Resource, PaginationMixin, FilterMixin, SortMixin):
+class PostListView(Resource, PaginationMixin, FilterMixin, SortMixin, SparseFieldsMixin):
     posts_get_schema = PostGetSchema(many=True)
     post_get_schema = PostGetSchema()
     post_create_schema = PostCreateSchema()
+    filter_fields = ("post_id", "post_author", "post_created_at", "post_rating")
+    filter_mappings = {"post_author": (Post.author, User.user_id)}
+    sort_mappings = {"post_author": (Post.author, User.user_id)}
 
     @is_authorized_error_handler()
     @jwt_required()
@@ -34,25 +41,25 @@ class PostListView(Resource, PaginationMixin, FilterMixin, SortMixin):
         sort_by = data.get("sort_by")
         filters = data.get("filters")
 
-        posts_query = Post.query.options(joinedload(Post.author))
+        posts_get_schema = self.get_fields_schema(self.posts_get_schema)
+        posts_query = Post.query
 
         try:
             if filters:
-                filter_mappings = {"post_author": (Post.author, User.user_id)}
                 posts_query = self.get_filtered_query(
                     query=posts_query,
                     model=Post,
                     filters=filters,
-                    filter_mappings=filter_mappings
+                    filter_mappings=self.filter_mappings,
+                    filter_fields=self.filter_fields
                 )
 
             if sort_by:
-                sort_mappings = {"post_author": (User, User.user_id)}
                 posts_query = self.get_sorted_query(
                     query=posts_query,
                     model=Post,
                     sort_fields=sort_by,
-                    sort_mappings=sort_mappings
+                    sort_mappings=self.sort_mappings
                 )
             else:
                 posts_query = posts_query.order_by(Post.post_id)
@@ -60,9 +67,11 @@ class PostListView(Resource, PaginationMixin, FilterMixin, SortMixin):
         except AttributeError as e:
             abort(http_codes.HTTP_BAD_REQUEST_400, error_message=str(e))
 
+        posts_query = posts_query.options(*self.get_load_options(posts_get_schema, eager_relationships=[Post.author]))
+
         response = self.get_paginated_response(
             query=posts_query,
-            items_schema=self.posts_get_schema,
+            items_schema=posts_get_schema,
             model_plural_name="posts",
             count_field_name="post_count"
         )
@@ -100,21 +109,34 @@ class PostListView(Resource, PaginationMixin, FilterMixin, SortMixin):
                     db.session.add_all(post.post_files)
                 await asyncio.gather(*async_tasks)
 
+            # The post is already committed, a timeline which misses it gets it when it is built again
+            try:
+                fan_out_post.delay(post.post_id, post.post_author)
+            except Exception:
+                current_app.logger.exception("Post %s could not be pushed to timelines", post.post_id)
+
             return make_response(jsonify(self.post_get_schema.dump(post)), http_codes.HTTP_CREATED_201)
         except ValidationError as e:
             abort(http_codes.HTTP_BAD_REQUEST_400, error_message=str(e))
 
 
-class PostDetailedView(Resource):
+class PostDetailedView(Resource, SparseFieldsMixin, ResponseCacheMixin):
     post_get_schema = PostGetSchema()
     post_update_schema = PostUpdateSchema()
 
     @is_authorized_error_handler()
     @jwt_required()
     def get(self, post_id: int):
-        post = Post.query.get_or_404(post_id, description=OBJECT_DOES_NOT_EXIST.format("Post", post_id))
+        post_get_schema = self.get_fields_schema(self.post_get_schema)
+        cached_response = self.get_cached_response(Post, post_id)
+        if cached_response is not None:
+            return cached_response
 
-        return jsonify(self.post_get_schema.dump(post))
+        post = Post.query.options(*self.get_load_options(post_get_schema)).get_or_404(
+            post_id, description=OBJECT_DOES_NOT_EXIST.format("Post", post_id)
+        )
+
+        return self.cache_response(post, post_get_schema)
 
     @classmethod
     @is_authorized_error_handler()
@@ -122,8 +144,7 @@ class PostDetailedView(Resource):
     async def delete(cls, post_id: int):
         post = Post.query.get_or_404(post_id, description=OBJECT_DOES_NOT_EXIST.format("Post", post_id))
 
-        editor = User.query.get(get_jwt_identity())
-        if editor is not post.author:
+        if not is_current_user(post.post_author):
             abort(http_codes.HTTP_FORBIDDEN_403, error_message=OBJECT_DELETE_NOT_ALLOWED.format("post"))
 
         post.delete()
@@ -137,8 +158,7 @@ class PostDetailedView(Resource):
             with db.session.begin():
                 post = Post.query.get_or_404(post_id, description=OBJECT_DOES_NOT_EXIST.format("Post", post_id))
 
-                editor = User.query.get(get_jwt_identity())
-                if editor is not post.author:
+                if not is_current_user(post.post_author):
                     abort(http_codes.HTTP_FORBIDDEN_403, error_message=OBJECT_EDIT_NOT_ALLOWED.format("post"))
 
                 data = parser.parse_args()
@@ -177,7 +197,7 @@ class PostRateView(Resource):
     @is_authorized_error_handler()
     @jwt_required()
     def put(self, post_id):
-        user = User.query.get(get_jwt_identity())
+        user = get_current_user()
         post = Post.query.get_or_404(post_id, description=OBJECT_DOES_NOT_EXIST.format("Post", post_id))
 
         rate_parser = reqparse.RequestParser(bundle_errors=True)
@@ -188,68 +208,24 @@ class PostRateView(Resource):
         if data["likes"] is True and data["dislikes"] is True:
             abort(http_codes.HTTP_BAD_REQUEST_400, error_message="You can only like, or dislike post, not both!")
 
-        users_liked = post.post_liked_by
-        users_disliked = post.post_disliked_by
-
-        if data["likes"] is True:
-            if user in users_liked:
-                abort(http_codes.HTTP_BAD_REQUEST_400, error_message="You already liked this post!")
-
-            if user in users_disliked:
-                users_disliked.remove(user)
-
-            users_liked.append(user)
-
-        if data["dislikes"] is True:
-            if user in users_disliked:
-                abort(http_codes.HTTP_BAD_REQUEST_400, error_message="You already disliked this post!")
-
-            if user in users_liked:
-                users_liked.remove(user)
-
-            users_disliked.append(user)
-
-        post.post_liked_by = users_liked
-        post.post_disliked_by = users_disliked
-        post.save_changes()
-
-        db.session.execute(
-            text("""
-                WITH likes_count AS (
-                    SELECT COUNT(*) AS count_likes
-                    FROM user_likes_post
-                    WHERE post_id = :post_id
-                ),
-                dislikes_count AS (
-                    SELECT COUNT(*) AS count_dislikes
-                    FROM user_dislikes_post
-                    WHERE post_id = :post_id
-                ),
-                ratings AS (
-                    SELECT
-                        COALESCE((SELECT count_likes FROM likes_count), 0) AS likes,
-                        COALESCE((SELECT count_dislikes FROM dislikes_count), 0) AS dislikes
-                )
-                UPDATE posts
-                SET
-                    post_likes = (SELECT likes FROM ratings),
-                    post_dislikes = (SELECT dislikes FROM ratings),
-                    post_rating = CASE
-                        WHEN ((SELECT likes FROM ratings) + (SELECT dislikes FROM ratings)) = 0 THEN 0.0
-                        ELSE ROUND((SELECT likes FROM ratings) * 100 / ((SELECT likes FROM ratings) + (SELECT dislikes FROM ratings)), 2)
-                    END
-                WHERE post_id = :post_id
-            """),
-            {"post_id": post_id}
-        )
-
-        action = "liked" if data.get("likes") else "disliked" if data.get("dislikes") else ""
-        notification = Notification(
-            notification_text=f"Your post {post} have been {action} by {user}.",
-            notification_receiver=post.author,
-            notification_sender_url=f"/user/{user.user_id}"
-        )
-        notification.create()
+        # Both flags unset take the vote of the user back
+        vote = VOTE_LIKE if data["likes"] else VOTE_DISLIKE if data["dislikes"] else None
+        if current_app.config["POST_VOTES_WRITE_BEHIND_ENABLED"]:
+            stored_vote = get_post_vote(db.session, post.post_id, user.user_id)
+            previous_vote = record_vote(post.post_id, user.user_id, vote, stored_vote)
+        else:
+            previous_vote = vote_post(db.session, post.post_id, user.user_id, vote)
+
+        if vote is not None:
+            action = "liked" if vote == VOTE_LIKE else "disliked"
+            if previous_vote == vote:
+                db.session.rollback()
+                abort(http_codes.HTTP_BAD_REQUEST_400, error_message=f"You already {action} this post!")
+
+            add_notification(
+                db.session, post.author, NOTIFICATION_POST_LIKED if vote == VOTE_LIKE else NOTIFICATION_POST_DISLIKED,
+                post.post_id, user, post, f"/post/{post.post_id}"
+            )
 
         post.save_changes()
 
@@ -266,8 +242,7 @@ class PostAddFile(Resource):
             with db.session.begin():
                 post = Post.query.get_or_404(post_id, description=OBJECT_DOES_NOT_EXIST.format("Post", post_id))
 
-                editor = User.query.get(get_jwt_identity())
-                if editor is not post.author:
+                if not is_current_user(post.post_author):
                     abort(http_codes.HTTP_FORBIDDEN_403, error_message=OBJECT_EDIT_NOT_ALLOWED.format("Post"))
 
                 file_add_parser = reqparse.RequestParser(bundle_errors=True)
@@ -298,8 +273,7 @@ class PostDeleteFile(Resource):
                 post = Post.query.get_or_404(post_id, description=OBJECT_DOES_NOT_EXIST.format("Post", post_id))
                 file = File.query.get_or_404(file_id, description=OBJECT_DOES_NOT_EXIST.format("File", file_id))
 
-                editor = User.query.get(get_jwt_identity())
-                if editor is not post.author:
+                if not is_current_user(post.post_author):
                     abort(http_codes.HTTP_FORBIDDEN_403, error_message=OBJECT_EDIT_NOT_ALLOWED.format("Post"))
 
                 if file not in post.post_files:
@@ -327,8 +301,7 @@ class PostBulkEditFiles(Resource):
             with db.session.begin():
                 post = Post.query.get_or_404(post_id, description=OBJECT_DOES_NOT_EXIST.format("Post", post_id))
 
-                editor = User.query.get(get_jwt_identity())
-                if editor is not post.author:
+                if not is_current_user(post.post_author):
                     abort(http_codes.HTTP_FORBIDDEN_403, error_message=OBJECT_EDIT_NOT_ALLOWED.format("Post"))
 
                 files_bulk_add_parser = reqparse.RequestParser()
@@ -384,3 +357,124 @@ class PostBulkEditFiles(Resource):
                 return jsonify(self.post_get_schema.dump(post))
         except ValidationError as e:
             abort(http_codes.HTTP_BAD_REQUEST_400, error_message=str(e))
+
+
+class PostCommentsView(Resource, PaginationMixin, SparseFieldsMixin):
+    comments_get_schema = CommentGetSchema(many=True)
+
+    @is_authorized_error_handler()
+    @jwt_required()
+    def get(self, post_id: int):
+        post = Post.query.get_or_404(post_id, description=OBJECT_DOES_NOT_EXIST.format("Post", post_id))
+
+        comments_get_schema = self.get_fields_schema(self.comments_get_schema)
+        comments_query = Comment.query.filter(Comment.comment_post == post.post_id).order_by(
+            Comment.comment_created_at, Comment.comment_id
+        )
+        comments_query = comments_query.options(*self.get_load_options(
+            comments_get_schema,
+            eager_relationships=[Comment.author, Comment.parent_comment]
+        ))
+
+        response = self.get_paginated_response(
+            query=comments_query,
+            items_schema=comments_get_schema,
+            model_plural_name="comments",
+            count_field_name="comment_count",
+            count=post.post_comments_count
+        )
+
+        return response
+
+
+class PostCommentTreeView(Resource, PaginationMixin):
+    comment_get_schema = CommentGetSchema(many=True, exclude=("parent_comment", "comment_post"))
+    default_depth = 3
+    max_depth = 10
+
+    # Root comments of the post (or replies of the "parent" comment) are paginated, and every page comes with the
+    # replies of its roots down to "depth" levels. Replies deeper than that are fetched with "parent".
+    @is_authorized_error_handler()
+    @jwt_required()
+    def get(self, post_id: int):
+        post = Post.query.get_or_404(post_id, description=OBJECT_DOES_NOT_EXIST.format("Post", post_id))
+
+        page = request.args.get("page", default=1, type=int)
+        page_size = request.args.get("page_size", default=10, type=int)
+        depth = request.args.get("depth", default=self.default_depth, type=int)
+        parent_id = request.args.get("parent", default=None, type=int)
+
+        if page < 1 or page_size < 1:
+            abort(http_codes.HTTP_NOT_FOUND_404)
+
+        if not 1 <= depth <= self.max_depth:
+            abort(http_codes.HTTP_BAD_REQUEST_400, error_message=f"Depth should be between 1 and {self.max_depth}.")
+
+        rows = self.get_tree_rows(post.post_id, parent_id, page, page_size, depth)
+        last_root_number = page * page_size
+        has_next = any(root_number > last_root_number for _, _, root_number, _ in rows)
+        rows = [row for row in rows if row[2] <= last_root_number]
+
+        nodes = {}
+        comments = self.comment_get_schema.dump([comment for comment, _, _, _ in rows])
+        for (comment, _, _, replies_count), node in zip(rows, comments):
+            node["comment_replies_count"] = replies_count
+            node["comment_replies"] = []
+            nodes[comment.comment_id] = node
+
+        roots = []
+        for comment, comment_depth, _, _ in rows:
+            if comment_depth == 1:
+                roots.append(nodes[comment.comment_id])
+            else:
+                nodes[comment.comment_parent]["comment_replies"].append(nodes[comment.comment_id])
+
+        links = {}
+        if page > 1:
+            links["prev"] = self.get_page_url(page=page - 1)
+        if has_next:
+            links["next"] = self.get_page_url(page=page + 1)
+
+        return {"comments": roots, "links": links}
+
+    @staticmethod
+    def get_tree_rows(post_id, parent_id, page, page_size, depth):
+        # One recursive query returns the comments of the page with their depth, the number of their root in the
+        # post and their count of replies, ordered as they are shown. One root past the page tells whether the
+        # next page exists, its replies are not fetched.
+        order = (Comment.comment_created_at, Comment.comment_id)
+        last_root_number = page * page_size
+        roots = (
+            select(Comment.comment_id, func.row_number().over(order_by=order).label("root_number"))
+            .where(
+                Comment.comment_post == post_id,
+                Comment.comment_parent.is_(None) if parent_id is None else Comment.comment_parent == parent_id
+            )
+            .order_by(*order)
+            .limit(page_size + 1)
+            .offset((page - 1) * page_size)
+            .subquery()
+        )
+
+        tree = select(roots.c.comment_id, literal(1).label("depth"), roots.c.root_number).cte(
+            "comment_tree", recursive=True
+        )
+        reply = aliased(Comment)
+        tree = tree.union_all(
+            select(reply.comment_id, tree.c.depth + 1, tree.c.root_number)
+            .join(tree, reply.comment_parent == tree.c.comment_id)
+            .where(tree.c.depth < depth, tree.c.root_number <= last_root_number)
+        )
+
+        replies = aliased(Comment)
+        replies_count = select(func.count(replies.comment_id)).where(
+            replies.comment_parent == Comment.comment_id
+        ).correlate(Comment).scalar_subquery()
+
+        return (
+            db.session.query(Comment, tree.c.depth, tree.c.root_number, replies_count)
+            .join(tree, Comment.comment_id == tree.c.comment_id)
+            .options(joinedload(Comment.author), joinedload(Comment.comment_image))
+            .order_by(tree.c.root_number, *order)
+            .all()
+        )
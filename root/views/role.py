@@ -7,17 +7,18 @@ from models import Role
 from schemas import RoleGetSchema, RoleCreateSchema, RoleUpdateSchema
 from text_templates import MSG_MISSING, OBJECT_DOES_NOT_EXIST, OBJECT_DELETED
 from utilities import is_authorized_error_handler
-from views.mixins import PaginationMixin, FilterMixin, SortMixin
+from views.mixins import PaginationMixin, FilterMixin, SortMixin, SparseFieldsMixin
 from views.technical import sort_filter_parser
 
 parser = reqparse.RequestParser(bundle_errors=True)
 parser.add_argument("role_name", location="form", help=MSG_MISSING.format("role_name"))
 
 
-class RoleListViewSet(Resource, PaginationMixin, FilterMixin, SortMixin):
+class RoleListViewSet(Resource, PaginationMixin, FilterMixin, SortMixin, SparseFieldsMixin):
     roles_get_schema = RoleGetSchema(many=True)
     role_get_schema = RoleGetSchema()
     role_create_schema = RoleCreateSchema()
+    filter_fields = ("role_id", "role_name")
 
     @is_authorized_error_handler()
     @jwt_required()
@@ -26,6 +27,7 @@ class RoleListViewSet(Resource, PaginationMixin, FilterMixin, SortMixin):
         filters = data.get("filters")
         sort_by = data.get("sort_by")
 
+        roles_get_schema = self.get_fields_schema(self.roles_get_schema)
         roles_query = Role.query
 
         try:
@@ -33,7 +35,8 @@ class RoleListViewSet(Resource, PaginationMixin, FilterMixin, SortMixin):
                 roles_query = self.get_filtered_query(
                     query=roles_query,
                     model=Role,
-                    filters=filters
+                    filters=filters,
+                    filter_fields=self.filter_fields
                 )
 
             if sort_by:
@@ -42,13 +45,17 @@ class RoleListViewSet(Resource, PaginationMixin, FilterMixin, SortMixin):
                     model=Role,
                     sort_fields=sort_by,
                 )
+            else:
+                roles_query = roles_query.order_by(Role.role_id)
 
         except AttributeError as e:
             abort(http_codes.HTTP_BAD_REQUEST_400, error_message=str(e))
 
+        roles_query = roles_query.options(*self.get_load_options(roles_get_schema))
+
         response = self.get_paginated_response(
             query=roles_query,
-            items_schema=self.roles_get_schema,
+            items_schema=roles_get_schema,
             model_plural_name="roles",
             count_field_name="role_count"
         )
@@ -69,16 +76,19 @@ class RoleListViewSet(Resource, PaginationMixin, FilterMixin, SortMixin):
             abort(http_codes.HTTP_BAD_REQUEST_400, error_message=str(e))
 
 
-class RoleDetailedViewSet(Resource):
+class RoleDetailedViewSet(Resource, SparseFieldsMixin):
     role_get_schema = RoleGetSchema()
     role_update_schema = RoleUpdateSchema()
 
     @is_authorized_error_handler()
     @jwt_required()
     def get(self, role_id: int):
-        role = Role.query.get_or_404(role_id, description=OBJECT_DOES_NOT_EXIST.format("Role", role_id))
+        role_get_schema = self.get_fields_schema(self.role_get_schema)
+        role = Role.query.options(*self.get_load_options(role_get_schema)).get_or_404(
+            role_id, description=OBJECT_DOES_NOT_EXIST.format("Role", role_id)
+        )
 
-        return jsonify(self.role_get_schema.dump(role))
+        return jsonify(role_get_schema.dump(role))
 
     @classmethod
     @is_authorized_error_handler()
@@ -10,7 +10,7 @@ from models import University
 from schemas import UniversityGetSchema, UniversityCreateSchema, UniversityUpdateSchema
 from text_templates import OBJECT_DOES_NOT_EXIST, OBJECT_DELETED
 from utilities import is_authorized_error_handler, save_file
-from views.mixins import PaginationMixin, FilterMixin, SortMixin
+from views.mixins import PaginationMixin, FilterMixin, SortMixin, SparseFieldsMixin, ResponseCacheMixin
 from views.technical import sort_filter_parser
 
 
@@ -21,10 +21,11 @@ parser.add_argument("university_phone", location="form")
 parser.add_argument("university_image", type=FileStorage, location="files")
 
 
-class UniversityListView(Resource, PaginationMixin, FilterMixin, SortMixin):
+class UniversityListView(Resource, PaginationMixin, FilterMixin, SortMixin, SparseFieldsMixin):
     universities_get_schema = UniversityGetSchema(many=True)
     university_get_schema = UniversityGetSchema()
     university_create_schema = UniversityCreateSchema()
+    filter_fields = ("university_id", "university_name", "university_email")
 
     @is_authorized_error_handler()
     @jwt_required()
@@ -33,6 +34,7 @@ class UniversityListView(Resource, PaginationMixin, FilterMixin, SortMixin):
         filters = data.get("filters")
         sort_by = data.get("sort_by")
 
+        universities_get_schema = self.get_fields_schema(self.universities_get_schema)
         universities_query = University.query
 
         try:
@@ -40,7 +42,8 @@ class UniversityListView(Resource, PaginationMixin, FilterMixin, SortMixin):
                 universities_query = self.get_filtered_query(
                     query=universities_query,
                     model=University,
-                    filters=filters
+                    filters=filters,
+                    filter_fields=self.filter_fields
                 )
 
             if sort_by:
@@ -49,13 +52,17 @@ class UniversityListView(Resource, PaginationMixin, FilterMixin, SortMixin):
                     model=University,
                     sort_fields=sort_by,
                 )
+            else:
+                universities_query = universities_query.order_by(University.university_id)
 
         except AttributeError as e:
             abort(http_codes.HTTP_BAD_REQUEST_400, error_message=str(e))
 
+        universities_query = universities_query.options(*self.get_load_options(universities_get_schema))
+
         response = self.get_paginated_response(
             query=universities_query,
-            items_schema=self.universities_get_schema,
+            items_schema=universities_get_schema,
             model_plural_name="universities",
             count_field_name="university_count"
         )
@@ -87,18 +94,23 @@ class UniversityListView(Resource, PaginationMixin, FilterMixin, SortMixin):
             abort(http_codes.HTTP_BAD_REQUEST_400, error_message=str(e))
 
 
-class UniversityDetailedView(Resource):
+class UniversityDetailedView(Resource, SparseFieldsMixin, ResponseCacheMixin):
     university_get_schema = UniversityGetSchema()
     university_update_schema = UniversityUpdateSchema()
 
     @is_authorized_error_handler()
     @jwt_required()
     def get(self, university_id: int):
-        university = University.query.get_or_404(
+        university_get_schema = self.get_fields_schema(self.university_get_schema)
+        cached_response = self.get_cached_response(University, university_id)
+        if cached_response is not None:
+            return cached_response
+
+        university = University.query.options(*self.get_load_options(university_get_schema)).get_or_404(
             university_id, description=OBJECT_DOES_NOT_EXIST.format("University", university_id)
         )
 
-        return jsonify(self.university_get_schema.dump(university))
+        return self.cache_response(university, university_get_schema)
 
     @classmethod
     @is_authorized_error_handler()
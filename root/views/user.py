@@ -1,19 +1,23 @@
 import http_codes
 import asyncio
-from sqlalchemy.orm import joinedload
 from app_init import app
 from flask_restful import Resource, abort, reqparse
 from marshmallow import ValidationError
-from flask import jsonify, make_response, redirect, request
-from flask_jwt_extended import create_refresh_token, create_access_token, jwt_required, get_jwt_identity, get_jti
-from werkzeug.security import check_password_hash
+from flask import jsonify, make_response, redirect
+from flask_jwt_extended import create_refresh_token, create_access_token, jwt_required, get_jwt_identity, get_jwt
 from werkzeug.datastructures import FileStorage
-from models import User, Notification, Faculty, Role, University
-from db_init import db, redis_store
-from schemas import UserCreateSchema, UserGetSchema, UserUpdateSchema
+from sqlalchemy.orm import with_parent
+from models import User, Faculty, Role, University, Post
+from models.user import add_follower, remove_follower
+from models.notification import add_notification, NOTIFICATION_USER_FOLLOWED
+from db_init import db
+from revoked_tokens import revoke_token, revoke_user_tokens
+from passwords import password_hasher
+from timelines import drop_timeline
+from schemas import UserCreateSchema, UserGetSchema, UserUpdateSchema, PostGetSchema
 from text_templates import OBJECT_DOES_NOT_EXIST, OBJECT_DELETED, OBJECT_EDIT_NOT_ALLOWED
-from utilities import is_authorized_error_handler, save_file, delete_file
-from views.mixins import PaginationMixin, FilterMixin, SortMixin
+from utilities import is_authorized_error_handler, save_file, delete_file, get_current_user, is_current_user
+from views.mixins import PaginationMixin, FilterMixin, SortMixin, SparseFieldsMixin, ResponseCacheMixin
 from views.technical import sort_filter_parser
 
 
@@ -71,9 +75,14 @@ class UserLoginView(Resource):
 
         user = User.query.filter_by(user_email=data.get("email")).first()
         if user:
-            is_password_correct = check_password_hash(user.user_password, data.get("password"))
+            is_password_correct = password_hasher.check(user.user_password, data.get("password"))
 
             if is_password_correct:
+                # Hashes made with an older method or cost are upgraded while the plain password is at hand
+                if password_hasher.needs_rehash(user.user_password):
+                    user.user_password = password_hasher.hash(data.get("password"))
+                    user.save_changes()
+
                 access_token = create_access_token(identity=user.user_id)
                 refresh_token = create_refresh_token(identity=user.user_id)
 
@@ -90,18 +99,25 @@ class UserLogOutView(Resource):
     @is_authorized_error_handler()
     @jwt_required()
     def get(self):
-        jti = get_jti(encoded_token=request.headers.get('Authorization').split()[1])
-        redis_store.set(jti, "true")
+        revoke_token(get_jwt())
         return {"message": "Successfully logged out"}
 
 
+class UserLogOutAllView(Resource):
+    @is_authorized_error_handler()
+    @jwt_required()
+    def get(self):
+        revoke_user_tokens(get_jwt_identity())
+        return {"message": "Successfully logged out of all sessions"}
+
+
 class UserChangePassword(Resource):
     user_update_schema = UserUpdateSchema()
 
     @is_authorized_error_handler()
     @jwt_required()
     def put(self):
-        user = User.query.get(get_jwt_identity())
+        user = get_current_user()
 
         parser_change_pw = reqparse.RequestParser(bundle_errors=True)
         parser_change_pw.add_argument("old_password", required=True, location="form")
@@ -109,7 +125,7 @@ class UserChangePassword(Resource):
         parser_change_pw.add_argument("new_password_repeated", required=True, location="form")
         data = parser_change_pw.parse_args()
 
-        is_password_correct = check_password_hash(user.user_password, data["old_password"])
+        is_password_correct = password_hasher.check(user.user_password, data["old_password"])
         if not is_password_correct:
             abort(http_codes.HTTP_BAD_REQUEST_400, error_message="Old password is incorrect, try again.")
 
@@ -127,6 +143,9 @@ class UserChangePassword(Resource):
                 setattr(user, key, value)
             user.save_changes()
 
+            # Sessions opened with the old password are closed, the user has to log in again
+            revoke_user_tokens(user.user_id)
+
             return {"success": "Password was changed successfully."}
         except ValidationError as e:
             abort(http_codes.HTTP_BAD_REQUEST_400, error_message=str(e))
@@ -145,27 +164,21 @@ class UserFollowView(Resource):
 
     @staticmethod
     def follow_user(follower: User, user_to_follow: User):
-        if user_to_follow in follower.user_following or follower in user_to_follow.user_followers:
+        if not add_follower(db.session, user_to_follow.user_id, follower.user_id):
             abort(http_codes.HTTP_BAD_REQUEST_400, error_message="You are already following this user!")
 
-        follower.user_following.append(user_to_follow)
-
-        notification = Notification(
-            notification_text=f"User {follower} now follows you.",
-            notification_receiver=user_to_follow,
-            notification_sender_url=f"/user/{follower.user_id}"
+        add_notification(
+            db.session, user_to_follow, NOTIFICATION_USER_FOLLOWED, user_to_follow.user_id, follower, None,
+            f"/user/{user_to_follow.user_id}/followers"
         )
-        db.session.add(notification)
 
         return user_to_follow
 
     @staticmethod
     def unfollow_user(unfollower: User, user_to_unfollow: User):
-        if user_to_unfollow not in unfollower.user_following or unfollower not in user_to_unfollow.user_followers:
+        if not remove_follower(db.session, user_to_unfollow.user_id, unfollower.user_id):
             abort(http_codes.HTTP_BAD_REQUEST_400, error_message="You are not following this user!")
 
-        unfollower.user_following.remove(user_to_unfollow)
-
         return user_to_unfollow
 
     @is_authorized_error_handler()
@@ -177,7 +190,7 @@ class UserFollowView(Resource):
             data = follow_parser.parse_args()
 
             user_to_follow = User.query.get_or_404(user_id, description=OBJECT_DOES_NOT_EXIST.format("User", user_id))
-            follower = User.query.get(get_jwt_identity())
+            follower = get_current_user()
 
             if user_to_follow is follower:
                 abort(http_codes.HTTP_BAD_REQUEST_400, error_message="You can not follow yourself.")
@@ -189,11 +202,25 @@ class UserFollowView(Resource):
             else:
                 abort(http_codes.HTTP_BAD_REQUEST_400, error_message="Incorrect action.")
 
+        drop_timeline(follower.user_id)
+
         return jsonify(self.user_get_schema.dump(user_to_follow))
 
 
-class UserListViewSet(Resource, PaginationMixin, FilterMixin, SortMixin):
+class UserListViewSet(Resource, PaginationMixin, FilterMixin, SortMixin, SparseFieldsMixin):
     users_get_schema = UserGetSchema(many=True)
+    filter_fields = ("user_id", "user_name", "user_surname", "user_email", "user_enrolment_year",
+                     "user_role", "user_faculty", "user_university")
+    filter_mappings = {
+        "user_role": (User.role, Role.role_name),
+        "user_faculty": (User.faculty, Faculty.faculty_name),
+        "user_university": (User.university, University.university_name),
+    }
+    sort_mappings = {
+        "user_role": (User.role, Role.role_name),
+        "user_faculty": (User.faculty, Faculty.faculty_name),
+        "user_university": (User.university, University.university_name)
+    }
 
     @is_authorized_error_handler()
     @jwt_required()
@@ -202,39 +229,25 @@ class UserListViewSet(Resource, PaginationMixin, FilterMixin, SortMixin):
         filters = data.get("filters")
         sort_by = data.get("sort_by")
 
-        users_query = User.query.options(
-            joinedload(User.role),
-            joinedload(User.faculty),
-            joinedload(User.university),
-        )
+        users_get_schema = self.get_fields_schema(self.users_get_schema)
+        users_query = User.query
 
         try:
             if filters:
-                filter_mappings = {
-                    "user_role": (User.role, Role.role_name),
-                    "user_faculty": (User.faculty, Faculty.faculty_name),
-                    "user_university": (User.university, University.university_name),
-                }
-
                 users_query = self.get_filtered_query(
                     query=users_query,
                     model=User,
                     filters=filters,
-                    filter_mappings=filter_mappings
+                    filter_mappings=self.filter_mappings,
+                    filter_fields=self.filter_fields
                 )
 
             if sort_by:
-                sort_mappings = {
-                    "user_role":  (Role, Role.role_name),
-                    "user_faculty": (Faculty, Faculty.faculty_name),
-                    "user_university": (University, University.university_name)
-                }
-
                 users_query = self.get_sorted_query(
                     query=users_query,
                     model=User,
                     sort_fields=sort_by,
-                    sort_mappings=sort_mappings,
+                    sort_mappings=self.sort_mappings,
                 )
 
             else:
@@ -243,9 +256,14 @@ class UserListViewSet(Resource, PaginationMixin, FilterMixin, SortMixin):
         except AttributeError as e:
             abort(http_codes.HTTP_BAD_REQUEST_400, error_message=str(e))
 
+        users_query = users_query.options(*self.get_load_options(
+            users_get_schema,
+            eager_relationships=[User.role, User.faculty, User.university]
+        ))
+
         response = self.get_paginated_response(
             query=users_query,
-            items_schema=self.users_get_schema,
+            items_schema=users_get_schema,
             model_plural_name="users",
             count_field_name="user_count"
         )
@@ -253,16 +271,23 @@ class UserListViewSet(Resource, PaginationMixin, FilterMixin, SortMixin):
         return response
 
 
-class UserDetailedViewSet(Resource):
+class UserDetailedViewSet(Resource, SparseFieldsMixin, ResponseCacheMixin):
     user_get_schema = UserGetSchema()
     user_update_schema = UserUpdateSchema()
 
     @is_authorized_error_handler()
     @jwt_required()
     def get(self, user_id: int):
-        user = User.query.get_or_404(user_id, description=OBJECT_DOES_NOT_EXIST.format("User", user_id))
+        user_get_schema = self.get_fields_schema(self.user_get_schema)
+        cached_response = self.get_cached_response(User, user_id)
+        if cached_response is not None:
+            return cached_response
 
-        return jsonify(self.user_get_schema.dump(user))
+        user = User.query.options(*self.get_load_options(user_get_schema)).get_or_404(
+            user_id, description=OBJECT_DOES_NOT_EXIST.format("User", user_id)
+        )
+
+        return self.cache_response(user, user_get_schema)
 
     @classmethod
     @is_authorized_error_handler()
@@ -279,9 +304,8 @@ class UserDetailedViewSet(Resource):
         try:
             with db.session.begin():
                 user = User.query.get_or_404(user_id, description=OBJECT_DOES_NOT_EXIST.format("User", user_id))
-                requester = User.query.get(get_jwt_identity())
 
-                if requester is not user:
+                if not is_current_user(user.user_id):
                     abort(http_codes.HTTP_FORBIDDEN_403, error_message=OBJECT_EDIT_NOT_ALLOWED.format("User"))
 
                 data = parser.parse_args()
@@ -311,3 +335,78 @@ class UserDetailedViewSet(Resource):
             return jsonify(self.user_get_schema.dump(user))
         except ValidationError as e:
             abort(http_codes.HTTP_BAD_REQUEST_400, error_message=str(e))
+
+
+class UserFollowersView(Resource, PaginationMixin, SparseFieldsMixin):
+    users_get_schema = UserGetSchema(many=True)
+
+    @is_authorized_error_handler()
+    @jwt_required()
+    def get(self, user_id: int):
+        user = User.query.get_or_404(user_id, description=OBJECT_DOES_NOT_EXIST.format("User", user_id))
+
+        users_get_schema = self.get_fields_schema(self.users_get_schema)
+        followers_query = User.query.filter(with_parent(user, User.user_followers)).order_by(User.user_id)
+        followers_query = followers_query.options(*self.get_load_options(
+            users_get_schema,
+            eager_relationships=[User.role, User.faculty, User.university]
+        ))
+
+        response = self.get_paginated_response(
+            query=followers_query,
+            items_schema=users_get_schema,
+            model_plural_name="followers",
+            count_field_name="follower_count",
+            count=user.user_followers_count
+        )
+
+        return response
+
+
+class UserFollowingView(Resource, PaginationMixin, SparseFieldsMixin):
+    users_get_schema = UserGetSchema(many=True)
+
+    @is_authorized_error_handler()
+    @jwt_required()
+    def get(self, user_id: int):
+        user = User.query.get_or_404(user_id, description=OBJECT_DOES_NOT_EXIST.format("User", user_id))
+
+        users_get_schema = self.get_fields_schema(self.users_get_schema)
+        following_query = User.query.filter(with_parent(user, User.user_following)).order_by(User.user_id)
+        following_query = following_query.options(*self.get_load_options(
+            users_get_schema,
+            eager_relationships=[User.role, User.faculty, User.university]
+        ))
+
+        response = self.get_paginated_response(
+            query=following_query,
+            items_schema=users_get_schema,
+            model_plural_name="following",
+            count_field_name="following_count",
+            count=user.user_following_count
+        )
+
+        return response
+
+
+class UserLikedPostsView(Resource, PaginationMixin, SparseFieldsMixin):
+    posts_get_schema = PostGetSchema(many=True)
+
+    @is_authorized_error_handler()
+    @jwt_required()
+    def get(self, user_id: int):
+        user = User.query.get_or_404(user_id, description=OBJECT_DOES_NOT_EXIST.format("User", user_id))
+
+        posts_get_schema = self.get_fields_schema(self.posts_get_schema)
+        posts_query = Post.query.filter(with_parent(user, User.user_liked_posts)).order_by(Post.post_id)
+        posts_query = posts_query.options(*self.get_load_options(posts_get_schema, eager_relationships=[Post.author]))
+
+        response = self.get_paginated_response(
+            query=posts_query,
+            items_schema=posts_get_schema,
+            model_plural_name="posts",
+            count_field_name="post_count",
+            count=user.user_liked_posts_count
+        )
+
+        return response
@@ -0,0 +1,189 @@
+from flask import current_app
+from sqlalchemy import select
+from db_init import db, redis_store
+from models import Post, User
+from models.mixins import drop_cached_responses, get_changed_row
+from models.post import save_post_votes, apply_vote_deltas
+
+# Write-behind votes: a vote only changes Redis, and the flush task writes the changed votes and the summed
+# counter deltas to the database in batches. Votes known to Redis are kept per post, so repeated votes of a user
+# are checked without the database; removed votes are kept as 0.
+POST_VOTES_KEY = "post_votes:{}"
+POST_VOTE_CHANGES_KEY = "post_vote_changes:{}"
+POST_VOTE_DELTAS_KEY = "post_vote_deltas:{}"
+USER_VOTE_DELTAS_KEY = "user_vote_deltas"
+CHANGED_POSTS_KEY = "post_votes_changed"
+
+RECORD_VOTE_SCRIPT = """
+local previous = redis.call('HGET', KEYS[1], ARGV[1]) or ARGV[3]
+if previous == ARGV[2] then
+    return previous
+end
+
+local likes = (ARGV[2] == '1' and 1 or 0) - (previous == '1' and 1 or 0)
+local dislikes = (ARGV[2] == '-1' and 1 or 0) - (previous == '-1' and 1 or 0)
+
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+redis.call('HINCRBY', KEYS[3], 'likes', likes)
+redis.call('HINCRBY', KEYS[3], 'dislikes', dislikes)
+redis.call('HINCRBY', KEYS[4], 'likes:' .. ARGV[1], likes)
+redis.call('HINCRBY', KEYS[4], 'dislikes:' .. ARGV[1], dislikes)
+redis.call('SADD', KEYS[5], ARGV[4])
+return previous
+"""
+
+# Takes the changes of a batch of posts and all user deltas out of Redis, so votes recorded while the batch is
+# written go to the next one. Until the batch is committed (or restored when it fails) its deltas are neither
+# in Redis nor in the database, so the counters read meanwhile miss them.
+TAKE_CHANGES_SCRIPT = """
+local post_ids = redis.call('SPOP', KEYS[1], ARGV[1])
+local changes, deltas = {}, {}
+for i, post_id in ipairs(post_ids) do
+    changes[i] = redis.call('HGETALL', ARGV[2] .. post_id)
+    deltas[i] = redis.call('HGETALL', ARGV[3] .. post_id)
+    redis.call('DEL', ARGV[2] .. post_id, ARGV[3] .. post_id)
+end
+
+local user_deltas = redis.call('HGETALL', KEYS[2])
+redis.call('DEL', KEYS[2])
+return {post_ids, changes, deltas, user_deltas}
+"""
+
+record_vote_script = redis_store.register_script(RECORD_VOTE_SCRIPT)
+take_changes_script = redis_store.register_script(TAKE_CHANGES_SCRIPT)
+
+
+def get_pairs(values):
+    return zip(values[::2], values[1::2])
+
+
+def record_vote(post_id, user_id, vote, stored_vote):
+    # Returns the previous vote, the stored vote of the database is used when Redis does not know the user's vote
+    previous_vote = int(record_vote_script(
+        keys=[
+            POST_VOTES_KEY.format(post_id), POST_VOTE_CHANGES_KEY.format(post_id),
+            POST_VOTE_DELTAS_KEY.format(post_id), USER_VOTE_DELTAS_KEY, CHANGED_POSTS_KEY
+        ],
+        args=[user_id, vote or 0, stored_vote or 0, post_id, current_app.config["POST_VOTES_CACHE_TIMEOUT"]]
+    )) or None
+
+    if previous_vote != vote:
+        drop_cached_responses([get_changed_row(Post, post_id)])
+
+    return previous_vote
+
+
+def get_pending_deltas(post_ids):
+    pipeline = redis_store.pipeline(transaction=False)
+    for post_id in post_ids:
+        pipeline.hmget(POST_VOTE_DELTAS_KEY.format(post_id), "likes", "dislikes")
+
+    return {
+        post_id: (int(likes or 0), int(dislikes or 0))
+        for post_id, (likes, dislikes) in zip(post_ids, pipeline.execute())
+    }
+
+
+def add_pending_votes(posts_data, posts):
+    # Dumped counters are the stored ones plus the votes which are not flushed yet. They are not exact: while a
+    # batch is written they lack its votes, and are low for the duration of that transaction.
+    posts = list(posts)
+    pending_deltas = get_pending_deltas([post.post_id for post in posts])
+
+    for data, post in zip(posts_data, posts):
+        likes_delta, dislikes_delta = pending_deltas[post.post_id]
+        if not likes_delta and not dislikes_delta:
+            continue
+
+        likes = (post.post_likes or 0) + likes_delta
+        dislikes = (post.post_dislikes or 0) + dislikes_delta
+        live_counters = {
+            "post_likes": likes,
+            "post_dislikes": dislikes,
+            "post_rating": round(likes * 100 / (likes + dislikes), 2) if likes + dislikes else 0.0
+        }
+        for key, value in live_counters.items():
+            if key in data:
+                data[key] = value
+
+
+def take_changes(batch_size):
+    post_ids, changes, deltas, user_deltas = take_changes_script(
+        keys=[CHANGED_POSTS_KEY, USER_VOTE_DELTAS_KEY],
+        args=[batch_size, POST_VOTE_CHANGES_KEY.format(""), POST_VOTE_DELTAS_KEY.format("")]
+    )
+
+    votes, post_deltas = {}, {}
+    for post_id, post_changes, post_delta in zip(post_ids, changes, deltas):
+        post_id = int(post_id)
+        for user_id, vote in get_pairs(post_changes):
+            votes[int(user_id), post_id] = int(vote) or None
+
+        post_delta = dict(get_pairs(post_delta))
+        post_deltas[post_id] = (int(post_delta.get(b"likes", 0)), int(post_delta.get(b"dislikes", 0)))
+
+    user_counter_deltas = {}
+    for field, delta in get_pairs(user_deltas):
+        counter, user_id = field.decode().split(":")
+        likes_delta, dislikes_delta = user_counter_deltas.get(int(user_id), (0, 0))
+        if counter == "likes":
+            likes_delta += int(delta)
+        else:
+            dislikes_delta += int(delta)
+        user_counter_deltas[int(user_id)] = (likes_delta, dislikes_delta)
+
+    return votes, post_deltas, user_counter_deltas
+
+
+def restore_changes(votes, post_deltas, user_deltas):
+    # Puts a batch which could not be written back, votes recorded since then are newer and are kept
+    pipeline = redis_store.pipeline()
+    for (user_id, post_id), vote in votes.items():
+        pipeline.hsetnx(POST_VOTE_CHANGES_KEY.format(post_id), user_id, vote or 0)
+    for post_id, (likes_delta, dislikes_delta) in post_deltas.items():
+        pipeline.hincrby(POST_VOTE_DELTAS_KEY.format(post_id), "likes", likes_delta)
+        pipeline.hincrby(POST_VOTE_DELTAS_KEY.format(post_id), "dislikes", dislikes_delta)
+        pipeline.sadd(CHANGED_POSTS_KEY, post_id)
+    for user_id, (likes_delta, dislikes_delta) in user_deltas.items():
+        pipeline.hincrby(USER_VOTE_DELTAS_KEY, f"likes:{user_id}", likes_delta)
+        pipeline.hincrby(USER_VOTE_DELTAS_KEY, f"dislikes:{user_id}", dislikes_delta)
+    pipeline.execute()
+
+
+def write_changes(votes, post_deltas, user_deltas):
+    # Votes on posts or of users deleted in the meantime are dropped with them
+    post_ids = set(db.session.execute(select(Post.post_id).where(Post.post_id.in_(post_deltas))).scalars())
+    user_ids = set(db.session.execute(
+        select(User.user_id).where(User.user_id.in_({user_id for user_id, _ in votes} | set(user_deltas)))
+    ).scalars())
+
+    save_post_votes(db.session, {
+        (user_id, post_id): vote for (user_id, post_id), vote in votes.items()
+        if user_id in user_ids and post_id in post_ids
+    })
+    apply_vote_deltas(
+        db.session,
+        {post_id: delta for post_id, delta in post_deltas.items() if post_id in post_ids},
+        {user_id: delta for user_id, delta in user_deltas.items() if user_id in user_ids}
+    )
+    db.session.commit()
+
+
+def flush_votes(batch_size):
+    # Every batch is written in its own transaction, and returned to Redis when the transaction fails
+    flushed_posts = 0
+    while True:
+        votes, post_deltas, user_deltas = take_changes(batch_size)
+        if not post_deltas and not user_deltas:
+            return flushed_posts
+
+        try:
+            write_changes(votes, post_deltas, user_deltas)
+        except Exception:
+            db.session.rollback()
+            restore_changes(votes, post_deltas, user_deltas)
+            raise
+
+        flushed_posts += len(post_deltas)